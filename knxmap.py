@@ -5,6 +5,10 @@ import argparse
 import logging
 
 from libknxmap import KnxMap, Targets, KnxTargets
+from libknxmap.targets import SCAN_ORDERS
+from libknxmap.core import BUS_PRIORITIES
+from libknxmap.output import OUTPUT_FORMATS
+from libknxmap.store import ResultStore
 
 # asyncio requires at least Python 3.3
 if sys.version_info.major < 3 or \
@@ -41,16 +45,23 @@ ARGS.add_argument(
     default=None, help='Interface to be used')
 ARGS.add_argument(
     '--workers', action='store', type=int, metavar='N',
-    default=30, help='Limit concurrent workers')
+    default=1000, help='Limit outstanding description requests and open bus scan '
+                       'tunnels, both share the same N slots (split across --processes)')
 ARGS.add_argument(
     '--key', action='store', dest='auth_key', type=int,
     default=0xffffffff, help='Authorize key for System 2 and System 7 devices')
 ARGS.add_argument(
-    '--timeout', action='store', dest='timeout', type=int,
+    '--timeout', action='store', dest='timeout', type=float,
     default=2, help='Timeout in seconds for unicast description responses')
+ARGS.add_argument(
+    '--min-timeout', action='store', dest='min_timeout', type=float,
+    default=0.5, help='Lower limit in seconds for timeouts derived from gateway RTTs')
+ARGS.add_argument(
+    '--max-timeout', action='store', dest='max_timeout', type=float,
+    default=10, help='Upper limit in seconds for timeouts derived from gateway RTTs')
 ARGS.add_argument(
     '--retries', action='store', dest='retries', type=int,
-    default=3, help='Count of retries for description requests')
+    default=3, help='Count of rounds of description requests')
 
 pscan = SUBARGS.add_parser('scan', help='Scan KNXnet/IP gateways and attached bus devices')
 pscan.add_argument(
@@ -61,6 +72,74 @@ pscan.add_argument(
 pscan.add_argument(
     '--bus-info', action='store_true', dest='bus_info',
     default=False, help='Try to extract information from alive bus devices')
+pscan.add_argument(
+    '--scan-order', action='store', dest='scan_order', choices=SCAN_ORDERS,
+    default='sequential', help='Order in which targets are scanned')
+pscan.add_argument(
+    '--seed', action='store', dest='seed', type=int,
+    default=None, help='Seed for the random scan order (random if not set)')
+pscan.add_argument(
+    '--start-index', action='store', dest='start_index', type=int,
+    default=0, help='Resume the scan at this target index (same order and seed required)')
+pscan.add_argument(
+    '--processes', action='store', dest='processes', type=int, metavar='N',
+    default=1, help='Split the targets across N worker processes')
+pscan.add_argument(
+    '--checkpoint', action='store', dest='checkpoint', metavar='FILE',
+    default=None, help='Periodically write the scan progress to FILE')
+pscan.add_argument(
+    '--checkpoint-interval', action='store', dest='checkpoint_interval', type=float,
+    metavar='SECONDS', default=30, help='Seconds between checkpoints')
+pscan.add_argument(
+    '--resume', action='store', dest='resume', metavar='FILE',
+    default=None, help='Resume the scan from checkpoint FILE (it is updated unless --checkpoint is set). '
+                       'Output files are rewritten and start with the results restored from FILE')
+pscan.add_argument(
+    '--output-jsonl', action='store', dest='output_jsonl', metavar='FILE',
+    default=None, help='Write results as JSON Lines to FILE as soon as they are found')
+pscan.add_argument(
+    '--output-csv', action='store', dest='output_csv', metavar='FILE',
+    default=None, help='Write results as CSV to FILE as soon as they are found')
+pscan.add_argument(
+    '--output-binary', action='store', dest='output_binary', metavar='FILE',
+    default=None, help='Write results as compact binary records to FILE')
+pscan.add_argument(
+    '--output-sqlite', action='store', dest='output_sqlite', metavar='FILE',
+    default=None, help='Add results to the SQLite database FILE (see query)')
+pscan.add_argument(
+    '--tunnels', action='store', dest='tunnels', type=int, metavar='N',
+    default=4, help='Open up to N tunnel connections per gateway for bus scans')
+pscan.add_argument(
+    '--bus-window', action='store', dest='bus_window', type=int, metavar='N',
+    default=8, help='Probe up to N bus targets at the same time on each tunnel')
+pscan.add_argument(
+    '--fingerprint-window', action='store', dest='fingerprint_window', type=int, metavar='N',
+    default=4, help='Fingerprint up to N alive bus devices at the same time on each tunnel')
+pscan.add_argument(
+    '--fingerprint-tunnels', action='store', dest='fingerprint_tunnels', type=int, metavar='N',
+    default=0, help='Use N tunnels of each gateway only for fingerprinting (0 shares all tunnels)')
+pscan.add_argument(
+    '--bus-priority', action='store', dest='bus_priority', choices=BUS_PRIORITIES,
+    default='sweep', help='On shared tunnels, fingerprint after the liveness sweep or right away')
+pscan.add_argument(
+    '--incremental', action='store_true', dest='incremental',
+    default=False, help='Only bus scan gateways that are new or changed since the '
+                        'previous scans in --output-sqlite, and print the changes')
+pscan.add_argument(
+    '--ttl', action='store', dest='ttl', type=float, metavar='SECONDS',
+    default=86400, help='Bus scan unchanged gateways again after SECONDS in incremental mode')
+pscan.add_argument(
+    '--round-delay', action='store', dest='round_delay', type=float, metavar='SECONDS',
+    default=0, help='Delay between rounds of description requests')
+pscan.add_argument(
+    '--rate', action='store', dest='rate', type=int, metavar='PPS',
+    default=0, help='Limit description requests to PPS packets per second (0: no limit)')
+pscan.add_argument(
+    '--adaptive-rate', action='store_true', dest='adaptive_rate',
+    default=False, help='Adapt the rate to the timeouts, starting at --rate (default 100)')
+pscan.add_argument(
+    '--max-rate', action='store', dest='max_rate', type=int, metavar='PPS',
+    default=10000, help='Upper limit for --adaptive-rate')
 
 psearch = SUBARGS.add_parser('search',
                              help='Search for KNXnet/IP gateways on the local network')
@@ -92,6 +171,49 @@ pmonitor.add_argument(
     '--group-monitor', action='store_true', dest='group_monitor_mode',
     default=False, help='Monitor group instead of messages via KNXnet/IP gateway')
 
+pquery = SUBARGS.add_parser('query', help='Query results stored with --output-sqlite')
+pquery.add_argument(
+    'database', help='SQLite database of scan results')
+pquery.add_argument(
+    '--serial', action='store', dest='serial',
+    default=None, help='Device serial of gateways or bus devices (e.g. 00FA12345678)')
+pquery.add_argument(
+    '--address', action='store', dest='address',
+    default=None, help='KNX address of gateways or bus devices')
+pquery.add_argument(
+    '--manufacturer', action='store', dest='manufacturer',
+    default=None, help='Manufacturer of bus devices')
+pquery.add_argument(
+    '--medium', action='store', dest='medium',
+    default=None, help='Medium of bus devices (e.g. TP1)')
+pquery.add_argument(
+    '--project-id', action='store', dest='project_id', type=int,
+    default=None, help='Project install identifier of gateways')
+pquery.add_argument(
+    '--run', action='store', dest='run', type=int,
+    default=None, help='Only show results of this scan run')
+
+
+def query(args):
+    """Print the stored gateways and bus devices that match the query arguments."""
+    store = ResultStore(args.database, run=False)
+    try:
+        if args.manufacturer is None and args.medium is None:
+            for g in store.find_gateways(run=args.run, device_serial=args.serial,
+                                         knx_address=args.address,
+                                         project_install_identifier=args.project_id):
+                print('run {run}  gateway {host}:{port}  {knx_address}  serial {device_serial}  '
+                      'project {project_install_identifier}  {friendly_name}'.format(**dict(g)))
+        if args.project_id is None:
+            for d in store.find_bus_devices(run=args.run, device_serial=args.serial,
+                                            knx_address=args.address,
+                                            manufacturer=args.manufacturer,
+                                            medium=args.medium):
+                print('run {run}  gateway {host}:{port}  device {knx_address}  serial {device_serial}  '
+                      '{manufacturer}  {medium}  {device_type}'.format(**dict(d)))
+    finally:
+        store.close()
+
 
 def main():
     args = ARGS.parse_args()
@@ -100,9 +222,16 @@ def main():
     logging.basicConfig(level=levels[min(args.level, len(levels) - 1)], format=format)
     loop = asyncio.get_event_loop()
 
+    if args.cmd == 'query':
+        query(args)
+        return
+
     if hasattr(args, 'targets'):
-        targets = Targets(args.targets, args.port)
-        knxmap = KnxMap(targets=targets.targets, max_workers=args.workers)
+        targets = Targets(args.targets, args.port,
+                          order=getattr(args, 'scan_order', 'sequential'),
+                          seed=getattr(args, 'seed', None),
+                          start=getattr(args, 'start_index', 0))
+        knxmap = KnxMap(targets=targets, max_workers=args.workers)
     else:
         knxmap = KnxMap(max_workers=args.workers)
 
@@ -124,23 +253,67 @@ def main():
                 routing=args.routing,
                 desc_timeout=args.timeout,
                 desc_retries=args.retries,
+                timeout_floor=args.min_timeout,
+                timeout_ceiling=args.max_timeout,
                 iface=args.iface))
         elif args.cmd == 'monitor':
             loop.run_until_complete(knxmap.monitor(
                 group_monitor_mode=args.group_monitor_mode))
         elif args.cmd == 'brute':
             loop.run_until_complete(knxmap.brute(
-                bus_target=KnxTargets(args.bus_target)))
+                bus_target=KnxTargets(args.bus_target).targets))
         elif args.cmd == 'scan':
-            LOGGER.info('Scanning {} target(s)'.format(len(targets.targets)))
+            if (args.checkpoint or args.resume) and args.processes > 1:
+                LOGGER.error('Checkpoints are not supported with --processes')
+                sys.exit(1)
+            if args.incremental and (not args.output_sqlite or args.processes > 1):
+                LOGGER.error('--incremental requires --output-sqlite and no --processes')
+                sys.exit(1)
+            if args.resume:
+                if not knxmap.load_checkpoint(args.resume):
+                    sys.exit(1)
+                targets = knxmap.targets
+            for fmt in ('jsonl', 'csv', 'binary'):
+                path = getattr(args, 'output_' + fmt)
+                if path:
+                    knxmap.sinks.append(OUTPUT_FORMATS[fmt](path))
+            if args.output_sqlite:
+                knxmap.sinks.append(ResultStore(args.output_sqlite, description=' '.join(sys.argv[1:])))
+            LOGGER.info('Scanning {} target(s)'.format(len(targets)))
+            if targets.order == 'random':
+                LOGGER.info('Random scan order, seed: {}'.format(targets.seed))
             bus_targets = KnxTargets(args.bus_targets)
-            loop.run_until_complete(knxmap.scan(
+            rate = args.rate
+            if args.adaptive_rate and not rate:
+                rate = 100
+            scan_args = dict(
                 desc_timeout=args.timeout,
                 desc_retries=args.retries,
+                desc_rate=rate,
+                desc_adaptive_rate=args.adaptive_rate,
+                desc_max_rate=args.max_rate,
+                desc_round_delay=args.round_delay,
+                timeout_floor=args.min_timeout,
+                timeout_ceiling=args.max_timeout,
                 bus_targets=bus_targets.targets,
                 bus_info=args.bus_info,
-                auth_key=args.auth_key))
+                auth_key=args.auth_key,
+                checkpoint=args.checkpoint or args.resume,
+                checkpoint_interval=args.checkpoint_interval,
+                incremental=args.incremental,
+                ttl=args.ttl,
+                max_tunnels=args.tunnels,
+                bus_window=args.bus_window,
+                fingerprint_window=args.fingerprint_window,
+                fingerprint_tunnels=args.fingerprint_tunnels,
+                bus_priority=args.bus_priority)
+            if args.processes > 1:
+                loop.run_until_complete(knxmap.scan_processes(args.processes, **scan_args))
+            else:
+                loop.run_until_complete(knxmap.scan(**scan_args))
     except KeyboardInterrupt:
+        # Keep the progress of the scan
+        knxmap.save_checkpoint()
         for t in asyncio.Task.all_tasks():
             t.cancel()
         loop.run_forever()
@@ -151,6 +324,7 @@ def main():
             for p in knxmap.bus_protocols:
                 p.knx_tunnel_disconnect()
     finally:
+        knxmap.close_sinks()
         loop.close()
 
 
@@ -2,4 +2,6 @@ from libknxmap.data.constants import *
 from .core import *
 from .gateway import *
 from .messages import *
+from .output import *
+from .store import *
 from .targets import *
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Coalesced memory reads of bus devices. Requested memory ranges are merged
+and read with as few A_Memory_Read requests as the maximum APDU length of the
+device allows, the requested fields are sliced out of the merged buffer."""
+import asyncio
+import logging
+
+__all__ = ['KnxMemoryReader',
+           'STANDARD_APDU_LENGTH']
+
+LOGGER = logging.getLogger(__name__)
+
+# The longest APDU of a standard frame, devices that support
+# extended frames report a larger PID_MAX_APDULENGTH
+STANDARD_APDU_LENGTH = 15
+# An A_Memory_Response carries the APCI and the memory address besides the data
+MEMORY_RESPONSE_OVERHEAD = 3
+# The number of octets is a 6 bit field
+MAX_MEMORY_READ = 63
+
+
+class KnxMemoryReader:
+    """Read several memory ranges of a bus device via a KnxTunnelConnection.
+
+    Ranges are added with add() and read at once with read(). Overlapping
+    ranges, and ranges with gaps smaller than a single read, are merged into
+    spans that are read in chunks of the largest size the APDU length allows."""
+
+    def __init__(self, protocol, target, max_apdu_length=STANDARD_APDU_LENGTH):
+        self.protocol = protocol
+        self.target = target
+        self.read_size = max(1, min(MAX_MEMORY_READ, max_apdu_length - MEMORY_RESPONSE_OVERHEAD))
+        self.ranges = list()
+        # memory is a dict containing the octet for each address that has been read
+        self.memory = dict()
+        self.requests = 0
+
+    def add(self, memory_address, read_count=1):
+        """Add the range of read_count octets at memory_address."""
+        self.ranges.append((memory_address, read_count))
+
+    def spans(self):
+        """Return the merged ranges as a sorted list of (address, count) tuples."""
+        spans = list()
+        for address, count in sorted(self.ranges):
+            if spans and address <= spans[-1][0] + spans[-1][1] + self.read_size:
+                start, length = spans[-1]
+                spans[-1] = (start, max(length, address + count - start))
+            else:
+                spans.append((address, count))
+        return spans
+
+    def chunks(self):
+        """Return the (address, count) tuples of the A_Memory_Read requests."""
+        chunks = list()
+        for address, count in self.spans():
+            end = address + count
+            while address < end:
+                chunks.append((address, min(self.read_size, end - address)))
+                address += self.read_size
+        return chunks
+
+    @asyncio.coroutine
+    def read(self):
+        """Read all added ranges. Devices may return less octets than requested,
+        e.g. for protected memory, only the returned octets are kept."""
+        for address, count in self.chunks():
+            data = yield from self.protocol.apci_memory_read(
+                self.target,
+                memory_address=address,
+                read_count=count)
+            self.requests += 1
+            if not data:
+                continue
+            for offset, value in enumerate(data[:count]):
+                self.memory[address + offset] = value
+        LOGGER.debug('Read {} octet(s) of {} range(s) with {} request(s)'.format(
+            len(self.memory), len(self.ranges), self.requests))
+        return self.memory
+
+    def get(self, memory_address, read_count=1):
+        """Return read_count octets at memory_address, or False if any of
+        them could not be read."""
+        try:
+            return bytes(self.memory[a] for a in range(memory_address, memory_address + read_count))
+        except KeyError:
+            return False
+
+    def dump(self, memory_address, read_count):
+        """Return all octets of a range that could be read, in order."""
+        return bytes(self.memory[a] for a in range(memory_address, memory_address + read_count)
+                     if a in self.memory)
@@ -19,6 +19,7 @@ class KnxBusMonitor(KnxTunnelConnection):
         self.tunnel_established = False
         self.communication_channel = None
         self.sequence_count = 0
+        self.encoder = None
 
     def connection_made(self, transport):
         self.transport = transport
@@ -48,7 +49,11 @@ class KnxBusMonitor(KnxTunnelConnection):
             if not knx_message.ERROR:
                 if not self.tunnel_established:
                     self.tunnel_established = True
-                self.communication_channel = knx_message.body.get('communication_channel_id')
+                self.communication_channel = knx_message.communication_channel
+                self.encoder = KnxTunnelEncoder(
+                    communication_channel=self.communication_channel,
+                    knx_source=knx_message.data_block.knx_address or '0.0.0',
+                    sockname=self.sockname)
             else:
                 if not self.group_monitor and knx_message.ERROR_CODE == 0x23:
                     LOGGER.error('Device does not support BUSMONITOR, try --group-monitor instead')
@@ -57,13 +62,11 @@ class KnxBusMonitor(KnxTunnelConnection):
                 self.transport.close()
                 self.future.set_result(None)
         elif isinstance(knx_message, KnxTunnellingRequest):
+            # The message code is available without decoding the cEMI frame
+            if knx_message.cemi_message_code in [CEMI_MSG_CODES.get('L_Data.con'),
+                                                 CEMI_MSG_CODES.get('L_Data.ind')]:
+                self.transport.sendto(self.encoder.tunnelling_ack(knx_message.sequence_count))
             self.print_message(knx_message)
-            if CEMI_PRIMITIVES[knx_message.body.get('cemi').get('message_code')] == 'L_Data.con' or \
-                    CEMI_PRIMITIVES[knx_message.body.get('cemi').get('message_code')] == 'L_Data.ind':
-                tunnelling_ack = KnxTunnellingAck(
-                    communication_channel=knx_message.body.get('communication_channel_id'),
-                    sequence_count=knx_message.body.get('sequence_counter'))
-                self.transport.sendto(tunnelling_ack.get_message())
         elif isinstance(knx_message, KnxTunnellingAck):
             self.print_message(knx_message)
         elif isinstance(knx_message, KnxConnectionStateResponse):
@@ -81,24 +84,27 @@ class KnxBusMonitor(KnxTunnelConnection):
     def print_message(self, message):
         """A generic message printing function. It defines a format for the monitoring modes."""
         assert isinstance(message, KnxTunnellingRequest)
+        cemi = message.cemi
+        if not cemi:
+            return
         if self.group_monitor:
             format = ('[ chan_id: {chan_id}, seq_no: {seq_no}, message_code: {msg_code}, '
                       'source_addr: {src_addr}, dest_addr: {dst_addr}, tpci_type: {tpci_type}, '
                       'tpci_seq: {tpci_seq}, apci_type: {apci_type}, apci_data: {apci_data} ]').format(
-                chan_id=message.body.get('communication_channel_id'),
-                seq_no=message.body.get('sequence_counter'),
-                msg_code=CEMI_PRIMITIVES[message.body.get('cemi').get('message_code')],
-                src_addr=message.parse_knx_address(message.body.get('cemi').get('knx_source')),
-                dst_addr=message.parse_knx_group_address(message.body.get('cemi').get('knx_destination')),
-                tpci_type=_CEMI_TPCI_TYPES.get(message.body.get('cemi').get('tpci').get('type')),
-                tpci_seq=message.body.get('cemi').get('tpci').get('sequence'),
-                apci_type=_CEMI_APCI_TYPES.get(message.body.get('cemi').get('apci').get('type')),
-                apci_data=message.body.get('cemi').get('apci').get('data'))
+                chan_id=message.communication_channel,
+                seq_no=message.sequence_count,
+                msg_code=CEMI_PRIMITIVES[message.cemi_message_code],
+                src_addr=message.parse_knx_address(cemi.knx_source),
+                dst_addr=message.parse_knx_group_address(cemi.knx_destination),
+                tpci_type=_CEMI_TPCI_TYPES.get(cemi.tpci_type),
+                tpci_seq=cemi.tpci_sequence,
+                apci_type=_CEMI_APCI_TYPES.get(cemi.apci_type),
+                apci_data=cemi.apci_data)
         else:
             format = ('[ chan_id: {chan_id}, seq_no: {seq_no}, message_code: {msg_code}, '
                       'raw_frame: {raw_frame} ]').format(
-                chan_id=message.body.get('communication_channel_id'),
-                seq_no=message.body.get('sequence_counter'),
-                msg_code=CEMI_PRIMITIVES[message.body.get('cemi').get('message_code')],
-                raw_frame=message.body.get('cemi').get('raw_frame'))
+                chan_id=message.communication_channel,
+                seq_no=message.sequence_count,
+                msg_code=CEMI_PRIMITIVES[message.cemi_message_code],
+                raw_frame=cemi.raw_frame)
         LOGGER.info(format)
@@ -0,0 +1,226 @@
+"""Discovery of the interface objects and properties of bus devices. Instead
+of trying to read every known property, the properties a device supports
+are enumerated via A_PropertyDescription_Read and only their values are read."""
+import asyncio
+import codecs
+import collections
+import logging
+import struct
+
+from libknxmap.data.constants import *
+from libknxmap.messages import *
+from libknxmap.bus.memory import STANDARD_APDU_LENGTH
+
+__all__ = ['KnxPropertyScanner',
+           'PropertyDescription']
+
+LOGGER = logging.getLogger(__name__)
+
+PropertyDescription = collections.namedtuple(
+    'PropertyDescription', ['object_index', 'property_id', 'property_index', 'writable',
+                            'datatype', 'max_elements', 'read_level', 'write_level'])
+
+_PROPERTY_DESCRIPTION = struct.Struct('!BBBBHB')
+# An A_PropertyValue_Response carries the APCI, object index, property ID,
+# number of elements and start index besides the data
+PROPERTY_RESPONSE_OVERHEAD = 5
+# The number of elements is a 4 bit field
+MAX_PROPERTY_ELEMENTS = 15
+
+_PROPERTY_NAMES = {object_type: {v: k for k, v in props.items()}
+                   for object_type, props in OBJECTS.items()}
+
+
+def property_name(object_type, property_id):
+    """Return the name of a property without the PID_ prefix. Properties
+    below 50 have the same meaning in all objects."""
+    name = _PROPERTY_NAMES.get(object_type, {}).get(property_id)
+    if not name and property_id < 50:
+        name = _PROPERTY_NAMES[0].get(property_id)
+    if not name:
+        return 'PROPERTY_{}'.format(property_id)
+    return name.replace('PID_', '')
+
+
+class KnxPropertyScanner:
+    """Read the properties of bus devices via a KnxTunnelConnection.
+
+    The objects and properties of a device are discovered with
+    A_PropertyDescription_Read requests, which are cached per device type,
+    so further devices of the same type only read values. Array properties
+    are read with as many elements per request as the APDU length allows.
+    Devices that have no property descriptions are read by trying all
+    properties in OBJECTS. Only completed discoveries are cached, if a
+    request is not answered the next device of the same type discovers again."""
+    MAX_OBJECTS = 32
+
+    def __init__(self):
+        # cache is a dict containing a future of the list of PropertyDescriptions for each
+        # device type, its result is None for device types that do not support property descriptions
+        # and False if the discovery failed, the entry is removed in that case
+        self.cache = dict()
+
+    @staticmethod
+    def parse_description(data):
+        """Parse the data of an A_PropertyDescription_Response. Returns
+        None for negative responses of properties that do not exist."""
+        if not data or len(data) < _PROPERTY_DESCRIPTION.size:
+            return None
+        object_index, property_id, property_index, datatype, max_elements, access = \
+            _PROPERTY_DESCRIPTION.unpack_from(data)
+        max_elements &= 0x0fff
+        if not property_id or not max_elements:
+            return None
+        return PropertyDescription(object_index, property_id, property_index,
+                                   bool(datatype & 0x80), datatype & 0x3f, max_elements,
+                                   access >> 4, access & 0x0f)
+
+    @asyncio.coroutine
+    def discover(self, protocol, target):
+        """Return the PropertyDescriptions of all properties of target, None
+        if target answers that it has no property descriptions, or False if
+        a request has not been answered and the descriptions are incomplete."""
+        descriptions = list()
+        for object_index in range(self.MAX_OBJECTS):
+            count = len(descriptions)
+            # The property index is an octet
+            for property_index in range(0x100):
+                data = yield from protocol.apci_property_description_read(
+                    target,
+                    object_index=object_index,
+                    property_index=property_index)
+                if data is False:
+                    return False
+                description = self.parse_description(data)
+                if not description:
+                    break
+                descriptions.append(description)
+            if len(descriptions) == count:
+                # Objects are numbered consecutively
+                break
+        return descriptions or None
+
+    @asyncio.coroutine
+    def read_value(self, protocol, target, description, max_apdu_length=STANDARD_APDU_LENGTH):
+        """Read all elements of a property. Returns the concatenated
+        elements or False if the property could not be read."""
+        count = 1
+        if description.max_elements > 1:
+            # Element 0 contains the current number of elements
+            ret = yield from protocol.apci_property_value_read(
+                target,
+                property_id=description.property_id,
+                object_index=description.object_index,
+                start_index=0)
+            if not ret:
+                return False
+            count = min(int.from_bytes(ret, 'big'), description.max_elements)
+        size = PROPERTY_DATATYPE_SIZES.get(description.datatype)
+        per_read = 1
+        if size:
+            per_read = max(1, min(MAX_PROPERTY_ELEMENTS,
+                                  (max_apdu_length - PROPERTY_RESPONSE_OVERHEAD) // size))
+        value = b''
+        start = 1
+        while start <= count:
+            ret = yield from protocol.apci_property_value_read(
+                target,
+                property_id=description.property_id,
+                object_index=description.object_index,
+                num_elements=min(per_read, count - start + 1),
+                start_index=start)
+            if not ret:
+                break
+            value += ret
+            start += per_read
+        return value or False
+
+    @asyncio.coroutine
+    def read_known(self, protocol, target):
+        """Try to read every property in OBJECTS."""
+        properties = collections.OrderedDict()
+        for object_index, props in OBJECTS.items():
+            x = collections.OrderedDict()
+            for k, v in props.items():
+                ret = yield from protocol.apci_property_value_read(
+                    target,
+                    property_id=v,
+                    object_index=object_index)
+                if ret:
+                    x[k.replace('PID_', '')] = codecs.encode(ret, 'hex')
+            if x:
+                properties[OBJECT_TYPES.get(object_index)] = x
+        return properties
+
+    @asyncio.coroutine
+    def read(self, protocol, target, device_type):
+        """Return the properties of target as a dict of objects, each a dict
+        of hex encoded property values. device_type is the key of the cache,
+        e.g. the device descriptor and the manufacturer."""
+        while True:
+            future = self.cache.get(device_type)
+            if future is not None:
+                descriptions = yield from asyncio.shield(future, loop=protocol.loop)
+                if descriptions is not False:
+                    break
+                # The discovery failed or has been cancelled, discover with this device
+                continue
+            # Devices of the same type that are scanned meanwhile wait for this discovery
+            future = self.cache[device_type] = asyncio.Future(loop=protocol.loop)
+            descriptions = False
+            try:
+                descriptions = yield from self.discover(protocol, target)
+            finally:
+                # Waiting devices discover again if this discovery is not completed,
+                # a CancelledError is raised after waking them up
+                if descriptions is False and self.cache.get(device_type) is future:
+                    del self.cache[device_type]
+                future.set_result(descriptions)
+            if descriptions is False:
+                LOGGER.debug('Discovering the properties of {} failed'.format(
+                    KnxMessage.parse_knx_address(target)))
+            else:
+                LOGGER.debug('{} supports {} properties'.format(
+                    KnxMessage.parse_knx_address(target), len(descriptions or ())))
+            break
+        if not descriptions:
+            properties = yield from self.read_known(protocol, target)
+        else:
+            properties = yield from self.read_described(protocol, target, descriptions)
+        return properties
+
+    @asyncio.coroutine
+    def read_described(self, protocol, target, descriptions):
+        """Read the values of the properties in descriptions."""
+        max_apdu_length = STANDARD_APDU_LENGTH
+        values = dict()
+        for description in descriptions:
+            if description.object_index == 0 and \
+                    description.property_id == DEVICE_OBJECTS.get('PID_MAX_APDULENGTH'):
+                # Read the maximum APDU length first, so arrays can be read with extended frames
+                ret = yield from self.read_value(protocol, target, description)
+                if ret:
+                    values[description] = ret
+                    max_apdu_length = max(STANDARD_APDU_LENGTH, int.from_bytes(ret[:2], 'big'))
+        for description in descriptions:
+            if description not in values:
+                values[description] = yield from self.read_value(
+                    protocol, target, description, max_apdu_length)
+
+        # Name the objects by their object type
+        object_types = dict()
+        for description in descriptions:
+            if description.property_id == DEVICE_OBJECTS.get('PID_OBJECT_TYPE') and \
+                    values[description]:
+                object_types[description.object_index] = int.from_bytes(values[description][:2], 'big')
+
+        properties = collections.OrderedDict()
+        for description in descriptions:
+            value = values[description]
+            if not value:
+                continue
+            object_type = object_types.get(description.object_index, description.object_index)
+            x = properties.setdefault(
+                OBJECT_TYPES.get(object_type, 'OBJECT_{}'.format(object_type)), collections.OrderedDict())
+            x[property_name(object_type, description.property_id)] = codecs.encode(value, 'hex')
+        return properties
@@ -1,21 +1,69 @@
 import asyncio
+import collections
 import logging
+import struct
 
 from libknxmap.data.constants import *
 from libknxmap.messages import *
+from libknxmap.gateway import RttEstimator
 
 LOGGER = logging.getLogger(__name__)
 
+# The number of data bytes of a response that echo the parameters of its
+# request: the object index and property ID, or the memory address
+RESPONSE_ECHO_LENGTHS = {
+    CEMI_APCI_TYPES.get('A_PropertyValue_Response'): 2,
+    CEMI_APCI_TYPES.get('A_PropertyDescription_Response'): 1,
+    CEMI_APCI_TYPES.get('A_Memory_Response'): 2}
+
+
+def confirmation(tpci_type, sequence=0):
+    """Return what a request waits for if it only waits for its L_Data.con.
+    A L_Data.con repeats the TPCI of the confirmed request."""
+    return 'L_Data.con', tpci_type, sequence
+
 
 class KnxTunnelConnection(asyncio.DatagramProtocol):
     """Communicate with bus devices via a KNX gateway using TunnellingRequests. A tunneling
-    connection is always used if the bus destination is a physical KNX address."""
-
-    def __init__(self, future, connection_type=0x04, layer_type='TUNNEL_LINKLAYER', loop=None):
+    connection is always used if the bus destination is a physical KNX address.
+
+    Bus targets are individual addresses packed as ints, they are only formatted
+    as strings for output.
+
+    Waiting periods for responses are derived from the round trip times of the
+    requests, which are tracked in a RttEstimator that can be shared by all
+    connections to the same gateway.
+
+    Responses are delivered to the future of their target as soon as they
+    arrive. Each request waits for a response type and the request parameters
+    that the response echoes, or for the L_Data.con of its TPCI, so a late
+    response never resolves a different request. Each request times out after
+    the RTT-based timeout, counted from the L_Data.con for requests with a
+    response. Response frames that arrive while no matching request is waiting
+    are kept for a matching request that is sent later, up to RESPONSE_MAX_AGE
+    seconds and RESPONSE_MAX_COUNT frames. The counts of matched, late matched and dropped responses are
+    available via response_stats().
+
+    Only one request is in flight at a time: the next request is sent after
+    the TUNNELLING_ACK (or DEVICE_CONFIGURATION_ACK) of the previous one. A
+    request without ACK is repeated once after ACK_TIMEOUT seconds and dropped
+    if it is still not acknowledged. The waiting period of a request starts
+    when it is sent, so several targets can still wait for their L_Data.con
+    at the same time."""
+
+    RESPONSE_MAX_AGE = 10
+    RESPONSE_MAX_COUNT = 256
+    ACK_TIMEOUT = 1
+    ACK_REPEATS = 1
+
+    def __init__(self, future, connection_type=0x04, layer_type='TUNNEL_LINKLAYER', loop=None,
+                 rtt=None):
         self.future = future
         self.connection_type = connection_type
         self.layer_type = layer_type
         self.target_futures = dict()
+        self.target_expects = dict()  # the response (APCI type, echo) or confirmation each future waits for
+        self.target_timers = dict()  # the timer that expires each future
         self.loop = loop or asyncio.get_event_loop()
         self.transport = None
         self.tunnel_established = False
@@ -23,14 +71,21 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
         self.sequence_count = 0  # sequence counter in KNX body
         self.tpci_seq_counts = dict()  # NCD/NPD counter for each TPCI connection
         self.knx_source_address = None  # TODO: is the actual address needed? or just 0.0.0?
-        self.response_queue = list()
+        self.encoder = None  # KnxTunnelEncoder for the established communication channel
+        # (target, APCI type, echo) -> (arrival time, KnxTunnellingRequest) of unmatched responses
+        self.unmatched_responses = collections.OrderedDict()
+        self.stats = collections.Counter()
+        self.configuration_future = None  # waits for a M_PropRead.con
+        self.rtt = rtt or RttEstimator(initial=3)
+        self.request_times = dict()  # send time of the last request for each target
+        self.send_queue = collections.deque()  # (sequence, frame, target, future) of unsent requests
+        self.ack_wait = None  # [sequence, frame, repeats, timer] of the request in flight
 
     def connection_made(self, transport):
         """The connection setup function that takes care of:
 
         * Sending a KnxConnectRequest
-        * Schedule KnxConnectionStateRequests
-        * Schedule response queue polling"""
+        * Schedule KnxConnectionStateRequests"""
         self.transport = transport
         self.peername = self.transport.get_extra_info('peername')
         self.sockname = self.transport.get_extra_info('sockname')
@@ -39,52 +94,100 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
             connection_type=self.connection_type,
             layer_type=self.layer_type)
         self.transport.sendto(connect_request.get_message())
+        self.request_times[None] = self.loop.time()
         # Schedule CONNECTIONSTATE_REQUEST to keep the connection alive
         self.loop.call_later(50, self.knx_keep_alive)
-        self.loop.call_later(4, self.poll_response_queue)
-
-    def poll_response_queue(self):
-        """Check if there if there is a KNX message for a
-        target that arrived out-of-band."""
-        if self.response_queue:
-            for response in self.response_queue:
-                knx_src = response.parse_knx_address(response.body.get('cemi').get('knx_source'))
-                knx_dst = response.parse_knx_address(response.body.get('cemi').get('knx_destination'))
-                if not knx_src and not knx_dst:
-                    continue
-
-                if knx_dst in self.target_futures.keys():
-                    if not self.target_futures[knx_dst].done():
-                        self.target_futures[knx_dst].set_result(response)
-                    del self.target_futures[knx_dst]
-                elif knx_src in self.target_futures.keys():
-                    if not self.target_futures[knx_src].done():
-                        self.target_futures[knx_src].set_result(response)
-                    del self.target_futures[knx_src]
-        # Reschedule polling
-        self.loop.call_later(2, self.poll_response_queue)
+
+    def connection_lost(self, exc):
+        """Stop repeating the request in flight and expire the futures of
+        requests that are never sent."""
+        if self.ack_wait:
+            self.ack_wait[3].cancel()
+            self.ack_wait = None
+        while self.send_queue:
+            _, _, target, f = self.send_queue.popleft()
+            if target is not None:
+                self.expire_target(target, f)
+
+    def sample_rtt(self, target):
+        """Update the RTT estimation with the response time of the last
+        request for target. Only the first response of a request is used."""
+        sent = self.request_times.pop(target, None)
+        if sent is not None:
+            self.rtt.update(self.loop.time() - sent)
+
+    def resolve_target(self, target, value):
+        """Set value as the result of the future that waits for target."""
+        future = self.target_futures.pop(target)
+        self.target_expects.pop(target, None)
+        timer = self.target_timers.pop(target, None)
+        if timer:
+            timer.cancel()
+        if not future.done():
+            future.set_result(value)
 
     def process_target(self, target, value, knx_msg=None):
-        """When a L_Data.con NDP request request arrives after
-        e.g. a A_DeviceDescriptor_Read, check if we get a
-        L_Data.ind NDP request with the actual data.
+        """Deliver value to the request that waits for target. A confirmation
+        (True or False for the L_Data.con knx_msg) only resolves a request that
+        waits for the confirmation of the same TPCI. A response frame (a
+        L_Data.ind NDP) only resolves a request that waits for its APCI type
+        and echo, otherwise it is kept for a later request.
 
         Note: Between a L_Data.con NDP and a L_Data.ind NDP
         there will most likely (pretty sure) be a L_Data.ind
         NCD request."""
-        if target in self.target_futures.keys():
-            if not self.target_futures[target].done():
-                self.target_futures[target].set_result(value)
-                del self.target_futures[target]
-        else:
-            if isinstance(value, KnxMessage):
-                # If value is a KnxMessage itself,
-                # jsut add it to the response_queue.
-                self.response_queue.append(value)
-            elif knx_msg and isinstance(knx_msg, KnxMessage):
-                # If knx_msg is set, append it to
-                # the response_queue.
-                self.response_queue.append(knx_msg)
+        expect = self.target_expects.get(target)
+        if not isinstance(value, KnxMessage):
+            cemi = knx_msg.cemi
+            if target in self.target_futures and \
+                    expect == confirmation(cemi.tpci_type, cemi.tpci_sequence):
+                self.resolve_target(target, value)
+            return
+        apci_type = value.cemi.apci_type
+        echo = bytes(value.cemi.data[:RESPONSE_ECHO_LENGTHS.get(apci_type, 0)]) \
+            if value.cemi.data else b''
+        if target in self.target_futures and expect == (apci_type, echo):
+            self.stats['matched'] += 1
+            self.resolve_target(target, value)
+            return
+        self.expire_responses()
+        key = (target, apci_type, echo)
+        if key in self.unmatched_responses:
+            # Only the most recent response is kept
+            del self.unmatched_responses[key]
+            self.stats['dropped'] += 1
+        self.unmatched_responses[key] = (self.loop.time(), value)
+        if len(self.unmatched_responses) > self.RESPONSE_MAX_COUNT:
+            self.unmatched_responses.popitem(last=False)
+            self.stats['dropped'] += 1
+
+    def expire_responses(self):
+        """Drop unmatched responses that are older than RESPONSE_MAX_AGE."""
+        deadline = self.loop.time() - self.RESPONSE_MAX_AGE
+        while self.unmatched_responses:
+            key, (arrived, _) = next(iter(self.unmatched_responses.items()))
+            if arrived > deadline:
+                break
+            del self.unmatched_responses[key]
+            self.stats['dropped'] += 1
+
+    def expire_target(self, target, future):
+        """Resolve future with None if it still waits for a response of target."""
+        if self.target_futures.get(target) is future:
+            self.stats['timeouts'] += 1
+            self.resolve_target(target, None)
+
+    def response_stats(self):
+        """Return the counts of responses that have been matched to their
+        request right away or late, that have been dropped or are still
+        unmatched, and of requests that timed out."""
+        self.expire_responses()
+        return {
+            'matched': self.stats['matched'],
+            'matched_late': self.stats['matched_late'],
+            'dropped': self.stats['dropped'],
+            'unmatched': len(self.unmatched_responses),
+            'timeouts': self.stats['timeouts']}
 
     def datagram_received(self, data, addr):
         """This function gets called whenever a data packet is received. It
@@ -98,7 +201,7 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
             self.transport.close()
             self.future.set_result(None)
             return
-        knx_service_type = knx_msg.header.get('service_type') >> 8
+        knx_service_type = knx_msg.service_type >> 8
         if knx_service_type is 0x02:  # Core
             self.handle_core_services(knx_msg)
         elif knx_service_type is 0x03:  # Device Management
@@ -110,11 +213,17 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
 
     def handle_core_services(self, knx_msg):
         if isinstance(knx_msg, KnxConnectResponse):
+            self.sample_rtt(None)
             if not knx_msg.ERROR:
                 if not self.tunnel_established:
                     self.tunnel_established = True
-                self.communication_channel = knx_msg.body.get('communication_channel_id')
-                self.knx_source_address = knx_msg.body.get('data_block').get('knx_address')
+                self.communication_channel = knx_msg.communication_channel
+                self.knx_source_address = knx_msg.data_block.knx_address
+                # Device management connections have no individual address
+                self.encoder = KnxTunnelEncoder(
+                    communication_channel=self.communication_channel,
+                    knx_source=self.knx_source_address or '0.0.0',
+                    sockname=self.sockname)
                 self.future.set_result(True)
             else:
                 LOGGER.error(knx_msg.ERROR)
@@ -134,35 +243,52 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
             if not self.future.done():
                 self.future.set_result(None)
         else:
-            LOGGER.error('Unknown Core Message: {}'.format(knx_msg.header.get('service_type')))
+            LOGGER.error('Unknown Core Message: {}'.format(knx_msg.service_type))
 
     def handle_configuration_services(self, knx_msg):
         if isinstance(knx_msg, KnxDeviceConfigurationRequest):
             conf_ack = KnxDeviceConfigurationAck(
-                communication_channel=knx_msg.body.get('communication_channel_id'),
-                sequence_count=knx_msg.body.get('sequence_counter'))
+                communication_channel=knx_msg.communication_channel,
+                sequence_count=knx_msg.sequence_count)
             self.transport.sendto(conf_ack.get_message())
+            if knx_msg.cemi_message_code == CEMI_MSG_CODES.get('M_PropRead.con') and \
+                    self.configuration_future and not self.configuration_future.done():
+                self.configuration_future.set_result(knx_msg)
+        elif isinstance(knx_msg, KnxDeviceConfigurationAck):
+            LOGGER.debug('Device configuration ACK received')
+            self.ack_received(knx_msg.sequence_count)
         else:
-            LOGGER.error('Unknown Configuration Message: {}'.format(knx_msg.header.get('service_type')))
+            LOGGER.error('Unknown Configuration Message: {}'.format(knx_msg.service_type))
 
     def handle_tunnel_services(self, knx_msg):
         if isinstance(knx_msg, KnxTunnellingRequest):
-            knx_src = knx_msg.parse_knx_address(knx_msg.body.get('cemi').get('knx_source'))
-            knx_dst = knx_msg.parse_knx_address(knx_msg.body.get('cemi').get('knx_destination'))
-            cemi_msg_code = knx_msg.body.get('cemi').get('message_code')
-            cemi_tpci_type = knx_msg.body.get('cemi').get('tpci').get('type')
-            cemi_apci_type = None
-            if knx_msg.body.get('cemi').get('apci'):
-                cemi_apci_type = knx_msg.body.get('cemi').get('apci').get('type')
-
-            LOGGER.debug(('[KnxTunnellingRequest] SRC: {knx_src}, DST: {knx_dst}, CODE: {msg_code}, '
-                          'SEQ: {seq}. TPCI: {tpci}, APCI: {apci}').format(
-                knx_src=knx_src,
-                knx_dst=knx_dst,
-                msg_code=_CEMI_MSG_CODES.get(cemi_msg_code),
-                seq=knx_msg.body.get('cemi').get('tpci').get('sequence'),
-                tpci=_CEMI_TPCI_TYPES.get(cemi_tpci_type),
-                apci=_CEMI_APCI_TYPES.get(cemi_apci_type)))
+            cemi_msg_code = knx_msg.cemi_message_code
+            if cemi_msg_code not in [CEMI_MSG_CODES.get('L_Data.con'), CEMI_MSG_CODES.get('L_Data.ind')]:
+                # Other frames are not processed, so
+                # there is no need to decode the cEMI.
+                return
+
+            # If we receive any L_Data.con or L_Data.ind from a KNXnet/IP gateway
+            # we have to reply with a tunnelling ack.
+            self.transport.sendto(self.encoder.tunnelling_ack(knx_msg.sequence_count))
+
+            cemi = knx_msg.cemi
+            if not cemi:
+                return
+            knx_src = cemi.knx_source
+            knx_dst = cemi.knx_destination
+            cemi_tpci_type = cemi.tpci_type
+            cemi_apci_type = cemi.apci_type
+
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                LOGGER.debug(('[KnxTunnellingRequest] SRC: {knx_src}, DST: {knx_dst}, CODE: {msg_code}, '
+                              'SEQ: {seq}. TPCI: {tpci}, APCI: {apci}').format(
+                    knx_src=knx_msg.parse_knx_address(knx_src),
+                    knx_dst=knx_msg.parse_knx_address(knx_dst),
+                    msg_code=_CEMI_MSG_CODES.get(cemi_msg_code),
+                    seq=cemi.tpci_sequence,
+                    tpci=_CEMI_TPCI_TYPES.get(cemi_tpci_type),
+                    apci=_CEMI_APCI_TYPES.get(cemi_apci_type)))
 
             if cemi_msg_code == CEMI_MSG_CODES.get('L_Data.con'):
                 # TODO: is this for NCD's even necessary?
@@ -172,7 +298,8 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
                     # value should be boolean to indicate that either a
                     # address is not in use/device is not available (UCD)
                     # or an error happened (NCD).
-                    if knx_msg.body.get('cemi').get('controlfield_1').get('confirm'):
+                    self.sample_rtt(knx_dst)
+                    if cemi.confirm:
                         # If the confirm flag is set, the device is not alive
                         self.process_target(knx_dst, False, knx_msg)
                     else:
@@ -184,34 +311,27 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
                             self.tpci_seq_counts[knx_dst] = 0
 
                 elif cemi_tpci_type == CEMI_TPCI_TYPES.get('NDP'):
-                    # If we get a confirmation for our device descriptor request,
-                    # check if L_Data.ind arrives.
-                    if cemi_apci_type in [CEMI_APCI_TYPES.get('A_DeviceDescriptor_Read'),
-                                          CEMI_APCI_TYPES.get('A_PropertyValue_Read')]:
-                        self.loop.call_later(3, self.process_target, knx_dst, False, knx_msg)
+                    # If we get a confirmation for a request, wait for the
+                    # L_Data.ind with the response from now on.
+                    future = self.target_futures.get(knx_dst)
+                    if future and self.target_expects.get(knx_dst)[0] != 'L_Data.con':
+                        self.target_timers[knx_dst].cancel()
+                        self.target_timers[knx_dst] = self.loop.call_later(
+                            self.rtt.timeout, self.expire_target, knx_dst, future)
 
                 elif cemi_tpci_type == CEMI_TPCI_TYPES.get('UDP'):
                     # After e.g. an A_GroupValue_Write we just get a
                     # L_Data.con for a UDP.
-                    if knx_dst in self.target_futures.keys() and \
-                            not self.target_futures[knx_dst].done():
-                        self.target_futures[knx_dst].set_result(False)
-                        del self.target_futures[knx_dst]
-                    else:
-                        self.response_queue.append(knx_msg)
+                    self.sample_rtt(knx_dst)
+                    self.process_target(knx_dst, False, knx_msg)
 
             elif cemi_msg_code == CEMI_MSG_CODES.get('L_Data.ind'):
 
                 if cemi_tpci_type == CEMI_TPCI_TYPES.get('UCD'):
 
-                    if knx_msg.body.get('cemi').get('tpci').get('status') is 1:
-                        # TODO: why checking status here? pls document why
-                        if knx_dst in self.target_futures.keys():
-                            if not self.target_futures[knx_dst].done():
-                                self.target_futures[knx_dst].set_result(False)
-                                del self.target_futures[knx_dst]
-                        else:
-                            self.response_queue.append(knx_msg)
+                    # TODO: the TPCI does not carry a status, so a T_Disconnect
+                    # (e.g. after a connection timeout) is currently not handled.
+                    pass
 
                 elif cemi_tpci_type == CEMI_TPCI_TYPES.get('NCD'):
                     # If we sent e.g. a A_DeviceDescriptor_Read, this
@@ -223,81 +343,131 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
 
                     if cemi_apci_type == CEMI_APCI_TYPES.get('A_DeviceDescriptor_Response'):
                         LOGGER.debug('{knx_src}: DEVICEDESCRIPTOR_RESPONSE DATA: {data}'.format(
-                            knx_src=knx_src,
-                            data=knx_msg.body.get('cemi').get('data')))
+                            knx_src=knx_msg.parse_knx_address(knx_src),
+                            data=cemi.data))
 
                     elif cemi_apci_type == CEMI_APCI_TYPES.get('A_Authorize_Response'):
                         LOGGER.debug('{knx_src}: AUTHORIZE_RESPONSE DATA: {data}'.format(
-                            knx_src=knx_src,
-                            data=knx_msg.body.get('cemi').get('data')))
+                            knx_src=knx_msg.parse_knx_address(knx_src),
+                            data=cemi.data))
 
                     elif cemi_apci_type == CEMI_APCI_TYPES.get('A_PropertyValue_Response'):
                         LOGGER.debug('{peer}/{knx_source}/{knx_dest}: PROPERTY_VALUE_RESPONSE DATA: {data}'.format(
                             peer=self.peername[0],
-                            knx_source=knx_src,
-                            knx_dest=knx_dst,
-                            data=knx_msg.body.get('cemi').get('data')[4:]))
+                            knx_source=knx_msg.parse_knx_address(knx_src),
+                            knx_dest=knx_msg.parse_knx_address(knx_dst),
+                            data=cemi.data[4:]))
 
                     elif cemi_apci_type == CEMI_APCI_TYPES.get('A_Memory_Response'):
                         LOGGER.debug('{peer}/{knx_src}: MEMORY_RESPONSE DATA: {data}'.format(
                             peer=self.peername[0],
-                            knx_src=knx_src,
-                            data=knx_msg.body.get('cemi').get('data')))
+                            knx_src=knx_msg.parse_knx_address(knx_src),
+                            data=cemi.data))
 
-                    # If we receive any Numbered Data Packets for
-                    # targets without futures, add the knx_source
-                    # to the response queue for later processing.
+                    # Numbered Data Packets for targets without a waiting
+                    # request are kept for later requests.
+                    self.sample_rtt(knx_src)
                     self.process_target(knx_src, knx_msg)
 
-            # If we receive any L_Data.con or L_Data.ind from a KNXnet/IP gateway
-            # we have to reply with a tunnelling ack.
-            if cemi_msg_code in [CEMI_MSG_CODES.get('L_Data.con'), CEMI_MSG_CODES.get('L_Data.ind')]:
-                tunnelling_ack = KnxTunnellingAck(
-                    communication_channel=knx_msg.body.get('communication_channel_id'),
-                    sequence_count=knx_msg.body.get('sequence_counter'))
-                self.transport.sendto(tunnelling_ack.get_message())
-
         elif isinstance(knx_msg, KnxTunnellingAck):
-            # TODO: do we have to increase any sequence here?
             LOGGER.debug('Tunnelling ACK reqceived')
+            self.ack_received(knx_msg.sequence_count)
         else:
-            LOGGER.error('Unknown Tunnelling Message: {}'.format(knx_msg.header.get('service_type')))
-
-    def send_data(self, data, target=None):
-        """A wrapper for sendto() that takes care of incrementing the sequence counter.
+            LOGGER.error('Unknown Tunnelling Message: {}'.format(knx_msg.service_type))
+
+    def send_data(self, data, target=None, expect=None):
+        """Queue a request and take care of incrementing the sequence counter.
+        data has to carry the current sequence counter, requests are sent in
+        the order of their sequence counters.
+        If target is set, the returned future waits for what expect describes:
+        a response of target that matches the (APCI type, echo) tuple or a
+        confirmation(). Without expect, the future only waits until it is
+        resolved with None if nothing arrives in time or if the request is
+        never acknowledged.
 
         Note: the sequence counter field is only 1 byte. After incrementing the counter
         to 255, it seems to be OK to just start over from 0. At least this applies
         to the tested devices."""
         f = asyncio.Future()
-        if target:
+        if target is not None:
+            timer = self.target_timers.pop(target, None)
+            if timer:
+                # The previous request of target is not waited for anymore
+                timer.cancel()
             self.target_futures[target] = f
-        self.transport.sendto(data)
+            self.target_expects[target] = expect
+            self.expire_responses()
+            response = self.unmatched_responses.pop((target,) + expect, None) \
+                if expect is not None else None
+            if response:
+                self.stats['matched_late'] += 1
+                self.resolve_target(target, response[1])
+        self.send_queue.append((self.sequence_count, data, target, f))
         if self.sequence_count == 255:
             self.sequence_count = 0
         else:
             self.sequence_count += 1
+        self.transmit()
         return f
 
+    def transmit(self):
+        """Send the next queued request if no request waits for its ACK. The
+        waiting period of the future of the request starts now."""
+        if self.ack_wait or not self.send_queue:
+            return
+        sequence, data, target, f = self.send_queue.popleft()
+        self.transport.sendto(data)
+        self.ack_wait = [sequence, data, 0, self.loop.call_later(
+            self.ACK_TIMEOUT, self.ack_timeout)]
+        if target is not None and self.target_futures.get(target) is f:
+            self.request_times[target] = self.loop.time()
+            self.target_timers[target] = self.loop.call_later(
+                self.rtt.timeout, self.expire_target, target, f)
+
+    def ack_received(self, sequence):
+        """Send the next request after the ACK of the request in flight."""
+        if not self.ack_wait or self.ack_wait[0] != sequence:
+            LOGGER.debug('Unexpected ACK for sequence {}'.format(sequence))
+            return
+        self.ack_wait[3].cancel()
+        self.ack_wait = None
+        self.transmit()
+
+    def ack_timeout(self):
+        """Repeat the request in flight or drop it after ACK_REPEATS repeats.
+        The future of a dropped request expires after its waiting period."""
+        if self.ack_wait[2] < self.ACK_REPEATS:
+            self.ack_wait[2] += 1
+            self.stats['repeated'] += 1
+            self.transport.sendto(self.ack_wait[1])
+            self.ack_wait[3] = self.loop.call_later(self.ACK_TIMEOUT, self.ack_timeout)
+            return
+        LOGGER.debug('No ACK for sequence {}, dropping request'.format(self.ack_wait[0]))
+        self.stats['unacknowledged'] += 1
+        self.ack_wait = None
+        self.transmit()
+
     def tpci_connect(self, target):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.tpci_unnumbered_control_data('CONNECT')
-        return self.send_data(tunnel_request.get_message(), target)
+        frame = self.encoder.tpci_unnumbered_control_data(
+            self.sequence_count, target, 'CONNECT')
+        return self.send_data(frame, target, expect=confirmation(CEMI_TPCI_TYPES.get('UCD')))
 
     def tpci_disconnect(self, target):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.tpci_unnumbered_control_data('DISCONNECT')
-        return self.send_data(tunnel_request.get_message(), target)
+        frame = self.encoder.tpci_unnumbered_control_data(
+            self.sequence_count, target, 'DISCONNECT')
+        return self.send_data(frame, target, expect=confirmation(CEMI_TPCI_TYPES.get('UCD')))
 
     def tpci_send_ncd(self, target):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.tpci_numbered_control_data('ACK', sequence=self.tpci_seq_counts.get(target))
+        sequence = self.tpci_seq_counts.get(target)
+        frame = self.encoder.tpci_numbered_control_data(
+            self.sequence_count, target, 'ACK',
+            sequence=sequence)
         # increment TPCI sequence counter
         if self.tpci_seq_counts.get(target) == 15:
             self.tpci_seq_counts[target] = 0
         else:
             self.tpci_seq_counts[target] += 1
-        return self.send_data(tunnel_request.get_message(), target)
+        return self.send_data(frame, target, expect=confirmation(CEMI_TPCI_TYPES.get('NCD'), sequence))
 
     def make_tunnel_request(self, knx_dst):
         """A helper function that returns a KnxTunnellingRequest that is already predefined
@@ -320,13 +490,39 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
         # conf_request.set_peer(self.transport.get_extra_info('sockname'))
         return conf_request
 
+    @asyncio.coroutine
+    def knx_property_read(self, object_type, property_id, object_instance=1, count=1, start_index=0):
+        """Read a property of an interface object of the gateway itself. This
+        requires a DEVICE_MGMT_CONNECTION. Returns the value or None if the
+        property could not be read."""
+        self.configuration_future = asyncio.Future(loop=self.loop)
+        conf_request = KnxDeviceConfigurationRequest(
+            sockname=self.sockname,
+            communication_channel=self.communication_channel,
+            sequence_count=self.sequence_count,
+            object_type=object_type,
+            object_instance=object_instance,
+            property_id=property_id,
+            count=count,
+            start_index=start_index)
+        self.send_data(conf_request.get_message())
+        try:
+            response = yield from asyncio.wait_for(
+                self.configuration_future, self.rtt.timeout, loop=self.loop)
+        except asyncio.TimeoutError:
+            return None
+        # A count of 0 in the response indicates an error
+        if not response.count:
+            return None
+        return response.data
+
     def knx_keep_alive(self):
         """Sending CONNECTIONSTATE_REQUESTS periodically to
         keep the tunnel alive."""
-        connection_state = KnxConnectionStateRequest(
-            sockname=self.sockname,
-            communication_channel=self.communication_channel)
-        self.transport.sendto(connection_state.get_message())
+        if not self.encoder:
+            # The tunnel has not been established
+            return
+        self.transport.sendto(self.encoder.connection_state_request())
 
     def knx_tunnel_disconnect(self):
         """Close the tunnel connection with a DISCONNECT_REQUEST."""
@@ -336,73 +532,81 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
         self.transport.sendto(disconnect_request.get_message())
 
     def knx_tpci_disconnect(self, target):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.tpci_unnumbered_control_data('DISCONNECT')
-        self.transport.sendto(tunnel_request.get_message())
+        self.send_data(self.encoder.tpci_unnumbered_control_data(
+            self.sequence_count, target, 'DISCONNECT'))
 
     @asyncio.coroutine
     def apci_device_descriptor_read(self, target):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.apci_device_descriptor_read(
+        frame = self.encoder.apci_device_descriptor_read(
+            self.sequence_count, target,
             sequence=self.tpci_seq_counts.get(target))
-        value = yield from self.send_data(tunnel_request.get_message(), target)
+        value = yield from self.send_data(
+            frame, target, expect=(CEMI_APCI_TYPES.get('A_DeviceDescriptor_Response'), b''))
         yield from self.tpci_send_ncd(target)
         if isinstance(value, KnxTunnellingRequest):
-            cemi = value.body.get('cemi')
-            if cemi.get('apci').get('type') == CEMI_APCI_TYPES.get('A_DeviceDescriptor_Response') and \
-                    cemi.get('data'):
-                return value.body.get('cemi').get('data')
+            cemi = value.cemi
+            if cemi and cemi.apci_type == CEMI_APCI_TYPES.get('A_DeviceDescriptor_Response') and \
+                    cemi.data:
+                return cemi.data
         else:
             return False
 
     @asyncio.coroutine
     def apci_property_value_read(self, target, object_index=0, property_id=0x0f,
                                  num_elements=1, start_index=1):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.apci_property_value_read(
+        frame = self.encoder.apci_property_value_read(
+            self.sequence_count, target,
             sequence=self.tpci_seq_counts.get(target),
             object_index=object_index,
             property_id=property_id,
             num_elements=num_elements,
             start_index=start_index)
-        value = yield from self.send_data(tunnel_request.get_message(), target)
+        value = yield from self.send_data(
+            frame, target, expect=(CEMI_APCI_TYPES.get('A_PropertyValue_Response'),
+                                   struct.pack('!BB', object_index, property_id)))
         yield from self.tpci_send_ncd(target)
         if isinstance(value, KnxTunnellingRequest) and \
-                value.body.get('cemi').get('data'):
-            return value.body.get('cemi').get('data')[4:]
+                value.cemi and value.cemi.data:
+            return value.cemi.data[4:]
         else:
             return False
 
     @asyncio.coroutine
-    def apci_property_description_read(self, target, object_index=0, property_id=0x0f,
-                                       num_elements=1, start_index=1):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.apci_property_description_read(
+    def apci_property_description_read(self, target, object_index=0, property_id=0,
+                                       property_index=0):
+        """Read the description of a property, selected by property_index if
+        property_id is 0. Returns the response data starting with the object
+        index or False if an error occurred."""
+        frame = self.encoder.apci_property_description_read(
+            self.sequence_count, target,
             sequence=self.tpci_seq_counts.get(target),
             object_index=object_index,
             property_id=property_id,
-            num_elements=num_elements,
-            start_index=start_index)
-        value = yield from self.send_data(tunnel_request.get_message(), target)
+            property_index=property_index)
+        value = yield from self.send_data(
+            frame, target, expect=(CEMI_APCI_TYPES.get('A_PropertyDescription_Response'),
+                                   struct.pack('!B', object_index)))
         yield from self.tpci_send_ncd(target)
         if isinstance(value, KnxTunnellingRequest) and \
-                value.body.get('cemi').get('data'):
-            return value.body.get('cemi').get('data')[4:]
+                value.cemi and value.cemi.data:
+            return value.cemi.data
         else:
             return False
 
     @asyncio.coroutine
     def apci_memory_read(self, target, memory_address=0x0060, read_count=1):
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.apci_memory_read(
+        frame = self.encoder.apci_memory_read(
+            self.sequence_count, target,
             sequence=self.tpci_seq_counts.get(target),
             memory_address=memory_address,
             read_count=read_count)
-        value = yield from self.send_data(tunnel_request.get_message(), target)
+        value = yield from self.send_data(
+            frame, target, expect=(CEMI_APCI_TYPES.get('A_Memory_Response'),
+                                   struct.pack('!H', memory_address)))
         yield from self.tpci_send_ncd(target)
         if isinstance(value, KnxTunnellingRequest) and \
-                value.body.get('cemi').get('data'):
-            return value.body.get('cemi').get('data')[2:]
+                value.cemi and value.cemi.data:
+            return value.cemi.data[2:]
         else:
             return False
 
@@ -411,24 +615,29 @@ class KnxTunnelConnection(asyncio.DatagramProtocol):
         """Send an A_Authorize_Request to target with the
         supplied key. Returns the access level as an int
         or False if an error occurred."""
-        tunnel_request = self.make_tunnel_request(target)
-        tunnel_request.apci_authorize_request(
+        frame = self.encoder.apci_authorize_request(
+            self.sequence_count, target,
             sequence=self.tpci_seq_counts.get(target),
             key=key)
-        auth = yield from self.send_data(tunnel_request.get_message(), target)
+        auth = yield from self.send_data(
+            frame, target, expect=(CEMI_APCI_TYPES.get('A_Authorize_Response'), b''))
         yield from self.tpci_send_ncd(target)
-        if isinstance(auth, KnxTunnellingRequest):
-            return int.from_bytes(auth.body.get('cemi').get('data'), 'big')
+        if isinstance(auth, KnxTunnellingRequest) and \
+                auth.cemi and auth.cemi.data:
+            return int.from_bytes(auth.cemi.data, 'big')
         else:
             return False
 
     @asyncio.coroutine
     def apci_group_value_write(self, target, value=0):
+        if isinstance(target, str):
+            target = KnxMessage.pack_knx_group_address(target)
         tunnel_request = self.make_tunnel_request(target)
         tunnel_request.apci_group_value_write(value=value)
-        value = yield from self.send_data(tunnel_request.get_message(), target)
+        value = yield from self.send_data(
+            tunnel_request.get_message(), target, expect=confirmation(CEMI_TPCI_TYPES.get('UDP')))
         if isinstance(value, KnxTunnellingRequest) and \
-                value.body.get('cemi').get('data'):
-            return value.body.get('cemi').get('data')[4:]
+                value.cemi and value.cemi.data:
+            return value.cemi.data[4:]
         else:
             return False
@@ -2,7 +2,14 @@ import asyncio
 import codecs
 import collections
 import functools
+import ipaddress
+import itertools
+import json
 import logging
+import multiprocessing
+import os
+import pickle
+import queue
 import socket
 import struct
 import time
@@ -19,7 +26,11 @@ from libknxmap.messages import *
 from libknxmap.gateway import *
 from libknxmap.manufacturers import *
 from libknxmap.targets import *
+from libknxmap.output import gateway_record
+from libknxmap.store import ResultStore
 from libknxmap.bus.tunnel import KnxTunnelConnection
+from libknxmap.bus.memory import KnxMemoryReader
+from libknxmap.bus.properties import KnxPropertyScanner
 from libknxmap.bus.router import KnxRoutingConnection
 from libknxmap.bus.monitor import KnxBusMonitor
 
@@ -27,25 +38,102 @@ __all__ = ['KnxMap']
 
 LOGGER = logging.getLogger(__name__)
 
+CHECKPOINT_VERSION = 4
+
+# Gateway fields that are compared in incremental scans, the device status is
+# left out because it changes with the programming mode
+GATEWAY_DIFF_FIELDS = ['knx_address', 'mac_address', 'device_serial', 'friendly_name',
+                       'knx_medium', 'project_install_identifier', 'supported_services']
+BUS_DEVICE_DIFF_FIELDS = ['medium', 'device_type', 'version', 'device_serial', 'manufacturer']
+
+# Fields of the EEPROM of System 1 devices as (name, address, length)
+SYSTEM1_MEMORY_FIELDS = [('DevTyp', 0x0105, 2),
+                         ('ManData', 0x0101, 3),
+                         ('CheckLim', 0x0108, 1),
+                         ('UsrPrg', 0x01fe, 1),
+                         ('AdrTab', 0x0116, 4)]
+EEPROM_ADDRESS = 0x0100
+EEPROM_DUMP_LENGTH = 255
+
+# Whether fingerprinting waits for the liveness sweep on shared tunnels
+BUS_PRIORITIES = ['sweep', 'fingerprint']
+
+# How often a T_Connect without L_Data.con is repeated
+BUS_CONNECT_RETRIES = 2
+
 
 class KnxMap:
     """The main scanner instance that takes care of scheduling workers for the targets."""
 
-    def __init__(self, targets=None, max_workers=100, loop=None):
+    def __init__(self, targets=None, max_workers=100, loop=None, results=None):
         self.loop = loop or asyncio.get_event_loop()
-        # The number of concurrent workers for discovering KNXnet/IP gateways
+        # A multiprocessing queue in worker processes, finished KnxTargetReports are sent to it
+        self.results = results
+        self.bus_targets = None
+        # Output sinks like JsonLinesSink, each result is written to them as soon as it is found
+        self.sinks = list()
+        # The number of outstanding description requests for discovering KNXnet/IP gateways
         self.max_workers = max_workers
-        # q contains all KNXnet/IP gateways
-        self.q = Queue(loop=self.loop)
-        # bus_queues is a dict containing a bus queue for each KNXnet/IP gateway
+        # bus_queues is a dict containing a bus queue for each KNXnet/IP gateway (host, port)
         self.bus_queues = dict()
         # bus_protocols is a list of all bus protocol instances for proper connection shutdown
         self.bus_protocols = list()
         # knx_gateways is a list of KnxTargetReport objects, one for each found KNXnet/IP gateway
         self.knx_gateways = list()
-        # bus_devices is a list of KnxBusTargetReport objects, one for each found bus device
-        self.bus_devices = set()
+        # bus_devices is a dict containing a set of KnxBusTargetReport objects
+        # for each KNXnet/IP gateway (host, port) the devices have been found via
+        self.bus_devices = dict()
         self.bus_info = False
+        # Packets per second for description requests, 0 means no limit
+        self.desc_rate = 0
+        self.desc_adaptive_rate = False
+        self.desc_max_rate = None
+        # Seconds to wait between the rounds of description requests
+        self.desc_round_delay = 0
+        # The number of description requests that have been sent, including retries
+        self.desc_sent = 0
+        # gateway_rtts is a dict containing a RttEstimator for each KNXnet/IP gateway
+        self.gateway_rtts = dict()
+        # Scan progress, written to the checkpoint file every checkpoint_interval seconds
+        self.checkpoint = None
+        self.checkpoint_interval = 30
+        self.checkpoint_time = 0
+        self.desc_done = False
+        self.desc_round = 1
+        self.desc_offset = 0  # the number of targets of the current round that have been probed
+        self.desc_pending = list()  # probes that have been outstanding in a resumed scan
+        # Targets that responded or sent ICMP errors, TargetBitmaps once the description scan started
+        self.desc_responded = None
+        self.desc_closed = None
+        self.scanner = None
+        # The concurrency budget that is shared by description requests and bus scans
+        self.slots = None
+        # bus_scanners is a list of bus scan tasks, they start as soon as a gateway is found
+        self.bus_scanners = list()
+        # The ResultStore with previous results in incremental scans
+        self.store = None
+        self.ttl = 86400
+        # The maximum number of tunnel connections per KNXnet/IP gateway for bus scans
+        self.max_tunnels = 4
+        # The number of bus targets that are probed at the same time on each tunnel
+        self.bus_window = 8
+        # The number of alive bus devices that are fingerprinted at the same time on each tunnel
+        self.fingerprint_window = 4
+        # The number of tunnels per KNXnet/IP gateway that only fingerprint, 0 shares all tunnels
+        self.fingerprint_tunnels = 0
+        self.bus_priority = 'sweep'
+        # bus_alive is a dict containing a KnxAddressBitmap of the alive bus devices for each
+        # KNXnet/IP gateway (host, port)
+        self.bus_alive = dict()
+        # Discovers the properties of bus devices and caches them per device type
+        self.property_scanner = KnxPropertyScanner()
+        # bus_done is a dict containing the scanned bus addresses for each KNXnet/IP gateway (host, port)
+        self.bus_done = dict()
+        # Limits for timeouts that are derived from round trip times
+        self.timeout_floor = 0.5
+        self.timeout_ceiling = 10
+        # diff is a list of (state, host, port, notes) tuples of an incremental scan
+        self.diff = list()
         self.t0 = time.time()
         self.t1 = None
         if targets:
@@ -54,12 +142,241 @@ class KnxMap:
             self.targets = set()
 
     def set_targets(self, targets):
+        """Set the targets, an iterable of (host, port) tuples like Targets.
+        They are only consumed while scanning."""
+        self.targets = targets
+
+    def target_set(self):
+        """Return an empty set of targets, a TargetBitmap if the targets are
+        a Targets instance, so it takes one bit per target."""
+        if isinstance(self.targets, Targets):
+            return TargetBitmap(self.targets)
+        return set()
+
+    def iter_targets(self, offset=0):
+        """Iterate the targets in scan order, skipping the first offset targets."""
+        if isinstance(self.targets, Targets) and self.targets.shards == 1:
+            return self.targets.iter_targets(self.targets.start + offset)
+        return itertools.islice(self.targets, offset, None)
+
+    def save_checkpoint(self):
+        """Write the scan progress to the checkpoint file. The file is replaced
+        atomically, so an interrupted write keeps the previous checkpoint."""
+        if not self.checkpoint:
+            return
+        if self.scanner:
+            pending = list(self.scanner.probes)
+            responded = self.scanner.responded
+            closed = self.scanner.closed
+        else:
+            pending = self.desc_pending
+            responded = self.desc_responded
+            closed = self.desc_closed
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'targets': self.targets,
+            'desc_done': self.desc_done,
+            'desc_round': self.desc_round,
+            'desc_offset': self.desc_offset,
+            'desc_pending': pending,
+            'desc_responded': responded,
+            'desc_closed': closed,
+            'knx_gateways': self.knx_gateways,
+            'bus_done': self.bus_done,
+            'bus_alive': self.bus_alive,
+            'bus_devices': self.bus_devices}
+        path = self.checkpoint + '.tmp'
+        try:
+            with open(path, 'wb') as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(path, self.checkpoint)
+        except OSError as e:
+            LOGGER.error('Writing checkpoint failed: {}'.format(e))
+            return
+        self.checkpoint_time = time.time()
+        LOGGER.debug('Checkpoint written to {}'.format(self.checkpoint))
+
+    def update_checkpoint(self):
+        """Write a checkpoint if the last one is older than checkpoint_interval."""
+        if self.checkpoint and time.time() - self.checkpoint_time >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+    def load_checkpoint(self, path):
+        """Restore the scan progress of a checkpoint file. The targets of the
+        checkpoint, including their order and seed, replace the current targets.
+        Returns False if the checkpoint cannot be used."""
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            LOGGER.error('Reading checkpoint failed: {}'.format(e))
+            return False
+        if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+            LOGGER.error('Unsupported checkpoint file: {}'.format(path))
+            return False
+        targets = state['targets']
+        if isinstance(self.targets, Targets) and \
+                (self.targets.ranges, self.targets.ports) != (targets.ranges, targets.ports):
+            LOGGER.error('The checkpoint has been written for other targets')
+            return False
         self.targets = targets
-        for target in self.targets:
-            self.add_target(target)
+        self.desc_done = state['desc_done']
+        self.desc_round = state['desc_round']
+        self.desc_offset = state['desc_offset']
+        self.desc_pending = state['desc_pending']
+        self.desc_responded = state['desc_responded']
+        self.desc_closed = state['desc_closed']
+        self.knx_gateways = state['knx_gateways']
+        self.bus_done = state['bus_done']
+        self.bus_alive = state.get('bus_alive', dict())
+        self.bus_devices = state['bus_devices']
+        LOGGER.info('Resuming scan at round {}, target {}, {} gateway(s) found'.format(
+            self.desc_round, self.desc_offset, len(self.knx_gateways)))
+        return True
+
+    def gateway_rtt(self, target):
+        """Return the RttEstimator that is shared by all connections to target."""
+        if target not in self.gateway_rtts:
+            self.gateway_rtts[target] = RttEstimator(
+                initial=3,
+                floor=self.timeout_floor,
+                ceiling=self.timeout_ceiling)
+        return self.gateway_rtts[target]
+
+    def add_gateway(self, target, response, rtt=None):
+        """Add a KnxTargetReport for the KnxDescriptionResponse of target. If
+        the round trip time of the response is known, it is used as the first
+        RTT sample of the gateway."""
+        if rtt is not None:
+            self.gateway_rtt(target).update(rtt)
+        t = KnxTargetReport(
+            host=target[0],
+            port=target[1],
+            mac_address=response.dib_dev_info.knx_mac_address,
+            knx_address=response.dib_dev_info.knx_address,
+            device_serial=response.dib_dev_info.knx_device_serial,
+            friendly_name=response.dib_dev_info.device_friendly_name,
+            device_status=response.dib_dev_info.device_status,
+            knx_medium=response.dib_dev_info.knx_medium,
+            project_install_identifier=response.dib_dev_info.project_install_identifier,
+            supported_services=[
+                KNX_SERVICES[k] for k in
+                response.dib_supp_sv_families.families],
+            bus_devices=[])
+        self.knx_gateways.append(t)
+        for sink in self.sinks:
+            sink.write_gateway(t)
+        if self.bus_targets:
+            self.start_bus_scan(t)
+        else:
+            if self.store:
+                self.compare_gateway(self.store, self.ttl, t)
+            self.report_gateway(t)
+
+    def add_bus_device(self, gateway, t):
+        """Add the KnxBusTargetReport t that has been found via gateway (host, port)."""
+        self.bus_devices.setdefault(gateway, set()).add(t)
+        for sink in self.sinks:
+            sink.write_bus_device(gateway, t)
+
+    def write_restored_results(self):
+        """Write the gateways and bus devices that have been restored from a
+        checkpoint to the sinks, which only get results found after the resume
+        otherwise. File sinks are truncated when they are opened, so they hold
+        all results of the scan again."""
+        for t in self.knx_gateways:
+            for sink in self.sinks:
+                sink.write_gateway(t)
+        for gateway, devices in self.bus_devices.items():
+            for t in devices:
+                for sink in self.sinks:
+                    sink.write_bus_device(gateway, t)
+
+    def close_sinks(self):
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = list()
+
+    def report_gateway(self, knx_gateway, bus_scanned=False):
+        """Send a finished KnxTargetReport to the parent process, along with
+        whether its bus scan has been finished."""
+        if self.results is not None:
+            self.results.put((knx_gateway, bus_scanned))
 
-    def add_target(self, target):
-        self.q.put_nowait(target)
+    @asyncio.coroutine
+    def description_scan(self):
+        """Send a KnxDescription request to each target to see if it is a KNX device.
+        All requests are sent from a single socket, with up to max_workers
+        requests outstanding at a time. If desc_rate is set, the requests
+        are sent at most at desc_rate packets per second.
+
+        The targets are probed in desc_retries rounds. Each round sends a
+        single request to every target that did not respond yet, so a
+        silent target only delays the scan by desc_timeout per round.
+
+        The progress is kept in desc_round and desc_offset, so a scan that has
+        been restored with load_checkpoint() continues where it stopped."""
+        self.t0 = time.time()
+        if self.desc_done:
+            self.t1 = time.time()
+            return
+        try:
+            first_target = next(iter(self.targets))
+        except StopIteration:
+            self.t1 = time.time()
+            return
+        if self.desc_responded is None:
+            self.desc_responded = self.target_set()
+            self.desc_closed = self.target_set()
+        limiter = None
+        if self.desc_rate:
+            limiter = PacketRateLimiter(self.desc_rate,
+                                        adaptive=self.desc_adaptive_rate,
+                                        max_rate=self.desc_max_rate,
+                                        loop=self.loop)
+        transport, scanner = yield from self.loop.create_datagram_endpoint(
+            functools.partial(KnxDescriptionScanner,
+                              self.add_gateway,
+                              timeout=self.desc_timeout,
+                              max_probes=self.max_workers,
+                              limiter=limiter,
+                              slots=self.slots,
+                              responded=self.desc_responded,
+                              closed=self.desc_closed),
+            local_addr=(get_local_address(first_target), 0))
+        self.scanner = scanner
+        try:
+            for self.desc_round in range(self.desc_round, max(1, self.desc_retries) + 1):
+                if self.desc_round > 1 and not self.desc_offset:
+                    yield from asyncio.sleep(self.desc_round_delay)
+                    LOGGER.debug('Starting round {} of description requests'.format(self.desc_round))
+                # Probes that were outstanding when the checkpoint was written
+                for target in self.desc_pending:
+                    yield from scanner.probe(target)
+                self.desc_pending = list()
+                for target in self.iter_targets(self.desc_offset):
+                    if ':' in target[0]:
+                        if self.desc_round == 1:
+                            LOGGER.error('KNXnet/IP requires IPv4, ignoring target: {}'.format(target[0]))
+                    elif target not in scanner.responded and target not in scanner.closed:
+                        LOGGER.debug('Scanning {}'.format(target))
+                        yield from scanner.probe(target)
+                    self.desc_offset += 1
+                    self.update_checkpoint()
+                yield from scanner.join()
+                self.desc_offset = 0
+            self.desc_done = True
+        finally:
+            self.desc_responded = scanner.responded
+            self.desc_closed = scanner.closed
+            self.desc_pending = list(scanner.probes)
+            self.scanner = None
+            scanner.close()
+        self.save_checkpoint()
+        self.t1 = time.time()
+        self.desc_sent = scanner.sent
+        if limiter and limiter.adaptive:
+            LOGGER.info('Adaptive packet rate ended at {:.1f} pps'.format(limiter.rate))
 
     def add_bus_queue(self, gateway, bus_targets):
         self.bus_queues[gateway] = Queue(loop=self.loop)
@@ -90,202 +407,437 @@ class KnxMap:
                 break
 
     @asyncio.coroutine
-    def knx_bus_worker(self, transport, protocol, queue):
-        """A worker for communicating with devices on the bus."""
+    def knx_sweep_worker(self, protocol, queue, alive, found, done):
+        """A worker for the liveness sweep, the first stage of a bus scan.
+        Targets are only probed with a T_Connect. Alive targets are added to
+        the bitmap alive and put into the queue found, the others are added
+        to the set done unless their T_Connect was never confirmed."""
         try:
             while True:
                 target = queue.get_nowait()
-                LOGGER.info('BUS: target: {}'.format(target))
-                if not protocol.tunnel_established:
-                    LOGGER.error('KNX tunnel is not open!')
-                    return
-
-                alive = yield from protocol.tpci_connect(target)
-
-                if alive:
-                    properties = collections.OrderedDict()
-                    serial = None
-
-                    # DeviceDescriptorRead
-                    descriptor = yield from protocol.apci_device_descriptor_read(target)
-                    if not descriptor:
-                        tunnel_request = protocol.make_tunnel_request(target)
-                        tunnel_request.tpci_unnumbered_control_data('DISCONNECT')
-                        protocol.send_data(tunnel_request.get_message(), target)
-                        queue.task_done()
-                        continue
-
-                    if not self.bus_info:
-                        t = KnxBusTargetReport(address=target)
-                        self.bus_devices.add(t)
-                        tunnel_request = protocol.make_tunnel_request(target)
-                        tunnel_request.tpci_unnumbered_control_data('DISCONNECT')
-                        protocol.send_data(tunnel_request.get_message(), target)
-                        queue.task_done()
-                        continue
-
-                    dev_desc = struct.unpack('!H', descriptor)[0]
-                    desc_medium, desc_type, desc_version = KnxMessage.parse_device_descriptor(dev_desc)
-
-                    if desc_type > 1:
-                        # Read System 2 and System 7 manufacturer ID object
-                        manufacturer = yield from protocol.apci_property_value_read(
-                            target,
-                            property_id=DEVICE_OBJECTS.get('PID_MANUFACTURER_ID'))
-                        if isinstance(manufacturer, (str, bytes)):
-                            manufacturer = int.from_bytes(manufacturer, 'big')
-                            manufacturer = get_manufacturer_by_id(manufacturer)
-
-                        # Read the device state
-                        device_state = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x0060)
-                        if device_state:
-                            properties['DEVICE_STATE'] = KnxMessage.unpack_cemi_runstate(
-                                int.from_bytes(device_state, 'big'))
-
-                        # Read the serial number object on System 2 and System 7 devices
-                        serial = yield from protocol.apci_property_value_read(
-                            target,
-                            property_id=DEVICE_OBJECTS.get('PID_SERIAL_NUMBER'))
-                        if isinstance(serial, (str, bytes)):
-                            serial = codecs.encode(serial, 'hex').decode().upper()
-
-                        # DEV - group value write
-                        # r = yield from protocol.apci_group_value_write('0.0.4', value=1)
-                        # r = yield from protocol.apci_group_value_write('0.0.4', value=0)
-                        # r = yield from protocol.apci_group_value_write('0.0.4', value=1)
-                        # r = yield from protocol.apci_group_value_write('0.0.4', value=0)
-                        # r = yield from protocol.apci_group_value_write('0.0.4', value=1)
-                        # r = yield from protocol.apci_group_value_write('0.0.4', value=0)
-
-                        # If we want to authenticate
-                        # auth_level = yield from protocol.apci_authenticate(
-                        #     target,
-                        #     key=self.auth_key)
-
-                        for object_index, props in OBJECTS.items():
-                            x = collections.OrderedDict()
-                            for k, v in props.items():
-                                ret = yield from protocol.apci_property_value_read(
-                                    target,
-                                    property_id=v,
-                                    object_index=object_index)
-                                if ret:
-                                    x[k.replace('PID_', '')] = codecs.encode(ret, 'hex')
-                            if x:
-                                properties[OBJECT_TYPES.get(object_index)] = x
-
-                    else:
-                        # Try to MemoryRead the manufacturer ID on System 1 devices.
-                        # Note: System 1 devices do not support access controls, so
-                        # an authorization request is not needed.
-                        manufacturer = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x0104,
-                            read_count=1)
-                        if isinstance(manufacturer, (str, bytes)):
-                            manufacturer = int.from_bytes(manufacturer, 'big')
-                            manufacturer = get_manufacturer_by_id(manufacturer)
-
-                        device_state = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x0060)
-                        if device_state:
-                            properties['DEVICE_STATE'] = codecs.encode(device_state, 'hex')
-
-                        ret = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x0105,
-                            read_count=2)
-                        if ret:
-                            properties['DevTyp'] = codecs.encode(ret, 'hex')
-
-                        ret = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x0101,
-                            read_count=3)
-                        if ret:
-                            properties['ManData'] = codecs.encode(ret, 'hex')
-
-                        ret = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x0108,
-                            read_count=1)
-                        if ret:
-                            properties['CheckLim'] = codecs.encode(ret, 'hex')
-
-                        ret = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x01FE,
-                            read_count=1)
-                        if ret:
-                            properties['UsrPrg'] = codecs.encode(ret, 'hex')
-
-                        ret = yield from protocol.apci_memory_read(
-                            target,
-                            memory_address=0x0116,
-                            read_count=4)
-                        if ret:
-                            properties['AdrTab'] = codecs.encode(ret, 'hex')
-
-                        start_addr = 0x0100
-                        properties['EEPROM_DUMP'] = b''
-                        for i in range(51):
-                            ret = yield from protocol.apci_memory_read(
-                                target,
-                                memory_address=start_addr,
-                                read_count=5)
-                            if ret:
-                                properties['EEPROM_DUMP'] += codecs.encode(ret, 'hex')
-                            start_addr += 5
-
-                    if descriptor:
-                        t = KnxBusTargetReport(
-                            address=target,
-                            medium=desc_medium,
-                            type=desc_type,
-                            version=desc_version,
-                            device_serial=serial,
-                            manufacturer=manufacturer,
-                            properties=properties)
-                        self.bus_devices.add(t)
-
-                    # Properly close the TPCI layer
-                    yield from protocol.tpci_disconnect(target)
-
-                queue.task_done()
+                try:
+                    LOGGER.info('BUS: target: {}'.format(KnxMessage.parse_knx_address(target)))
+                    if not protocol.tunnel_established:
+                        LOGGER.error('KNX tunnel is not open!')
+                        return
+
+                    connected = yield from self.bus_connect(protocol, target)
+                    if connected:
+                        alive.add(target)
+                        yield from self.bus_disconnect(protocol, target)
+                        found.put_nowait(target)
+                    elif connected is False:
+                        done.add(target)
+                    self.update_checkpoint()
+                finally:
+                    queue.task_done()
         except asyncio.CancelledError:
             pass
         except asyncio.QueueEmpty:
             pass
 
     @asyncio.coroutine
-    def bus_scan(self, knx_gateway, bus_targets):
-        queue = self.add_bus_queue(knx_gateway.host, bus_targets)
-        LOGGER.info('Scanning {} bus device(s) on {}'.format(queue.qsize(), knx_gateway.host))
-        future = asyncio.Future()
-        transport, bus_protocol = yield from self.loop.create_datagram_endpoint(
-            functools.partial(KnxTunnelConnection, future),
-            remote_addr=(knx_gateway.host, knx_gateway.port))
-        self.bus_protocols.append(bus_protocol)
+    def bus_connect(self, protocol, target):
+        """Open a TPCI connection to target. A T_Connect whose L_Data.con got
+        lost, e.g. because the gateway dropped the request, is repeated up to
+        BUS_CONNECT_RETRIES times. Returns the confirmation, or None if none
+        arrived, so the target is not recorded as done."""
+        for _ in range(BUS_CONNECT_RETRIES + 1):
+            connected = yield from protocol.tpci_connect(target)
+            if connected is not None:
+                return connected
+        LOGGER.debug('No confirmation for {}'.format(KnxMessage.parse_knx_address(target)))
+        return None
 
-        # Make sure the tunnel has been established
-        connected = yield from future
+    @asyncio.coroutine
+    def bus_disconnect(self, protocol, target):
+        """Close the TPCI connection to target and wait for its confirmation,
+        which may get lost like any other."""
+        yield from protocol.tpci_disconnect(target)
+
+    @asyncio.coroutine
+    def knx_bus_worker(self, transport, protocol, queue, done):
+        """A worker for fingerprinting alive devices on the bus, the second
+        stage of a bus scan. It waits for targets until it is cancelled.
+        Scanned targets are added to the set done. Several workers can share
+        a tunnel, responses are matched to their targets by bus address."""
+        try:
+            while True:
+                target = yield from queue.get()
+                try:
+                    LOGGER.info('BUS: fingerprinting: {}'.format(KnxMessage.parse_knx_address(target)))
+                    if not protocol.tunnel_established:
+                        LOGGER.error('KNX tunnel is not open!')
+                        return
+
+                    alive = yield from self.bus_connect(protocol, target)
+                    if alive:
+                        properties = collections.OrderedDict()
+                        serial = None
+
+                        # DeviceDescriptorRead
+                        descriptor = yield from protocol.apci_device_descriptor_read(target)
+                        if not descriptor:
+                            yield from self.bus_disconnect(protocol, target)
+                            done.add(target)
+                            continue
+
+                        if not self.bus_info:
+                            t = KnxBusTargetReport(address=target)
+                            self.add_bus_device(protocol.peername, t)
+                            yield from self.bus_disconnect(protocol, target)
+                            done.add(target)
+                            continue
+
+                        dev_desc = struct.unpack('!H', descriptor)[0]
+                        desc_medium, desc_type, desc_version = KnxMessage.parse_device_descriptor(dev_desc)
+
+                        if desc_type > 1:
+                            # Read System 2 and System 7 manufacturer ID object
+                            manufacturer = yield from protocol.apci_property_value_read(
+                                target,
+                                property_id=DEVICE_OBJECTS.get('PID_MANUFACTURER_ID'))
+                            if isinstance(manufacturer, (str, bytes)):
+                                manufacturer = int.from_bytes(manufacturer, 'big')
+                                manufacturer = get_manufacturer_by_id(manufacturer)
+
+                            # Read the device state
+                            device_state = yield from protocol.apci_memory_read(
+                                target,
+                                memory_address=0x0060)
+                            if device_state:
+                                properties['DEVICE_STATE'] = KnxMessage.unpack_cemi_runstate(
+                                    int.from_bytes(device_state, 'big'))
+
+                            # Read the serial number object on System 2 and System 7 devices
+                            serial = yield from protocol.apci_property_value_read(
+                                target,
+                                property_id=DEVICE_OBJECTS.get('PID_SERIAL_NUMBER'))
+                            if isinstance(serial, (str, bytes)):
+                                serial = codecs.encode(serial, 'hex').decode().upper()
+
+                            # DEV - group value write
+                            # r = yield from protocol.apci_group_value_write('0.0.4', value=1)
+                            # r = yield from protocol.apci_group_value_write('0.0.4', value=0)
+                            # r = yield from protocol.apci_group_value_write('0.0.4', value=1)
+                            # r = yield from protocol.apci_group_value_write('0.0.4', value=0)
+                            # r = yield from protocol.apci_group_value_write('0.0.4', value=1)
+                            # r = yield from protocol.apci_group_value_write('0.0.4', value=0)
+
+                            # If we want to authenticate
+                            # auth_level = yield from protocol.apci_authenticate(
+                            #     target,
+                            #     key=self.auth_key)
+
+                            # Only read the properties the device supports, they are
+                            # discovered once per device type
+                            ret = yield from self.property_scanner.read(
+                                protocol, target, (dev_desc, manufacturer))
+                            properties.update(ret)
+
+                        else:
+                            # Try to MemoryRead the manufacturer ID on System 1 devices.
+                            # Note: System 1 devices do not support access controls, so
+                            # an authorization request is not needed. All fields are
+                            # read together with the EEPROM dump.
+                            memory = KnxMemoryReader(protocol, target)
+                            memory.add(0x0060)
+                            memory.add(0x0104)
+                            memory.add(EEPROM_ADDRESS, EEPROM_DUMP_LENGTH)
+                            for _, memory_address, read_count in SYSTEM1_MEMORY_FIELDS:
+                                memory.add(memory_address, read_count)
+                            yield from memory.read()
+
+                            manufacturer = memory.get(0x0104)
+                            if manufacturer:
+                                manufacturer = int.from_bytes(manufacturer, 'big')
+                                manufacturer = get_manufacturer_by_id(manufacturer)
+
+                            device_state = memory.get(0x0060)
+                            if device_state:
+                                properties['DEVICE_STATE'] = codecs.encode(device_state, 'hex')
+
+                            for name, memory_address, read_count in SYSTEM1_MEMORY_FIELDS:
+                                ret = memory.get(memory_address, read_count)
+                                if ret:
+                                    properties[name] = codecs.encode(ret, 'hex')
+
+                            properties['EEPROM_DUMP'] = codecs.encode(
+                                memory.dump(EEPROM_ADDRESS, EEPROM_DUMP_LENGTH), 'hex')
+
+                        if descriptor:
+                            t = KnxBusTargetReport(
+                                address=target,
+                                medium=desc_medium,
+                                type=desc_type,
+                                version=desc_version,
+                                device_serial=serial,
+                                manufacturer=manufacturer,
+                                properties=properties)
+                            self.add_bus_device(protocol.peername, t)
+
+                        # Properly close the TPCI layer
+                        yield from self.bus_disconnect(protocol, target)
+
+                    if alive is not None:
+                        done.add(target)
+                    self.update_checkpoint()
+                finally:
+                    queue.task_done()
+        except asyncio.CancelledError:
+            pass
 
+    @asyncio.coroutine
+    def bus_scan(self, knx_gateway, bus_targets):
+        """Scan the bus_targets via a pool of up to max_tunnels tunnel connections
+        to knx_gateway. The pool is limited to the number of tunnels the gateway
+        offers. If a concurrency budget is shared with the description scan,
+        each tunnel takes one of its slots.
+
+        The scan has two stages. A liveness sweep probes all targets with
+        bus_window workers per tunnel and records the alive ones in a bitmap.
+        Alive devices are fingerprinted by fingerprint_window workers per
+        tunnel, so slow devices do not hold up the sweep. With fingerprint_tunnels
+        set, that many tunnels only fingerprint while the others sweep. On
+        shared tunnels, fingerprinting starts after the sweep unless
+        bus_priority is 'fingerprint'."""
+        # Bus targets that have been scanned before the scan was resumed are skipped
+        gateway = (knx_gateway.host, knx_gateway.port)
+        done = self.bus_done.setdefault(gateway, set())
+        alive = self.bus_alive.setdefault(gateway, KnxAddressBitmap())
+        targets = [t for t in bus_targets if t not in done]
+        queue = self.add_bus_queue(gateway, [t for t in targets if t not in alive])
+        # Alive devices that have not been fingerprinted before the scan was resumed
+        found = Queue(loop=self.loop)
+        for target in targets:
+            if target in alive:
+                found.put_nowait(target)
+        LOGGER.info('Scanning {} bus device(s) on {}'.format(len(targets), knx_gateway.host))
+        if not targets:
+            # The bus scan has been finished before the scan was resumed
+            self.add_bus_devices(knx_gateway, bus_scanned=True)
+            for sink in self.sinks:
+                sink.write_bus_scan(knx_gateway)
+            return
+        slots = 0
+        if self.slots:
+            yield from self.slots.acquire()
+            slots = 1
+        t0 = time.time()
+        try:
+            tunnels = 1
+            if self.max_tunnels > 1 and len(targets) > 1:
+                count = yield from self.count_tunnels(knx_gateway)
+                LOGGER.info('{} offers {} tunnel(s)'.format(
+                    knx_gateway.host, count if count else 'an unknown number of'))
+                tunnels = min(self.max_tunnels, count or self.max_tunnels, len(targets))
+            if self.slots:
+                # Additional tunnels are only opened if the budget allows it right away
+                while slots < tunnels and not self.slots.locked():
+                    yield from self.slots.acquire()
+                    slots += 1
+                tunnels = slots
+            protocols = yield from asyncio.gather(
+                *[self.open_tunnel(knx_gateway) for _ in range(tunnels)], loop=self.loop)
+            protocols = [p for p in protocols if p]
+            connected = bool(protocols)
+
+            if connected:
+                if 0 < self.fingerprint_tunnels < len(protocols):
+                    fingerprinters = protocols[:self.fingerprint_tunnels]
+                    sweepers = protocols[self.fingerprint_tunnels:]
+                else:
+                    fingerprinters = list()
+                    sweepers = protocols
+                    if self.bus_priority == 'fingerprint':
+                        fingerprinters = protocols
+                LOGGER.info('Scanning {} via {} tunnel(s), {} target(s) in flight per tunnel'.format(
+                    knx_gateway.host, len(protocols), self.bus_window))
+                workers = [asyncio.Task(self.knx_sweep_worker(p, queue, alive, found, done), loop=self.loop)
+                           for p in sweepers for _ in range(self.bus_window)]
+                workers += [asyncio.Task(self.knx_bus_worker(p.transport, p, found, done), loop=self.loop)
+                            for p in fingerprinters for _ in range(self.fingerprint_window)]
+                sweep_t0 = time.time()
+                yield from queue.join()
+                LOGGER.info('Liveness sweep of {} found {} alive device(s) in {} seconds'.format(
+                    knx_gateway.host, len(alive), time.time() - sweep_t0))
+                # Tunnels that are done with the sweep help fingerprinting
+                workers += [asyncio.Task(self.knx_bus_worker(p.transport, p, found, done), loop=self.loop)
+                            for p in protocols if p not in fingerprinters
+                            for _ in range(self.fingerprint_window)]
+                yield from found.join()
+                for w in workers:
+                    w.cancel()
+                stats = collections.Counter()
+                for p in protocols:
+                    p.knx_tunnel_disconnect()
+                    stats.update(p.response_stats())
+                LOGGER.info('Responses via {}: {} matched, {} matched late, {} dropped, '
+                            '{} unmatched, {} timed out'.format(
+                                knx_gateway.host, stats['matched'], stats['matched_late'],
+                                stats['dropped'], stats['unmatched'], stats['timeouts']))
+        finally:
+            for _ in range(slots):
+                self.slots.release()
+
+        self.add_bus_devices(knx_gateway, bus_scanned=connected)
         if connected:
-            workers = [asyncio.Task(self.knx_bus_worker(transport, bus_protocol, queue), loop=self.loop)]
-            self.t0 = time.time()
-            yield from queue.join()
-            self.t1 = time.time()
-            for w in workers:
-                w.cancel()
-            bus_protocol.knx_tunnel_disconnect()
+            for sink in self.sinks:
+                sink.write_bus_scan(knx_gateway)
+        self.save_checkpoint()
+
+        LOGGER.info('Bus scan of {} took {} seconds'.format(knx_gateway.host, time.time() - t0))
 
-        for i in self.bus_devices:
-            knx_gateway.bus_devices.append(i)
+    @asyncio.coroutine
+    def open_tunnel(self, knx_gateway):
+        """Open a tunnel connection to knx_gateway. Returns the protocol instance,
+        or None if the gateway rejected the connection or did not respond."""
+        future = asyncio.Future(loop=self.loop)
+        rtt = self.gateway_rtt((knx_gateway.host, knx_gateway.port))
+        transport, protocol = yield from self.loop.create_datagram_endpoint(
+            functools.partial(KnxTunnelConnection, future, rtt=rtt),
+            remote_addr=(knx_gateway.host, knx_gateway.port))
+        try:
+            # Make sure the tunnel has been established
+            connected = yield from asyncio.wait_for(future, rtt.timeout, loop=self.loop)
+        except asyncio.TimeoutError:
+            connected = False
+        if not connected:
+            transport.close()
+            return None
+        self.bus_protocols.append(protocol)
+        return protocol
 
-        LOGGER.info('Bus scan took {} seconds'.format(self.t1 - self.t0))
+    @asyncio.coroutine
+    def count_tunnels(self, knx_gateway):
+        """Return the number of tunnelling connections that knx_gateway offers.
+        The individual addresses of the tunnels are listed in the property
+        PID_ADDITIONAL_INDIVIDUAL_ADDRESSES of the KNXnet/IP parameter object,
+        which is read via a device management connection. Returns None if the
+        number cannot be read."""
+        if 'KNXnet/IP Device Management' not in knx_gateway.supported_services:
+            return None
+        future = asyncio.Future(loop=self.loop)
+        rtt = self.gateway_rtt((knx_gateway.host, knx_gateway.port))
+        transport, protocol = yield from self.loop.create_datagram_endpoint(
+            functools.partial(KnxTunnelConnection, future,
+                              connection_type=_LAYER_TYPES.get('DEVICE_MGMT_CONNECTION'),
+                              rtt=rtt),
+            remote_addr=(knx_gateway.host, knx_gateway.port))
+        try:
+            connected = yield from asyncio.wait_for(future, rtt.timeout, loop=self.loop)
+        except asyncio.TimeoutError:
+            connected = False
+        if not connected:
+            transport.close()
+            return None
+        # Reading element 0 returns the number of elements
+        count = yield from protocol.knx_property_read(
+            object_type=11,  # KNXnet/IP parameter object
+            property_id=PARAMETER_OBJECTS.get('PID_ADDITIONAL_INDIVIDUAL_ADDRESSES'),
+            start_index=0)
+        protocol.knx_tunnel_disconnect()
+        if not count:
+            return None
+        return int.from_bytes(count, 'big') or None
+
+    def start_bus_scan(self, knx_gateway):
+        """Start the bus scan of knx_gateway right away, while the description
+        scan continues. In incremental scans unchanged gateways are skipped."""
+        if self.store and not self.compare_gateway(self.store, self.ttl, knx_gateway):
+            self.report_gateway(knx_gateway)
+            return
+        self.bus_scanners.append(asyncio.Task(
+            self.bus_scan(knx_gateway, self.bus_targets), loop=self.loop))
+
+    @staticmethod
+    def _age(timestamp):
+        return '{:.1f}h ago'.format((time.time() - timestamp) / 3600)
+
+    def compare_gateway(self, store, ttl, t):
+        """Compare the KnxTargetReport t with its most recent result of previous
+        scans in the ResultStore store and add the differences to diff.
+
+        Returns True if t needs a bus scan, which is the case for new and changed
+        gateways and for gateways that have not been bus scanned within the last
+        ttl seconds."""
+        row = store.last_gateway(t.host, t.port)
+        if row is None:
+            self.diff.append(('new', t.host, t.port, list()))
+            return True
+        record = gateway_record(t)
+        previous = dict(row)
+        previous['supported_services'] = json.loads(previous['supported_services'] or '[]')
+        changes = ['{}: {} -> {}'.format(f, previous[f], record[f])
+                   for f in GATEWAY_DIFF_FIELDS if previous[f] != record[f]]
+        if changes:
+            self.diff.append(('changed', t.host, t.port, changes))
+            return True
+        if not self.bus_targets:
+            self.diff.append(('unchanged', t.host, t.port, list()))
+            return False
+        bus_scan = store.last_bus_scan(t.host, t.port)
+        if bus_scan is None:
+            self.diff.append(('expired', t.host, t.port, ['never bus scanned']))
+            return True
+        if time.time() - bus_scan['finished'] > ttl:
+            self.diff.append(('expired', t.host, t.port, ['bus scanned {}'.format(
+                self._age(bus_scan['finished']))]))
+            return True
+        self.diff.append(('unchanged', t.host, t.port, ['bus scanned {} in run {}'.format(
+            self._age(bus_scan['finished']), bus_scan['run'])]))
+        return False
+
+    def compare_gone_gateways(self, store):
+        """Add the gateways of previous scans in the ResultStore store that are
+        part of the targets, but have not been found again, to diff."""
+        found = set((t.host, t.port) for t in self.knx_gateways)
+        for row in store.last_gateways():
+            target = (row['host'], row['port'])
+            if target not in found and target in self.targets:
+                self.diff.append(('gone', row['host'], row['port'], ['last seen {} in run {}'.format(
+                    self._age(row['seen']), row['run'])]))
+
+    def compare_bus_devices(self, store):
+        """Add the differences of the bus devices of rescanned gateways to the
+        bus devices of their previous bus scan to diff."""
+        store.flush()
+        for state, host, port, notes in self.diff:
+            if state not in ('changed', 'expired'):
+                continue
+            bus_scan = store.last_bus_scan(host, port)
+            if bus_scan is None:
+                continue
+            previous = {d['knx_address']: d for d in store.bus_devices_of(bus_scan['run'], host, port)}
+            current = {d['knx_address']: d for d in store.bus_devices_of(store.run, host, port)}
+            for address in sorted(previous.keys() | current.keys(), key=KnxMessage.pack_knx_address):
+                if address not in previous:
+                    notes.append('bus device added: {}'.format(address))
+                elif address not in current:
+                    notes.append('bus device removed: {}'.format(address))
+                else:
+                    changes = [f for f in BUS_DEVICE_DIFF_FIELDS
+                               if previous[address][f] != current[address][f]]
+                    if changes:
+                        notes.append('bus device changed: {} ({})'.format(address, ', '.join(changes)))
+
+    def print_diff(self):
+        print('Changes since the previous scan:')
+        for state, host, port, notes in sorted(
+                self.diff, key=lambda d: (ipaddress.ip_address(d[1]), d[2])):
+            print('   {:<9} {}:{}'.format(state.upper(), host, port))
+            for note in notes:
+                print('      {}'.format(note))
+        counts = collections.Counter(d[0] for d in self.diff)
+        print('   {} new, {} changed, {} expired, {} unchanged, {} gone'.format(
+            counts['new'], counts['changed'], counts['expired'], counts['unchanged'], counts['gone']))
+
+    def add_bus_devices(self, knx_gateway, bus_scanned=False):
+        """Add the found bus devices to the KnxTargetReport of knx_gateway."""
+        for i in self.bus_devices.get((knx_gateway.host, knx_gateway.port), ()):
+            if i not in knx_gateway.bus_devices:
+                knx_gateway.bus_devices.append(i)
+        self.report_gateway(knx_gateway, bus_scanned)
 
     @asyncio.coroutine
     def knx_search_worker(self):
@@ -317,22 +869,7 @@ class KnxMap:
                 for response in protocol.responses:
                     peer = response[0]
                     response = response[1]
-                    t = KnxTargetReport(
-                        host=peer[0],
-                        port=peer[1],
-                        mac_address=response.body.get('dib_dev_info').get('knx_mac_address'),
-                        knx_address=response.body.get('dib_dev_info').get('knx_address'),
-                        device_serial=response.body.get('dib_dev_info').get('knx_device_serial'),
-                        friendly_name=response.body.get('dib_dev_info').get('device_friendly_name'),
-                        device_status=response.body.get('dib_dev_info').get('device_status'),
-                        knx_medium=response.body.get('dib_dev_info').get('knx_medium'),
-                        project_install_identifier=response.body.get('dib_dev_info').get('project_install_identifier'),
-                        supported_services=[
-                            KNX_SERVICES[k] for k, v in
-                            response.body.get('dib_supp_sv_families').get('families').items()],
-                        bus_devices=[])
-
-                    self.knx_gateways.append(t)
+                    self.add_gateway(peer, response)
         except asyncio.CancelledError:
             pass
 
@@ -343,44 +880,6 @@ class KnxMap:
         self.t1 = time.time()
         LOGGER.info('Scan took {} seconds'.format(self.t1 - self.t0))
 
-    @asyncio.coroutine
-    def knx_description_worker(self):
-        """Send a KnxDescription request to see if target is a KNX device."""
-        try:
-            while True:
-                target = self.q.get_nowait()
-                LOGGER.debug('Scanning {}'.format(target))
-                for _try in range(self.desc_retries):
-                    LOGGER.debug('Sending {}. KnxDescriptionRequest to {}'.format(_try, target))
-                    future = asyncio.Future()
-                    yield from self.loop.create_datagram_endpoint(
-                        functools.partial(KnxGatewayDescription, future, timeout=self.desc_timeout),
-                        remote_addr=target)
-                    response = yield from future
-                    if response:
-                        break
-
-                if response and isinstance(response, KnxDescriptionResponse):
-                    t = KnxTargetReport(
-                        host=target[0],
-                        port=target[1],
-                        mac_address=response.body.get('dib_dev_info').get('knx_mac_address'),
-                        knx_address=response.body.get('dib_dev_info').get('knx_address'),
-                        device_serial=response.body.get('dib_dev_info').get('knx_device_serial'),
-                        friendly_name=response.body.get('dib_dev_info').get('device_friendly_name'),
-                        device_status=response.body.get('dib_dev_info').get('device_status'),
-                        knx_medium=response.body.get('dib_dev_info').get('knx_medium'),
-                        project_install_identifier=response.body.get('dib_dev_info').get('project_install_identifier'),
-                        supported_services=[
-                            KNX_SERVICES[k] for k, v in
-                            response.body.get('dib_supp_sv_families').get('families').items()],
-                        bus_devices=[])
-
-                    self.knx_gateways.append(t)
-                self.q.task_done()
-        except (asyncio.CancelledError, asyncio.QueueEmpty):
-            pass
-
     @asyncio.coroutine
     def monitor(self, targets=None, group_monitor_mode=False):
         if targets:
@@ -392,7 +891,7 @@ class KnxMap:
         future = asyncio.Future()
         transport, protocol = yield from self.loop.create_datagram_endpoint(
             functools.partial(KnxBusMonitor, future, group_monitor=group_monitor_mode),
-            remote_addr=list(self.targets)[0])
+            remote_addr=next(iter(self.targets)))
         self.bus_protocols.append(protocol)
         yield from future
         if group_monitor_mode:
@@ -418,46 +917,144 @@ class KnxMap:
         yield from asyncio.wait(tasks)
 
     @asyncio.coroutine
-    def scan(self, targets=None, desc_timeout=2, desc_retries=2,
-             bus_targets=None, bus_info=False, auth_key=0xffffffff):
-        """The function that will be called by run_until_complete(). This is the main coroutine."""
+    def scan(self, targets=None, desc_timeout=2, desc_retries=2, desc_rate=0,
+             desc_adaptive_rate=False, desc_max_rate=None, desc_round_delay=0,
+             timeout_floor=0.5, timeout_ceiling=10, bus_targets=None,
+             bus_info=False, auth_key=0xffffffff, checkpoint=None, checkpoint_interval=30,
+             incremental=False, ttl=86400, max_tunnels=4, bus_window=8,
+             fingerprint_window=4, fingerprint_tunnels=0, bus_priority='sweep'):
+        """The function that will be called by run_until_complete(). This is the main coroutine.
+        If checkpoint is set, the progress is written to this file periodically.
+
+        Discovery and bus scans run as a pipeline: the bus scan of a gateway
+        starts as soon as it has been found. Outstanding description requests
+        and bus scans share a budget of max_workers slots.
+
+        In incremental mode the found gateways are compared with the previous
+        scans in the ResultStore of the sinks. Only new and changed gateways, and
+        gateways that have not been bus scanned within ttl seconds, are bus
+        scanned. The differences are printed before the gateways."""
         self.auth_key = auth_key
         if targets:
             self.set_targets(targets)
 
         self.desc_timeout = desc_timeout
         self.desc_retries = desc_retries
-        workers = [asyncio.Task(self.knx_description_worker(), loop=self.loop)
-                   for _ in range(self.max_workers if len(self.targets) > self.max_workers else len(self.targets))]
+        self.desc_rate = desc_rate
+        self.desc_adaptive_rate = desc_adaptive_rate
+        self.desc_max_rate = desc_max_rate
+        self.desc_round_delay = desc_round_delay
+        self.timeout_floor = timeout_floor
+        self.timeout_ceiling = timeout_ceiling
+        self.bus_targets = bus_targets
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_time = time.time()
+        self.bus_info = bus_info
+        self.ttl = ttl
+        self.max_tunnels = max_tunnels
+        self.bus_window = max(1, bus_window)
+        self.fingerprint_window = max(1, fingerprint_window)
+        self.fingerprint_tunnels = fingerprint_tunnels
+        self.bus_priority = bus_priority
+        if incremental:
+            self.store = next((s for s in self.sinks if isinstance(s, ResultStore)), None)
+            if self.store is None:
+                LOGGER.error('Incremental scans require a result store, scanning all gateways')
+        self.slots = asyncio.Semaphore(self.max_workers, loop=self.loop)
+        t0 = time.time()
+        self.write_restored_results()
+        if bus_targets:
+            # Gateways that have been found before the scan was resumed
+            for g in self.knx_gateways:
+                self.start_bus_scan(g)
+        yield from self.description_scan()
+        duration = self.t1 - self.t0
+        LOGGER.info('Description scan took {} seconds, sent {} requests ({:.1f} pps)'.format(
+            duration, self.desc_sent, self.desc_sent / duration if duration else 0))
+
+        if self.bus_scanners:
+            yield from asyncio.wait(self.bus_scanners)
+            LOGGER.info('{} of {} gateway(s) have been bus scanned'.format(
+                len(self.bus_scanners), len(self.knx_gateways)))
+        LOGGER.info('Scan took {} seconds'.format(time.time() - t0))
+
+        if self.store:
+            self.compare_gone_gateways(self.store)
+            if self.bus_scanners:
+                self.compare_bus_devices(self.store)
+
+        if self.results is None:
+            if self.store:
+                self.print_diff()
+            for t in self.knx_gateways:
+                print_knx_target(t)
+
+    @asyncio.coroutine
+    def scan_processes(self, processes, targets=None, **kwargs):
+        """Split the targets into shards that are scanned by worker processes,
+        each with its own event loop and sockets. The keyword arguments are
+        passed to scan(). Rate limits and max_workers are shared by all
+        processes. The KnxTargetReports of all processes are printed in one
+        summary."""
+        if targets:
+            self.set_targets(targets)
+        if kwargs.get('desc_rate'):
+            kwargs['desc_rate'] = max(1, kwargs['desc_rate'] / processes)
+        if kwargs.get('desc_max_rate'):
+            kwargs['desc_max_rate'] = max(1, kwargs['desc_max_rate'] / processes)
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(
+            target=scan_shard,
+            args=(shard, results, max(1, self.max_workers // processes), kwargs),
+            daemon=True) for shard in self.targets.split(processes)]
         self.t0 = time.time()
-        yield from self.q.join()
-        self.t1 = time.time()
         for w in workers:
-            w.cancel()
-
-        if bus_targets and self.knx_gateways:
-            self.bus_info = bus_info
-            bus_scanners = [asyncio.Task(self.bus_scan(g, bus_targets), loop=self.loop) for g in self.knx_gateways]
-            yield from asyncio.wait(bus_scanners)
-        else:
-            LOGGER.info('Scan took {} seconds'.format(self.t1 - self.t0))
+            w.start()
+        running = len(workers)
+        try:
+            while running:
+                try:
+                    result = yield from self.loop.run_in_executor(
+                        None, functools.partial(results.get, timeout=1))
+                except queue.Empty:
+                    if not any(w.is_alive() for w in workers):
+                        LOGGER.error('Worker processes exited unexpectedly')
+                        break
+                    continue
+                if isinstance(result, tuple):
+                    report, bus_scanned = result
+                    self.knx_gateways.append(report)
+                    for sink in self.sinks:
+                        sink.write_gateway(report)
+                        for d in report.bus_devices:
+                            sink.write_bus_device((report.host, report.port), d)
+                        if bus_scanned:
+                            sink.write_bus_scan(report)
+                else:
+                    # A worker finished and sent the number of description requests
+                    running -= 1
+                    self.desc_sent += result
+        finally:
+            for w in workers:
+                w.join()
+        self.t1 = time.time()
 
-        for t in self.knx_gateways:
+        duration = self.t1 - self.t0
+        LOGGER.info('Scan took {} seconds with {} processes, sent {} requests ({:.1f} pps)'.format(
+            duration, processes, self.desc_sent, self.desc_sent / duration if duration else 0))
+        for t in sorted(self.knx_gateways, key=lambda t: (ipaddress.ip_address(t.host), t.port)):
             print_knx_target(t)
 
     @asyncio.coroutine
     def group_writer(self, target, value=0, routing=False, desc_timeout=2,
-                     desc_retries=2, iface=False):
+                     desc_retries=2, timeout_floor=0.5, timeout_ceiling=10, iface=False):
         self.desc_timeout = desc_timeout
         self.desc_retries = desc_retries
+        self.timeout_floor = timeout_floor
+        self.timeout_ceiling = timeout_ceiling
         self.iface = iface
-        workers = [asyncio.Task(self.knx_description_worker(), loop=self.loop)
-                   for _ in range(self.max_workers if len(self.targets) > self.max_workers else len(self.targets))]
-        self.t0 = time.time()
-        yield from self.q.join()
-        self.t1 = time.time()
-        for w in workers:
-            w.cancel()
+        yield from self.description_scan()
 
         if self.knx_gateways:
             # TODO: make sure only a single gateway is supplied
@@ -501,7 +1098,8 @@ class KnxMap:
 
             future = asyncio.Future()
             transport, protocol = yield from self.loop.create_datagram_endpoint(
-                functools.partial(KnxTunnelConnection, future),
+                functools.partial(KnxTunnelConnection, future,
+                                  rtt=self.gateway_rtt((knx_gateway.host, knx_gateway.port))),
                 remote_addr=(knx_gateway.host, knx_gateway.port))
             self.bus_protocols.append(protocol)
 
@@ -514,3 +1112,23 @@ class KnxMap:
                     value = int(value)
                 yield from protocol.apci_group_value_write(target, value=value)
                 protocol.knx_tunnel_disconnect()
+
+
+def scan_shard(targets, results, max_workers, kwargs):
+    """Scan a shard of targets with its own KnxMap instance and event loop. This
+    is the entry point of worker processes. Finished KnxTargetReports are sent
+    to results as (report, bus_scanned) tuples, followed by the number of sent
+    description requests."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    knxmap = KnxMap(targets=targets, max_workers=max_workers, loop=loop, results=results)
+    try:
+        loop.run_until_complete(knxmap.scan(**kwargs))
+    except KeyboardInterrupt:
+        # Make sure to send a DISCONNECT_REQUEST
+        # for open tunnel connections.
+        for p in knxmap.bus_protocols:
+            p.knx_tunnel_disconnect()
+    finally:
+        results.put(knxmap.desc_sent)
+        loop.close()
@@ -25,7 +25,8 @@ __all__ = ['KNX_CONSTANTS',
            'OBJECT_TYPES',
            'DEVICE_OBJECTS',
            'PARAMETER_OBJECTS',
-           'OBJECTS']
+           'OBJECTS',
+           'PROPERTY_DATATYPE_SIZES']
 
 KNX_CONSTANTS = {
     'KNXNETIP_VERSION_10': 0x10,
@@ -604,3 +605,31 @@ OBJECTS = {
 for k, v in OBJECTS.items():
     OBJECTS[k] = collections.OrderedDict(
         sorted(v.items(), key=lambda v: v[1]))
+
+# Size of one element of the property datatypes (PDT), types
+# with a variable length are not listed
+PROPERTY_DATATYPE_SIZES = {
+    0x01: 1,  # PDT_CHAR
+    0x02: 1,  # PDT_UNSIGNED_CHAR
+    0x03: 2,  # PDT_INT
+    0x04: 2,  # PDT_UNSIGNED_INT
+    0x05: 2,  # PDT_KNX_FLOAT
+    0x06: 3,  # PDT_DATE
+    0x07: 3,  # PDT_TIME
+    0x08: 4,  # PDT_LONG
+    0x09: 4,  # PDT_UNSIGNED_LONG
+    0x0a: 4,  # PDT_FLOAT
+    0x0b: 8,  # PDT_DOUBLE
+    0x0c: 10,  # PDT_CHAR_BLOCK
+    0x0d: 3,  # PDT_POLL_GROUP_SETTINGS
+    0x0e: 5,  # PDT_SHORT_CHAR_BLOCK
+    0x0f: 8,  # PDT_DATE_TIME
+    0x30: 2,  # PDT_VERSION
+    0x31: 6,  # PDT_ALARM_INFO
+    0x32: 1,  # PDT_BINARY_INFORMATION
+    0x33: 1,  # PDT_BITSET8
+    0x34: 2,  # PDT_BITSET16
+    0x35: 1,  # PDT_ENUM8
+    0x36: 1}  # PDT_SCALING
+# PDT_GENERIC_01 to PDT_GENERIC_20
+PROPERTY_DATATYPE_SIZES.update({0x10 + n: n for n in range(1, 21)})
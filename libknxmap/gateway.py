@@ -1,15 +1,29 @@
 """Implementation of KNXnet/IP communication with KNXnet/IP gateways."""
 import asyncio
+import collections
+import errno
 import logging
+import socket
+import struct
+import sys
 
 from libknxmap.data.constants import *
 from libknxmap.messages import *
 
 __all__ = ['KnxGatewaySearch',
-           'KnxGatewayDescription']
+           'KnxDescriptionScanner',
+           'PacketRateLimiter',
+           'RttEstimator',
+           'get_local_address']
 
 LOGGER = logging.getLogger(__name__)
 
+# Linux only, not exposed by the socket module
+IP_RECVERR = 11
+SO_EE_ORIGIN_ICMP = 2
+# struct sock_extended_err: ee_errno, ee_origin, ee_type, ee_code
+SOCK_EXTENDED_ERR = struct.Struct('=IBBB')
+
 
 class KnxGatewaySearch(asyncio.DatagramProtocol):
     """A protocol implementation for searching KNXnet/IP gateways via
@@ -36,32 +50,258 @@ class KnxGatewaySearch(asyncio.DatagramProtocol):
             self.responses.add((addr, knx_message))
 
 
-class KnxGatewayDescription(asyncio.DatagramProtocol):
-    """Protocol implelemtation for KNXnet/IP description requests."""
+class KnxDescriptionScanner(asyncio.DatagramProtocol):
+    """Send KNXnet/IP description requests to many targets from a single socket.
+
+    Each probe sends a single request, retransmissions are left to the caller
+    which probes the targets that did not respond again in a later round.
+    Responses are matched to the outstanding probes by their peer address.
+    All probes share the same timeout, so their deadlines are kept in a single
+    queue in the order they have been sent and one timer handles all of them.
+    Each description response is passed to callback(target, response, rtt). If a
+    PacketRateLimiter is supplied, all requests are sent at its rate. A semaphore
+    can be passed as slots to share the limit of outstanding probes with other
+    tasks, otherwise the limit is max_probes. The targets that responded or
+    sent ICMP errors are added to the sets responded and closed, which can
+    be any set-like container like a TargetBitmap.
+
+    On Linux, ICMP errors (e.g. port unreachable) are read from the error
+    queue of the socket and close the probe of the affected target at once."""
 
-    def __init__(self, future, loop=None, timeout=2):
-        self.future = future
+    def __init__(self, callback, loop=None, timeout=2, max_probes=100, limiter=None, slots=None,
+                 responded=None, closed=None):
+        self.callback = callback
+        self.limiter = limiter
+        # The number of requests that have been sent
+        self.sent = 0
         self.loop = loop or asyncio.get_event_loop()
         self.transport = None
+        self.sockname = None
         self.timeout = timeout
+        # The send time of each outstanding probe
+        self.probes = dict()
+        # Targets that responded, they do not have to be probed again
+        self.responded = responded if responded is not None else set()
+        # Targets that responded with an ICMP error
+        self.closed = closed if closed is not None else set()
+        # (deadline, target) for each request that has been sent
+        self.deadlines = collections.deque()
+        self.timer = None
+        self.request = None
+        self.slots = slots or asyncio.Semaphore(max_probes, loop=self.loop)
+        self.idle = asyncio.Event(loop=self.loop)
+        self.idle.set()
 
     def connection_made(self, transport):
         self.transport = transport
-        self.peername = self.transport.get_extra_info('peername')
         self.sockname = self.transport.get_extra_info('sockname')
-        self.wait = self.loop.call_later(self.timeout, self.connection_timeout)
-        packet = KnxDescriptionRequest(sockname=self.sockname)
-        self.transport.sendto(packet.get_message())
+        if sys.platform.startswith('linux'):
+            # Unconnected sockets only report ICMP errors with IP_RECVERR
+            self.transport.get_extra_info('socket').setsockopt(
+                socket.IPPROTO_IP, IP_RECVERR, 1)
+        # The request is the same for all targets
+        self.request = KnxDescriptionRequest(sockname=self.sockname).get_message()
 
-    def connection_timeout(self):
-        self.transport.close()
-        self.future.set_result(False)
+    @asyncio.coroutine
+    def probe(self, target):
+        """Wait until less than max_probes probes are outstanding
+        and send a description request to target."""
+        yield from self.slots.acquire()
+        if self.limiter:
+            yield from self.limiter.acquire()
+        self.idle.clear()
+        LOGGER.debug('Sending KnxDescriptionRequest to {}'.format(target))
+        self.transport.sendto(self.request, target)
+        self.sent += 1
+        now = self.loop.time()
+        self.probes[target] = now
+        self.deadlines.append((now + self.timeout, target))
+        if not self.timer:
+            self.timer = self.loop.call_at(self.deadlines[0][0], self._check_timeouts)
+
+    @asyncio.coroutine
+    def join(self):
+        """Wait until all probes have been answered or timed out."""
+        yield from self.idle.wait()
+
+    def _finish(self, target):
+        del self.probes[target]
+        self.slots.release()
+        if not self.probes:
+            # Deadlines left are from answered probes
+            self.deadlines.clear()
+            self.idle.set()
+
+    def _check_timeouts(self):
+        self.timer = None
+        now = self.loop.time()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, target = self.deadlines.popleft()
+            if target not in self.probes:
+                # Already answered
+                continue
+            if self.limiter:
+                self.limiter.add_timeout()
+            self._finish(target)
+        if self.deadlines:
+            self.timer = self.loop.call_at(self.deadlines[0][0], self._check_timeouts)
 
     def datagram_received(self, data, addr):
-        self.wait.cancel()
-        self.transport.close()
+        if addr not in self.probes:
+            # Late response or not a target
+            return
+        rtt = self.loop.time() - self.probes[addr]
+        self._finish(addr)
+        self.responded.add(addr)
+        if self.limiter:
+            self.limiter.add_response()
         knx_message = parse_message(data)
         if knx_message and isinstance(knx_message, KnxDescriptionResponse):
-            self.future.set_result(knx_message)
+            self.callback(addr, knx_message, rtt)
+
+    def error_received(self, exc):
+        if not sys.platform.startswith('linux'):
+            LOGGER.debug('Socket error: {}'.format(exc))
+            return
+        sock = self.transport.get_extra_info('socket')
+        while True:
+            try:
+                _, ancdata, _, target = sock.recvmsg(1, 1024, socket.MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                LOGGER.debug('Reading socket error queue failed: {}'.format(e))
+                return
+            for level, _type, data in ancdata:
+                if level != socket.IPPROTO_IP or _type != IP_RECVERR:
+                    continue
+                ee_errno, ee_origin, _, _ = SOCK_EXTENDED_ERR.unpack_from(data)
+                if ee_origin != SO_EE_ORIGIN_ICMP or target not in self.probes:
+                    continue
+                LOGGER.debug('{} for {}'.format(errno.errorcode.get(ee_errno, ee_errno), target))
+                self._finish(target)
+                self.closed.add(target)
+                if self.limiter:
+                    self.limiter.add_response()
+
+    def close(self):
+        if self.timer:
+            self.timer.cancel()
+        self.transport.close()
+
+
+class PacketRateLimiter:
+    """A token bucket that limits the rate of sent packets.
+
+    In adaptive mode the rate is adjusted every window seconds (AIMD). It is
+    increased additively while the ratio of timed out requests is stable,
+    and halved if the timeouts spike above their moving average."""
+
+    MIN_SAMPLES = 10
+    SPIKE = 0.1
+
+    def __init__(self, rate, adaptive=False, max_rate=None, min_rate=1, window=1.0, loop=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.rate = float(rate)
+        self.adaptive = adaptive
+        self.max_rate = max(self.rate, max_rate or self.rate)
+        self.min_rate = min(self.rate, min_rate)
+        self.increase = max(1.0, self.rate / 10)
+        self.window = window
+        self.tokens = self.burst = max(1.0, self.rate / 10)
+        self.updated = self.window_start = self.loop.time()
+        self.responses = 0
+        self.timeouts = 0
+        # Moving average of the ratio of timed out requests
+        self.timeout_ratio = None
+
+    def _refill(self):
+        now = self.loop.time()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.adaptive and now - self.window_start >= self.window:
+            self._adjust()
+            self.window_start = now
+
+    def _adjust(self):
+        samples = self.responses + self.timeouts
+        if samples < self.MIN_SAMPLES:
+            return
+        ratio = self.timeouts / samples
+        self.responses = self.timeouts = 0
+        if self.timeout_ratio is not None and ratio > self.timeout_ratio + self.SPIKE:
+            self.rate = max(self.min_rate, self.rate / 2)
+            LOGGER.debug('Timeouts increased to {:.2f}, reducing rate to {:.1f} pps'.format(
+                ratio, self.rate))
         else:
-            self.future.set_result(False)
+            self.rate = min(self.max_rate, self.rate + self.increase)
+        self.burst = max(1.0, self.rate / 10)
+        if self.timeout_ratio is None:
+            self.timeout_ratio = ratio
+        else:
+            self.timeout_ratio = 0.75 * self.timeout_ratio + 0.25 * ratio
+
+    @asyncio.coroutine
+    def acquire(self):
+        """Wait until the next packet may be sent."""
+        self._refill()
+        while self.tokens < 1:
+            yield from asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+    def add_response(self):
+        self.responses += 1
+
+    def add_timeout(self):
+        self.timeouts += 1
+
+
+class RttEstimator:
+    """Smoothed round trip time estimation like the TCP retransmission
+    timer (RFC 6298). The timeout is SRTT + 4 * RTTVAR, limited to the
+    range of floor and ceiling. It is initial until the first sample."""
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, initial=2, floor=0.5, ceiling=10):
+        self.initial = initial
+        self.floor = floor
+        self.ceiling = ceiling
+        self.srtt = None
+        self.rttvar = None
+
+    def update(self, rtt):
+        """Add a round trip time sample in seconds."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+
+    @property
+    def timeout(self):
+        if self.srtt is None:
+            timeout = self.initial
+        else:
+            timeout = self.srtt + self.K * self.rttvar
+        return min(self.ceiling, max(self.floor, timeout))
+
+
+def get_local_address(target):
+    """Return the local IP address that is used to reach target, or the
+    wildcard address if target is not a routable IPv4 address. Gateways
+    reply to the source address of requests that carry the wildcard."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # Connecting a UDP socket only selects the route, nothing is sent
+        sock.connect(target)
+        return sock.getsockname()[0]
+    except OSError as e:
+        LOGGER.debug('No route to {}: {}'.format(target, e))
+        return '0.0.0.0'
+    finally:
+        sock.close()
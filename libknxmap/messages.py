@@ -1,6 +1,5 @@
 """KNXnet/IP message implementations required bny KNXmap."""
 import collections
-import io
 import logging
 import socket
 import struct
@@ -9,6 +8,12 @@ from libknxmap.data.constants import *
 
 __all__ = ['parse_message',
            'KnxMessage',
+           'KnxCemiFrame',
+           'KnxHpai',
+           'KnxDibDevInfo',
+           'KnxDibSuppSvFamilies',
+           'KnxConnectionRequestInformation',
+           'KnxConnectionResponseDataBlock',
            'KnxSearchRequest',
            'KnxSearchResponse',
            'KnxDescriptionRequest',
@@ -17,6 +22,7 @@ __all__ = ['parse_message',
            'KnxConnectResponse',
            'KnxTunnellingRequest',
            'KnxTunnellingAck',
+           'KnxTunnelEncoder',
            'KnxConnectionStateRequest',
            'KnxConnectionStateResponse',
            'KnxDisconnectRequest',
@@ -29,6 +35,71 @@ __all__ = ['parse_message',
 
 LOGGER = logging.getLogger(__name__)
 
+# Precompiled structures that are used to decode frames in
+# place from a memoryview, without any intermediate copies.
+_KNX_HEADER = struct.Struct('!BBHH')
+_KNX_SERVICE_TYPE = struct.Struct('!2xH')
+_HPAI = struct.Struct('!BB4sH')
+_DIB_HEADER = struct.Struct('!BB')
+_DIB_DEV_INFO = struct.Struct('!BBBBHH6s4s6s30s')
+_SERVICE_FAMILY = struct.Struct('!BB')
+_CRI = struct.Struct('!BBBB')
+_CRD = struct.Struct('!BB')
+_CONNECTION_HEADER = struct.Struct('!BBBB')
+_CHANNEL_STATUS = struct.Struct('!BB')
+_CEMI_HEADER = struct.Struct('!BB')
+_CEMI_BUSMONITOR_INFO = struct.Struct('!BBBBBI')
+_CEMI_L_DATA = struct.Struct('!BBHHB')
+_ROUTING_LOST_MESSAGE = struct.Struct('!BBH')
+_ROUTING_BUSY = struct.Struct('!BBHH')
+_PROPERTY_SERVICE = struct.Struct('!BHBBH')  # cEMI M_PropRead/M_PropWrite
+_KNX_ADDRESS = struct.Struct('!H')
+# Structures and offsets of the request specific fields in
+# tunnelling frames, used by KnxTunnelEncoder.
+_MEMORY_READ = struct.Struct('!BH')
+_PROPERTY_READ = struct.Struct('!BBH')
+_PROPERTY_DESCRIPTION_READ = struct.Struct('!BBB')
+_AUTHORIZE_KEY = struct.Struct('!I')
+_TUNNEL_SEQUENCE_OFFSET = 8
+_TUNNEL_DESTINATION_OFFSET = 16
+_TUNNEL_TPCI_OFFSET = 19
+_TUNNEL_APCI_OFFSET = 20
+_TUNNEL_APDU_DATA_OFFSET = 21
+
+
+def _build_cemi_tpci_table():
+    """Map the first TPDU octet to its TPCI type and sequence number."""
+    return tuple(((octet >> 6) & 0x03, (octet >> 2) & 0x0f) for octet in range(256))
+
+
+def _build_cemi_apci_table():
+    """Map the ten APCI bits of a TPDU (the two low bits of the first octet
+    followed by the second octet) to the APCI type and the APCI data. Short
+    APCIs carry six or four bits of data, all others are extended APCIs
+    without any data in the second octet."""
+    apci_types = frozenset(CEMI_APCI_TYPES.values())
+    table = []
+    for bits in range(1024):
+        if bits >> 6 in apci_types:
+            table.append((bits >> 6, bits & 0x3f))
+        elif bits >> 4 in apci_types:
+            table.append((bits >> 4, bits & 0x0f))
+        else:
+            table.append((bits, None))
+    return tuple(table)
+
+
+def _build_knx_address_table():
+    """Format every 16 bit individual address once, so that
+    addresses are only looked up when they are printed."""
+    return tuple('{}.{}.{}'.format(area, line, device)
+                 for area in range(16) for line in range(16) for device in range(256))
+
+
+_CEMI_TPCI_TABLE = _build_cemi_tpci_table()
+_CEMI_APCI_TABLE = _build_cemi_apci_table()
+_KNX_ADDRESS_STRINGS = _build_knx_address_table()
+
 
 def parse_message(data):
     """
@@ -39,8 +110,7 @@ def parse_message(data):
     :return: A class instance of any KnxMessage subclass or None if data is not a valid KNX message.
     """
     try:
-        _, _, message_type = struct.unpack('>BBH', data[:4])
-        message_type = int(message_type)
+        message_type = _KNX_SERVICE_TYPE.unpack_from(data)[0]
     except struct.error as e:
         LOGGER.exception(e)
         return
@@ -48,53 +118,106 @@ def parse_message(data):
         LOGGER.exception(e)
         return
 
-    if message_type == KNX_MESSAGE_TYPES.get('SEARCH_RESPONSE'):
-        LOGGER.debug('Parsing KnxSearchResponse')
-        return KnxSearchResponse(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('DESCRIPTION_RESPONSE'):
-        LOGGER.debug('Parsing KnxDescriptionResponse')
-        return KnxDescriptionResponse(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('CONNECT_RESPONSE'):
-        LOGGER.debug('Parsing KnxConnectResponse')
-        return KnxConnectResponse(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('TUNNELLING_REQUEST'):
-        LOGGER.debug('Parsing KnxTunnellingRequest')
-        return KnxTunnellingRequest(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('TUNNELLING_ACK'):
-        LOGGER.debug('Parsing KnxTunnelingAck')
-        return KnxTunnellingAck(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_REQUEST'):
-        LOGGER.debug('Parsing KnxConnectionStateRequest')
-        return KnxConnectionStateRequest(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_RESPONSE'):
-        LOGGER.debug('Parsing KnxConnectionStateResponse')
-        return KnxConnectionStateResponse(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('DISCONNECT_REQUEST'):
-        LOGGER.debug('Parsing KnxDisconnectRequest')
-        return KnxDisconnectRequest(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('DISCONNECT_RESPONSE'):
-        LOGGER.debug('Parsing KnxDisconnectResponse')
-        return KnxDisconnectResponse(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_REQUEST'):
-        LOGGER.debug('Parsing KnxDeviceConfigurationRequest')
-        return KnxDeviceConfigurationRequest(data)
-    elif message_type == KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_RESPONSE'):
-        LOGGER.debug('Parsing KnxDeviceConfigurationAck')
-        return KnxDeviceConfigurationAck(data)
-    else:
+    message_class = _KNX_MESSAGE_CLASSES.get(message_type)
+    if not message_class:
         LOGGER.error('Unknown message type: {}'.format(message_type))
         return None
+    return message_class(data)
+
+
+KnxHpai = collections.namedtuple(
+    'KnxHpai', ['structure_length', 'protocol_code', 'ip_address', 'port'])
+KnxDibDevInfo = collections.namedtuple(
+    'KnxDibDevInfo', ['structure_length', 'description_type', 'knx_medium', 'device_status',
+                      'knx_address', 'project_install_identifier', 'knx_device_serial',
+                      'knx_dev_multicast_address', 'knx_mac_address', 'device_friendly_name'])
+# families maps each supported service family id to its version
+KnxDibSuppSvFamilies = collections.namedtuple(
+    'KnxDibSuppSvFamilies', ['structure_length', 'description_type', 'families'])
+KnxConnectionRequestInformation = collections.namedtuple(
+    'KnxConnectionRequestInformation', ['structure_length', 'connection_type', 'knx_layer', 'reserved'])
+# knx_address is only included in TUNNEL_CONNECTION data blocks
+KnxConnectionResponseDataBlock = collections.namedtuple(
+    'KnxConnectionResponseDataBlock', ['structure_length', 'connection_type', 'knx_address'])
+
+
+class KnxCemiFrame(object):
+    """A decoded cEMI frame. Frames with additional information (L_Busmon.ind)
+    only include the busmonitor fields and the raw frame, all other frames
+    include the L_Data fields."""
+    __slots__ = ('message_code',
+                 'information_length',
+                 'busmonitor_info',
+                 'busmonitor_info_length',
+                 'busmonitor_info_error_flags',
+                 'extended_relative_timestamp',
+                 'raw_frame',
+                 'controlfield_1',
+                 'controlfield_2',
+                 'knx_source',
+                 'knx_destination',
+                 'npdu_len',
+                 'tpci_type',
+                 'tpci_sequence',
+                 'apci_type',
+                 'apci_data',
+                 'data')
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, None)
+
+    @property
+    def confirm(self):
+        """The confirm flag of controlfield 1, set if a L_Data.con reports an error."""
+        return self.controlfield_1 & 0x01
+
+    def as_dict(self):
+        """Return the frame in the nested representation of KnxMessage.body."""
+        cemi = dict()
+        cemi['message_code'] = self.message_code
+        cemi['information_length'] = self.information_length
+        if self.information_length != 0:
+            cemi['additional_information'] = {}
+            cemi['additional_information']['busmonitor_info'] = self.busmonitor_info
+            cemi['additional_information']['busmonitor_info_length'] = self.busmonitor_info_length
+            cemi['additional_information']['busmonitor_info_error_flags'] = self.busmonitor_info_error_flags
+            cemi['additional_information']['extended_relative_timestamp'] = self.extended_relative_timestamp
+            cemi['raw_frame'] = self.raw_frame
+            return cemi
+        cemi['controlfield_1'] = KnxMessage.unpack_cemi_cf1(self.controlfield_1)
+        cemi['controlfield_2'] = KnxMessage.unpack_cemi_cf2(self.controlfield_2)
+        cemi['knx_source'] = self.knx_source
+        cemi['knx_destination'] = self.knx_destination
+        cemi['npdu_len'] = self.npdu_len
+        cemi['tpci'] = dict()
+        cemi['tpci']['type'] = self.tpci_type
+        cemi['tpci']['sequence'] = self.tpci_sequence
+        if self.npdu_len > 0:
+            cemi['apci'] = dict()
+            cemi['apci']['type'] = self.apci_type
+            cemi['apci']['data'] = self.apci_data
+            cemi['data'] = self.data
+        return cemi
 
 
 class KnxMessage(object):
-    header = {
-        'header_length': KNX_CONSTANTS['HEADER_SIZE_10'],
-        'protocol_version': KNX_CONSTANTS['KNXNETIP_VERSION_10'],
-        'service_type': None,
-        'total_length': 0}
+    __slots__ = ('header_length',
+                 'protocol_version',
+                 'service_type',
+                 'total_length',
+                 'message',
+                 'source',
+                 'port',
+                 'knx_source',
+                 'knx_destination',
+                 'cemi_message_code')
 
     def __init__(self):
-        self.body = collections.OrderedDict()
+        self.header_length = KNX_CONSTANTS['HEADER_SIZE_10']
+        self.protocol_version = KNX_CONSTANTS['KNXNETIP_VERSION_10']
+        self.service_type = None
+        self.total_length = 0
         self.message = None
         self.source = None
         self.port = None
@@ -102,6 +225,27 @@ class KnxMessage(object):
         self.knx_destination = None
         self.cemi_message_code = None
 
+    @property
+    def header(self):
+        """The KNXnet/IP header as a dict."""
+        return {'header_length': self.header_length,
+                'protocol_version': self.protocol_version,
+                'service_type': self.service_type,
+                'total_length': self.total_length}
+
+    @property
+    def body(self):
+        """The message body as nested dicts. It is built on each access for
+        callers that still use this representation, the message fields should
+        be used instead. Packed messages return the packed body."""
+        if self.message:
+            return self.message[_KNX_HEADER.size:]
+        return self._body_dict()
+
+    def _body_dict(self):
+        """Subclasses should define this method."""
+        return collections.OrderedDict()
+
     @staticmethod
     def parse_knx_address(address):
         """Parse physical/individual KNX address.
@@ -116,7 +260,7 @@ class KnxMessage(object):
         '8.6.159'
         """
         assert isinstance(address, int)
-        return '{}.{}.{}'.format((address >> 12) & 0xf, (address >> 8) & 0xf, address & 0xff)
+        return _KNX_ADDRESS_STRINGS[address & 0xffff]
 
     @staticmethod
     def pack_knx_address(address):
@@ -200,8 +344,11 @@ class KnxMessage(object):
         self.knx_source = self.pack_knx_address(address)
 
     def set_knx_destination(self, address):
-        """Set the KNX destination address of a KnxMessage instance."""
-        if '.' in address:
+        """Set the KNX destination address of a KnxMessage instance. The
+        address is either a string or an already packed int."""
+        if isinstance(address, int):
+            self.knx_destination = address
+        elif '.' in address:
             self.knx_destination = self.pack_knx_address(address)
         elif '/' in address:
             self.knx_destination = self.pack_knx_group_address(address)
@@ -213,37 +360,35 @@ class KnxMessage(object):
         # TODO: Maybe use this as string representation?
         return self.message if self.message else None
 
-    def pack_knx_message(self):
-        if not self.body:
+    def pack_knx_message(self, message_body=None):
+        if message_body is None:
             message_body = self._pack_knx_body()
-        else:
-            message_body = self.body
-        self.header['total_length'] = 6 + len(message_body)  # header size is always 6
+        self.total_length = 6 + len(message_body)  # header size is always 6
         self.message = self._pack_knx_header()
         self.message += message_body
 
     def unpack_knx_message(self, message):
-        message = self._unpack_knx_header(message)
+        message = self._unpack_knx_header(memoryview(message))
         self._unpack_knx_body(message)
 
     def _pack_knx_header(self):
         try:
             return struct.pack('!BBHH',
-                               self.header.get('header_length'),
-                               self.header.get('protocol_version'),
-                               self.header.get('service_type'),
-                               self.header.get('total_length'))
+                               self.header_length,
+                               self.protocol_version,
+                               self.service_type,
+                               self.total_length)
         except struct.error as e:
             LOGGER.exception(e)
 
     def _unpack_knx_header(self, message):
-        """Set self.header dict and return message body"""
+        """Set the header fields and return message body"""
         try:
-            self.header['header_length'], \
-            self.header['protocol_version'], \
-            self.header['service_type'], \
-            self.header['total_length'] = struct.unpack('!BBHH', message[:6])
-            return message[6:]
+            self.header_length, \
+            self.protocol_version, \
+            self.service_type, \
+            self.total_length = _KNX_HEADER.unpack_from(message)
+            return message[_KNX_HEADER.size:]
         except struct.error as e:
             LOGGER.exception(e)
 
@@ -255,26 +400,6 @@ class KnxMessage(object):
         """Subclasses must define this method."""
         raise NotImplementedError
 
-    @staticmethod
-    def _unpack_stream(fmt, stream):
-        try:
-            buf = stream.read(struct.calcsize(fmt))
-            return struct.unpack(fmt, buf)[0]
-        except struct.error as e:
-            LOGGER.exception(e)
-
-    def _parse_knx_body_hpai(self, message):
-        try:
-            self.body['hpai'] = dict()
-            self.body['hpai']['structure_length'], \
-            self.body['hpai']['protocol_code'], \
-            self.body['hpai']['ip_address'], \
-            self.body['hpai']['port'] = struct.unpack('!BBHH', message[:8])
-            self.body['hpai']['ip_address'] = socket.inet_aton(self.body['hpai']['ip_address'])
-            return message[8:]
-        except struct.error as e:
-            LOGGER.exception(e)
-
     def _pack_hpai(self):
         hpai = struct.pack('!B', 8)  # structure_length
         hpai += struct.pack('!B', 0x01)  # protocol code
@@ -282,40 +407,49 @@ class KnxMessage(object):
         hpai += struct.pack('!H', self.port)
         return hpai
 
-    def _unpack_hpai(self, message):
-        hpai = dict()
-        hpai['structure_length'] = self._unpack_stream('!B', message)
-        hpai['protocol_code'] = self._unpack_stream('!B', message)
-        hpai['ip_address'] = socket.inet_ntoa(message.read(4))
-        hpai['port'] = self._unpack_stream('!H', message)
-        return hpai
+    @staticmethod
+    def _unpack_hpai(message, offset=0):
+        """Unpack a HPAI structure at offset. Returns the KnxHpai
+        and the offset of the next structure."""
+        structure_length, protocol_code, ip_address, port = _HPAI.unpack_from(message, offset)
+        hpai = KnxHpai(structure_length, protocol_code, socket.inet_ntoa(ip_address), port)
+        return hpai, offset + _HPAI.size
+
+    def _unpack_dib_dev_info(self, message, offset=0):
+        structure_length, description_type, knx_medium, device_status, knx_address, \
+            project_install_identifier, device_serial, multicast_address, mac_address, \
+            friendly_name = _DIB_DEV_INFO.unpack_from(message, offset)
+        dib_dev_info = KnxDibDevInfo(
+            structure_length=structure_length,
+            description_type=description_type,
+            knx_medium=knx_medium,
+            device_status=self.unpack_cemi_runstate(device_status),
+            knx_address=self.parse_knx_address(knx_address),
+            project_install_identifier=project_install_identifier,
+            knx_device_serial=self.parse_knx_device_serial(device_serial),
+            knx_dev_multicast_address=socket.inet_ntoa(multicast_address),
+            knx_mac_address=self.parse_mac_address(mac_address),
+            device_friendly_name=friendly_name)
+        return dib_dev_info, offset + _DIB_DEV_INFO.size
 
-    def _unpack_dib_dev_info(self, message):
-        dib_dev_info = dict()
-        dib_dev_info['structure_length'] = self._unpack_stream('!B', message)
-        dib_dev_info['description_type'] = self._unpack_stream('!B', message)
-        dib_dev_info['knx_medium'] = self._unpack_stream('!B', message)
-        dib_dev_info['device_status'] = self.unpack_cemi_runstate(self._unpack_stream('!B', message))
-        dib_dev_info['knx_address'] = self.parse_knx_address(self._unpack_stream('!H', message))
-        dib_dev_info['project_install_identifier'] = self._unpack_stream('!H', message)
-        dib_dev_info['knx_device_serial'] = self.parse_knx_device_serial(
-            self._unpack_stream('!6s', message))
-        dib_dev_info['knx_dev_multicast_address'] = socket.inet_ntoa(message.read(4))
-        dib_dev_info['knx_mac_address'] = self.parse_mac_address(self._unpack_stream('!6s', message))
-        dib_dev_info['device_friendly_name'] = self._unpack_stream('!30s', message)
-        return dib_dev_info
-
-    def _unpack_dib_supp_sv_families(self, message):
-        dib_supp_sv_families = collections.OrderedDict()
-        dib_supp_sv_families['structure_length'] = self._unpack_stream('!B', message)
-        dib_supp_sv_families['description_type'] = self._unpack_stream('!B', message)
-        dib_supp_sv_families['families'] = {}
-        for i in range(int((dib_supp_sv_families['structure_length'] - 2) / 2)):
-            service_id = self._unpack_stream('!B', message)
-            version = self._unpack_stream('!B', message)
-            dib_supp_sv_families['families'][service_id] = dict()
-            dib_supp_sv_families['families'][service_id]['version'] = version
-        return dib_supp_sv_families
+    @staticmethod
+    def _unpack_dib_supp_sv_families(message, offset=0):
+        structure_length, description_type = _DIB_HEADER.unpack_from(message, offset)
+        offset += _DIB_HEADER.size
+        families_end = offset + int((structure_length - 2) / 2) * _SERVICE_FAMILY.size
+        families = collections.OrderedDict(_SERVICE_FAMILY.iter_unpack(message[offset:families_end]))
+        return KnxDibSuppSvFamilies(structure_length, description_type, families), families_end
+
+    @staticmethod
+    def _dib_supp_sv_families_dict(dib_supp_sv_families):
+        families = collections.OrderedDict()
+        families['structure_length'] = dib_supp_sv_families.structure_length
+        families['description_type'] = dib_supp_sv_families.description_type
+        families['families'] = {}
+        for service_id, version in dib_supp_sv_families.families.items():
+            families['families'][service_id] = dict()
+            families['families'][service_id]['version'] = version
+        return families
 
     @staticmethod
     def pack_cemi_cf1(confirm=False, acknowledge_req=False, priority=0x00,
@@ -479,88 +613,32 @@ class KnxMessage(object):
         cemi += struct.pack('!H', self.knx_destination)  # KNX destination address (either group or physical)
         return cemi
 
-    def _unpack_cemi(self, message):
-        cemi = dict()
-        cemi['message_code'] = self._unpack_stream('!B', message)
-        cemi['information_length'] = self._unpack_stream('!B', message)
-
-        if cemi['information_length'] is not 0:
-            cemi['additional_information'] = {}
-            cemi['additional_information']['busmonitor_info'] = self._unpack_stream('!B', message)
-            cemi['additional_information']['busmonitor_info_length'] = self._unpack_stream('!B', message)
-            cemi['additional_information']['busmonitor_info_error_flags'] = self._unpack_stream('!B', message)
-            cemi['additional_information']['extended_relative_timestamp'] = self._unpack_stream('!B', message)
-            cemi['additional_information']['extended_relative_timestamp'] = self._unpack_stream('!B', message)
-            cemi['additional_information']['extended_relative_timestamp'] = self._unpack_stream('!I', message)
-            cemi['raw_frame'] = message.read()
+    @staticmethod
+    def _unpack_cemi(message, offset=0):
+        cemi = KnxCemiFrame()
+        cemi.message_code, cemi.information_length = _CEMI_HEADER.unpack_from(message, offset)
+        offset += _CEMI_HEADER.size
+
+        if cemi.information_length is not 0:
+            cemi.busmonitor_info, cemi.busmonitor_info_length, cemi.busmonitor_info_error_flags, \
+                _, _, cemi.extended_relative_timestamp = _CEMI_BUSMONITOR_INFO.unpack_from(message, offset)
+            cemi.raw_frame = bytes(message[offset + _CEMI_BUSMONITOR_INFO.size:])
             return cemi
 
-        cemi['controlfield_1'] = self.unpack_cemi_cf1(self._unpack_stream('!B', message))
-        cemi['controlfield_2'] = self.unpack_cemi_cf2(self._unpack_stream('!B', message))
-        cemi['knx_source'] = self._unpack_stream('!H', message)
-        cemi['knx_destination'] = self._unpack_stream('!H', message)
-        cemi['npdu_len'] = self._unpack_stream('!B', message)
-
-        tpci_unpacked = dict()
-        tpci = self._unpack_stream('!{}s'.format(cemi['npdu_len'] + 1), message)
+        cemi.controlfield_1, cemi.controlfield_2, cemi.knx_source, cemi.knx_destination, \
+            cemi.npdu_len = _CEMI_L_DATA.unpack_from(message, offset)
+        offset += _CEMI_L_DATA.size
 
-        tpci_unpacked['tpci_type'] = 0
-        tpci_unpacked['tpci_type'] |= ((tpci[0] >> 6) & 1) << 0
-        tpci_unpacked['tpci_type'] |= ((tpci[0] >> 7) & 1) << 1
-        tpci_unpacked['sequence'] = 0
-        tpci_unpacked['sequence'] |= ((tpci[0] >> 2) & 1) << 0
-        tpci_unpacked['sequence'] |= ((tpci[0] >> 3) & 1) << 1
-        tpci_unpacked['sequence'] |= ((tpci[0] >> 4) & 1) << 2
-        tpci_unpacked['sequence'] |= ((tpci[0] >> 5) & 1) << 3
+        # A view on the TPDU, the TPCI/APCI octets are followed by the data
+        tpci = message[offset:offset + cemi.npdu_len + 1]
+        if len(tpci) != cemi.npdu_len + 1:
+            raise struct.error('cEMI frame is shorter than its NPDU length')
 
-        cemi['tpci'] = dict()
-        cemi['tpci']['type'] = tpci_unpacked['tpci_type']
-        cemi['tpci']['sequence'] = tpci_unpacked['sequence']
-
-        if tpci_unpacked['tpci_type'] is [2, 3]:
-            # Control data includes a status field
-            tpci_unpacked['status'] = 0
-            tpci_unpacked['status'] |= ((tpci[0] >> 0) & 1) << 0
-            tpci_unpacked['status'] |= ((tpci[0] >> 1) & 1) << 1
-            cemi['tpci']['status'] = tpci_unpacked['status']
-
-        if cemi['npdu_len'] > 0:
-            tpci_unpacked['apci'] = 0
-            tpci_unpacked['apci'] |= ((tpci[1] >> 6) & 1) << 0
-            tpci_unpacked['apci'] |= ((tpci[1] >> 7) & 1) << 1
-            tpci_unpacked['apci'] |= ((tpci[0] >> 0) & 1) << 2
-            tpci_unpacked['apci'] |= ((tpci[0] >> 1) & 1) << 3
-
-            if tpci_unpacked['apci'] in CEMI_APCI_TYPES.values():
-                tpci_unpacked['apci_data'] = 0
-                tpci_unpacked['apci_data'] |= ((tpci[1] >> 0) & 1) << 0
-                tpci_unpacked['apci_data'] |= ((tpci[1] >> 1) & 1) << 1
-                tpci_unpacked['apci_data'] |= ((tpci[1] >> 2) & 1) << 2
-                tpci_unpacked['apci_data'] |= ((tpci[1] >> 3) & 1) << 3
-                tpci_unpacked['apci_data'] |= ((tpci[1] >> 4) & 1) << 4
-                tpci_unpacked['apci_data'] |= ((tpci[1] >> 5) & 1) << 5
-            else:
-                tpci_unpacked['apci'] <<= 2
-                tpci_unpacked['apci'] |= ((tpci[1] >> 4) & 1) << 0
-                tpci_unpacked['apci'] |= ((tpci[1] >> 5) & 1) << 1
-
-                if tpci_unpacked['apci'] in CEMI_APCI_TYPES.values():
-                    tpci_unpacked['apci_data'] = 0
-                    tpci_unpacked['apci_data'] |= ((tpci[1] >> 0) & 1) << 0
-                    tpci_unpacked['apci_data'] |= ((tpci[1] >> 1) & 1) << 1
-                    tpci_unpacked['apci_data'] |= ((tpci[1] >> 2) & 1) << 2
-                    tpci_unpacked['apci_data'] |= ((tpci[1] >> 3) & 1) << 3
-                else:
-                    tpci_unpacked['apci'] <<= 4
-                    tpci_unpacked['apci'] |= ((tpci[1] >> 0) & 1) << 0
-                    tpci_unpacked['apci'] |= ((tpci[1] >> 1) & 1) << 1
-                    tpci_unpacked['apci'] |= ((tpci[1] >> 2) & 1) << 2
-                    tpci_unpacked['apci'] |= ((tpci[1] >> 3) & 1) << 3
+        cemi.tpci_type, cemi.tpci_sequence = _CEMI_TPCI_TABLE[tpci[0]]
 
-            cemi['apci'] = dict()
-            cemi['apci']['type'] = tpci_unpacked['apci']
-            cemi['apci']['data'] = tpci_unpacked.get('apci_data')
-            cemi['data'] = tpci[2:]
+        if cemi.npdu_len > 0:
+            cemi.apci_type, cemi.apci_data = _CEMI_APCI_TABLE[((tpci[0] & 0x03) << 8) | tpci[1]]
+            cemi.data = bytes(tpci[2:])
 
         # TODO: if there is more data, read it now
         # TODO: read cemi['npdu_len']-1 bytes
@@ -573,8 +651,7 @@ class KnxMessage(object):
         npdu = CEMI_TPCI_TYPES.get('UCD') << 14
         npdu |= TPCI_UNNUMBERED_CONTROL_DATA_TYPES.get(ucd_type) << 8
         cemi += struct.pack('!H', npdu)
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def tpci_numbered_control_data(self, ncd_type, sequence=0):
         assert ncd_type in TPCI_NUMBERED_CONTROL_DATA_TYPES.keys(), 'Invalid NCD type: {}'.format(ncd_type)
@@ -584,8 +661,7 @@ class KnxMessage(object):
         npdu |= sequence << 10
         npdu |= TPCI_NUMBERED_CONTROL_DATA_TYPES.get(ncd_type) << 8
         cemi += struct.pack('!H', npdu)
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def apci_device_descriptor_read(self, sequence=0):
         cemi = self._pack_cemi(message_code=CEMI_MSG_CODES.get('L_Data.req'))
@@ -594,8 +670,7 @@ class KnxMessage(object):
         npdu |= sequence << 10
         npdu |= CEMI_APCI_TYPES['A_DeviceDescriptor_Read'] << 0
         cemi += struct.pack('!H', npdu)
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def apci_individual_address_read(self, sequence=0):
         cemi = self._pack_cemi(message_code=CEMI_MSG_CODES.get('L_Data.req'))
@@ -604,8 +679,7 @@ class KnxMessage(object):
         npdu |= sequence << 10
         npdu |= CEMI_APCI_TYPES['A_IndividualAddress_Read'] << 0
         cemi += struct.pack('!H', npdu)
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def apci_authorize_request(self, sequence=0, key=0xffffffff):
         cemi = self._pack_cemi(message_code=CEMI_MSG_CODES.get('L_Data.req'))
@@ -616,8 +690,7 @@ class KnxMessage(object):
         cemi += struct.pack('!H', npdu)
         cemi += struct.pack('!B', 0)  # reserved
         cemi += struct.pack('!I', key)  # key
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def apci_property_value_read(self, sequence=0, object_index=0, property_id=0x0f,
                                  num_elements=1, start_index=1):
@@ -633,25 +706,23 @@ class KnxMessage(object):
         count_index = num_elements << 12
         count_index |= start_index << 0
         cemi += struct.pack('!H', count_index)  # number of elements + start index
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
+
+    def apci_property_description_read(self, sequence=0, object_index=0, property_id=0,
+                                       property_index=0):
+        """A_PropertyDescription_Read
 
-    def apci_property_description_read(self, sequence=0, object_index=0, property_id=0x0f,
-                                       num_elements=1, start_index=1):
-        """A_PropertyDescription_Read"""
+        If property_id is 0, the property is selected by property_index."""
         cemi = self._pack_cemi(message_code=CEMI_MSG_CODES.get('L_Data.req'))
-        cemi += struct.pack('!B', 5)  # Data length
+        cemi += struct.pack('!B', 4)  # Data length
         npdu = CEMI_TPCI_TYPES.get('NDP') << 14
         npdu |= sequence << 10
         npdu |= CEMI_APCI_TYPES['A_PropertyDescription_Read'] << 0
         cemi += struct.pack('!H', npdu)
         cemi += struct.pack('!B', object_index)  # object index
         cemi += struct.pack('!B', property_id)  # property id
-        count_index = num_elements << 12
-        count_index |= start_index << 0
-        cemi += struct.pack('!H', count_index)  # number of elements + start index
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        cemi += struct.pack('!B', property_index)  # property index
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def apci_adc_read(self, sequence=0):
         """A_ADC_Read"""
@@ -663,8 +734,7 @@ class KnxMessage(object):
         npdu |= 1 << 0  # channel nr
         cemi += struct.pack('!H', npdu)
         cemi += struct.pack('!B', 0x08)  # data
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def apci_memory_read(self, sequence=0, memory_address=0x0060, read_count=1):
         """A_Memory_Read
@@ -739,8 +809,7 @@ class KnxMessage(object):
         npdu |= read_count << 0  # number of octets to read/write
         cemi += struct.pack('!H', npdu)
         cemi += struct.pack('!H', memory_address)  # memory address
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
 
     def apci_group_value_write(self, value=0):
         cemi = self._pack_cemi(message_code=CEMI_MSG_CODES.get('L_Data.req'), address_type=True)
@@ -749,17 +818,46 @@ class KnxMessage(object):
         npdu |= CEMI_APCI_TYPES['A_GroupValue_Write'] << 6
         npdu |= value << 0
         cemi += struct.pack('!H', npdu)
-        self._pack_knx_body(cemi=cemi)
-        self.pack_knx_message()
+        self.pack_knx_message(self._pack_knx_body(cemi=cemi))
+
+
+class _KnxCemiMessage(KnxMessage):
+    """Base class of messages that carry a cEMI frame. Only the message code is
+    decoded right away, the frame itself is decoded on first access of cemi."""
+    __slots__ = ('_cemi', '_cemi_frame')
+
+    def __init__(self):
+        super(_KnxCemiMessage, self).__init__()
+        self._cemi = None
+        self._cemi_frame = None
+
+    @property
+    def cemi(self):
+        """The KnxCemiFrame of the message, None if it could not be decoded."""
+        if self._cemi_frame is not None:
+            frame, self._cemi_frame = self._cemi_frame, None
+            try:
+                self._cemi = self._unpack_cemi(frame)
+            except Exception as e:
+                LOGGER.exception(e)
+        return self._cemi
+
+    def _defer_cemi(self, message):
+        self.cemi_message_code = message[0]
+        # Keep a copy of the frame only, not a view on the whole datagram
+        self._cemi_frame = message.tobytes()
 
 
 class KnxSearchRequest(KnxMessage):
+    __slots__ = ('hpai',)
+
     def __init__(self, message=None, sockname=None):
         super(KnxSearchRequest, self).__init__()
+        self.hpai = None
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('SEARCH_REQUEST')
+            self.service_type = KNX_MESSAGE_TYPES.get('SEARCH_REQUEST')
             try:
                 self.source, self.port = sockname
                 self.pack_knx_message()
@@ -768,24 +866,30 @@ class KnxSearchRequest(KnxMessage):
                 self.port = None
 
     def _pack_knx_body(self):
-        self.body = self._pack_hpai()
-        return self.body
+        return self._pack_hpai()
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body = self._unpack_hpai(message)
+            self.hpai, _ = self._unpack_hpai(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        return self.hpai._asdict() if self.hpai else collections.OrderedDict()
+
 
 class KnxSearchResponse(KnxMessage):
+    __slots__ = ('hpai', 'dib_dev_info', 'dib_supp_sv_families')
+
     def __init__(self, message=None):
         super(KnxSearchResponse, self).__init__()
+        self.hpai = None
+        self.dib_dev_info = None
+        self.dib_supp_sv_families = None
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('SEARCH_RESPONSE')
+            self.service_type = KNX_MESSAGE_TYPES.get('SEARCH_RESPONSE')
             self.pack_knx_message()
 
     def _pack_knx_body(self):
@@ -793,21 +897,31 @@ class KnxSearchResponse(KnxMessage):
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body = self._unpack_hpai(message)
-            self.body['dib_dev_info'] = self._unpack_dib_dev_info(message)
-            self.body['dib_supp_sv_families'] = self._unpack_dib_supp_sv_families(message)
+            self.hpai, offset = self._unpack_hpai(message)
+            self.dib_dev_info, offset = self._unpack_dib_dev_info(message, offset)
+            self.dib_supp_sv_families, _ = self._unpack_dib_supp_sv_families(message, offset)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = self.hpai._asdict() if self.hpai else collections.OrderedDict()
+        if self.dib_dev_info:
+            body['dib_dev_info'] = self.dib_dev_info._asdict()
+        if self.dib_supp_sv_families:
+            body['dib_supp_sv_families'] = self._dib_supp_sv_families_dict(self.dib_supp_sv_families)
+        return body
+
 
 class KnxDescriptionRequest(KnxMessage):
+    __slots__ = ('hpai',)
+
     def __init__(self, message=None, sockname=None):
         super(KnxDescriptionRequest, self).__init__()
+        self.hpai = None
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('DESCRIPTION_REQUEST')
+            self.service_type = KNX_MESSAGE_TYPES.get('DESCRIPTION_REQUEST')
             try:
                 self.source, self.port = sockname
                 self.pack_knx_message()
@@ -816,24 +930,29 @@ class KnxDescriptionRequest(KnxMessage):
                 self.port = None
 
     def _pack_knx_body(self):
-        self.body = self._pack_hpai()
-        return self.body
+        return self._pack_hpai()
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body = self._unpack_hpai(message)
+            self.hpai, _ = self._unpack_hpai(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        return self.hpai._asdict() if self.hpai else collections.OrderedDict()
+
 
 class KnxDescriptionResponse(KnxMessage):
+    __slots__ = ('dib_dev_info', 'dib_supp_sv_families')
+
     def __init__(self, message=None):
         super(KnxDescriptionResponse, self).__init__()
+        self.dib_dev_info = None
+        self.dib_supp_sv_families = None
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('DESCRIPTION_RESPONSE')
+            self.service_type = KNX_MESSAGE_TYPES.get('DESCRIPTION_RESPONSE')
             self.pack_knx_message()
 
     def _pack_knx_body(self):
@@ -841,21 +960,36 @@ class KnxDescriptionResponse(KnxMessage):
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['dib_dev_info'] = self._unpack_dib_dev_info(message)
-            self.body['dib_supp_sv_families'] = self._unpack_dib_supp_sv_families(message)
+            self.dib_dev_info, offset = self._unpack_dib_dev_info(message)
+            self.dib_supp_sv_families, _ = self._unpack_dib_supp_sv_families(message, offset)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        if self.dib_dev_info:
+            body['dib_dev_info'] = self.dib_dev_info._asdict()
+        if self.dib_supp_sv_families:
+            body['dib_supp_sv_families'] = self._dib_supp_sv_families_dict(self.dib_supp_sv_families)
+        return body
+
 
 class KnxConnectRequest(KnxMessage):
+    __slots__ = ('connection_type', 'layer_type', 'hpai', 'data_endpoint',
+                 'connection_request_information')
+
     def __init__(self, message=None, sockname=None, layer_type='TUNNEL_LINKLAYER',
                  connection_type=0x04):
         super(KnxConnectRequest, self).__init__()
+        self.hpai = None
+        self.data_endpoint = None
+        self.connection_request_information = None
         if message:
+            self.connection_type = None
+            self.layer_type = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('CONNECT_REQUEST')
+            self.service_type = KNX_MESSAGE_TYPES.get('CONNECT_REQUEST')
             self.connection_type = connection_type
             self.layer_type = _LAYER_TYPES.get(layer_type)
             try:
@@ -867,47 +1001,59 @@ class KnxConnectRequest(KnxMessage):
 
     def _pack_knx_body(self):
         # Discovery endpoint
-        self.body = self._pack_hpai()
+        body = self._pack_hpai()
         # Data endpoint
-        self.body += self._pack_hpai()
+        body += self._pack_hpai()
         # Connection request information
         if self.connection_type == 0x04:
-            self.body += struct.pack('!B', 4)  # structure_length
+            body += struct.pack('!B', 4)  # structure_length
         else:
-            self.body += struct.pack('!B', 2)  # structure_length
+            body += struct.pack('!B', 2)  # structure_length
         # TODO: implement other connections (routing, object server)
-        self.body += struct.pack('!B', self.connection_type)  # connection type
+        body += struct.pack('!B', self.connection_type)  # connection type
         if self.connection_type == 0x04:
-            self.body += struct.pack('!B', self.layer_type)  # knx layer type
-            self.body += struct.pack('!B', 0x00)  # reserved
-        return self.body
+            body += struct.pack('!B', self.layer_type)  # knx layer type
+            body += struct.pack('!B', 0x00)  # reserved
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
             # Discovery endpoint
-            self.body = self._unpack_hpai(message)
+            self.hpai, offset = self._unpack_hpai(message)
             # Data endpoint
-            self.body['data_endpoint'] = self._unpack_hpai(message)
+            self.data_endpoint, offset = self._unpack_hpai(message, offset)
             # Connection request information
-            self.body['connection_request_information'] = dict()
-            self.body['connection_request_information']['structure_length'] = self._unpack_stream('!B', message)
-            self.body['connection_request_information']['connection_type'] = self._unpack_stream('!B', message)
-            self.body['connection_request_information']['knx_layer'] = self._unpack_stream('!B', message)
-            self.body['connection_request_information']['reserved'] = self._unpack_stream('!B', message)
+            self.connection_request_information = KnxConnectionRequestInformation(
+                *_CRI.unpack_from(message, offset))
+            self.connection_type = self.connection_request_information.connection_type
+            self.layer_type = self.connection_request_information.knx_layer
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = self.hpai._asdict() if self.hpai else collections.OrderedDict()
+        if self.data_endpoint:
+            body['data_endpoint'] = self.data_endpoint._asdict()
+        if self.connection_request_information:
+            body['connection_request_information'] = dict(self.connection_request_information._asdict())
+        return body
+
 
 class KnxConnectResponse(KnxMessage):
+    __slots__ = ('ERROR', 'ERROR_CODE', 'communication_channel', 'status', 'hpai', 'data_block')
+
     def __init__(self, message=None):
         super(KnxConnectResponse, self).__init__()
         self.ERROR = None
         self.ERROR_CODE = None
+        self.communication_channel = None
+        self.status = None
+        self.hpai = None
+        self.data_block = None
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('CONNECT_RESPONSE')
+            self.service_type = KNX_MESSAGE_TYPES.get('CONNECT_RESPONSE')
             self.pack_knx_message()
 
     def _pack_knx_body(self):
@@ -915,36 +1061,55 @@ class KnxConnectResponse(KnxMessage):
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['status'] = self._unpack_stream('!B', message)
+            self.communication_channel, self.status = _CHANNEL_STATUS.unpack_from(message)
 
-            if self.body['status'] != 0x00:
+            if self.status != 0x00:
                 # TODO: implement some kind of retries and waiting periods
-                self.ERROR = KNX_STATUS_CODES[self.body['status']]
-                self.ERROR_CODE = self.body['status']
+                self.ERROR = KNX_STATUS_CODES[self.status]
+                self.ERROR_CODE = self.status
                 return
 
-            self.body['hpai'] = self._unpack_hpai(message)
+            self.hpai, offset = self._unpack_hpai(message, _CHANNEL_STATUS.size)
             # Connection response data block
-            self.body['data_block'] = dict()
-            self.body['data_block']['structure_length'] = self._unpack_stream('!B', message)
-            self.body['data_block']['connection_type'] = self._unpack_stream('!B', message)
-            if self.body['data_block']['connection_type'] == 0x04:
-                self.body['data_block']['knx_address'] = super().parse_knx_address(self._unpack_stream('!H', message))
+            structure_length, connection_type = _CRD.unpack_from(message, offset)
+            knx_address = None
+            if connection_type == 0x04:
+                knx_address = self.parse_knx_address(
+                    _KNX_ADDRESS.unpack_from(message, offset + _CRD.size)[0])
+            self.data_block = KnxConnectionResponseDataBlock(structure_length, connection_type, knx_address)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['communication_channel_id'] = self.communication_channel
+        body['status'] = self.status
+        if self.hpai:
+            body['hpai'] = self.hpai._asdict()
+        if self.data_block:
+            body['data_block'] = dict(self.data_block._asdict())
+            if self.data_block.connection_type != 0x04:
+                del body['data_block']['knx_address']
+        return body
+
+
+class KnxTunnellingRequest(_KnxCemiMessage):
+    __slots__ = ('structure_length', 'communication_channel', 'sequence_count', 'reserved',
+                 'cemi_npdu_len')
 
-class KnxTunnellingRequest(KnxMessage):
     def __init__(self, message=None, sockname=None, communication_channel=None,
                  knx_source=None, knx_destination=None, sequence_count=0, message_code=0x11,
                  cemi_ndpu_len=0):
         super(KnxTunnellingRequest, self).__init__()
+        self.structure_length = None
+        self.reserved = None
         if message:
+            self.communication_channel = None
+            self.sequence_count = None
+            self.cemi_npdu_len = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('TUNNELLING_REQUEST')
+            self.service_type = KNX_MESSAGE_TYPES.get('TUNNELLING_REQUEST')
             self.communication_channel = communication_channel
             self.sequence_count = sequence_count
             self.cemi_message_code = message_code
@@ -962,66 +1127,187 @@ class KnxTunnellingRequest(KnxMessage):
                 self.port = None
 
     def _pack_knx_body(self, cemi=None):
-        self.body = struct.pack('!B', 4)  # structure_length
-        self.body += struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', self.sequence_count)  # sequence counter
-        self.body += struct.pack('!B', 0)  # reserved
+        body = struct.pack('!B', 4)  # structure_length
+        body += struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', self.sequence_count)  # sequence counter
+        body += struct.pack('!B', 0)  # reserved
         # cEMI
         if cemi:
-            self.body += cemi
+            body += cemi
         else:
-            self.body += self._pack_cemi()
-        return self.body
+            body += self._pack_cemi()
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['structure_length'] = self._unpack_stream('!B', message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['sequence_counter'] = self._unpack_stream('!B', message)
-            self.body['reserved'] = self._unpack_stream('!B', message)
-            # cEMI
-            self.body['cemi'] = self._unpack_cemi(message)
+            self.structure_length, \
+            self.communication_channel, \
+            self.sequence_count, \
+            self.reserved = _CONNECTION_HEADER.unpack_from(message)
+            # cEMI, only the message code is decoded right away
+            self._defer_cemi(message[_CONNECTION_HEADER.size:])
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['structure_length'] = self.structure_length
+        body['communication_channel_id'] = self.communication_channel
+        body['sequence_counter'] = self.sequence_count
+        body['reserved'] = self.reserved
+        if self.cemi:
+            body['cemi'] = self.cemi.as_dict()
+        return body
+
 
 class KnxTunnellingAck(KnxMessage):
+    __slots__ = ('structure_length', 'communication_channel', 'sequence_count', 'status')
+
     def __init__(self, message=None, communication_channel=None, sequence_count=0):
         super(KnxTunnellingAck, self).__init__()
+        self.structure_length = None
+        self.status = None
         if message:
+            self.communication_channel = None
+            self.sequence_count = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('TUNNELLING_ACK')
+            self.service_type = KNX_MESSAGE_TYPES.get('TUNNELLING_ACK')
             self.communication_channel = communication_channel
             self.sequence_count = sequence_count
             self.pack_knx_message()
 
     def _pack_knx_body(self):
-        self.body = struct.pack('!B', 4)  # structure_length
-        self.body += struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', self.sequence_count)  # sequence counter
-        self.body += struct.pack('!B', 0)  # status
-        return self.body
+        body = struct.pack('!B', 4)  # structure_length
+        body += struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', self.sequence_count)  # sequence counter
+        body += struct.pack('!B', 0)  # status
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['structure_length'] = self._unpack_stream('!B', message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['sequence_counter'] = self._unpack_stream('!B', message)
-            self.body['status'] = self._unpack_stream('!B', message)
+            self.structure_length, \
+            self.communication_channel, \
+            self.sequence_count, \
+            self.status = _CONNECTION_HEADER.unpack_from(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['structure_length'] = self.structure_length
+        body['communication_channel_id'] = self.communication_channel
+        body['sequence_counter'] = self.sequence_count
+        body['status'] = self.status
+        return body
+
+
+class KnxTunnelEncoder(object):
+    """Encodes the frames of a single tunnel connection from prebuilt templates.
+
+    Each frame type is built once with the regular message classes. Encoding a
+    frame only fills the sequence counter, the KNX destination and the request
+    specific fields into the template. The returned bytearray is reused by the
+    next call for the same frame type, so it has to be sent right away."""
+
+    def __init__(self, communication_channel, knx_source, sockname=None):
+        self.communication_channel = communication_channel
+        self.knx_source = knx_source
+        self._tunnelling_ack = bytearray(KnxTunnellingAck(
+            communication_channel=communication_channel).get_message())
+        self._connection_state_request = None
+        if sockname:
+            self._connection_state_request = KnxConnectionStateRequest(
+                sockname=sockname,
+                communication_channel=communication_channel).get_message()
+        self._unnumbered_control_data = dict()
+        for ucd_type in TPCI_UNNUMBERED_CONTROL_DATA_TYPES.keys():
+            self._unnumbered_control_data[ucd_type] = self._make_template(
+                'tpci_unnumbered_control_data', ucd_type)
+        self._numbered_control_data = dict()
+        for ncd_type in TPCI_NUMBERED_CONTROL_DATA_TYPES.keys():
+            self._numbered_control_data[ncd_type] = self._make_template(
+                'tpci_numbered_control_data', ncd_type)
+        self._device_descriptor_read = self._make_template('apci_device_descriptor_read')
+        self._property_value_read = self._make_template('apci_property_value_read')
+        self._property_description_read = self._make_template('apci_property_description_read')
+        self._memory_read = self._make_template('apci_memory_read')
+        self._authorize_request = self._make_template('apci_authorize_request')
+
+    def _make_template(self, method, *args):
+        """Build a frame with a KnxTunnellingRequest method and
+        return it as a template for further requests."""
+        tunnel_request = KnxTunnellingRequest(
+            communication_channel=self.communication_channel,
+            knx_source=self.knx_source,
+            knx_destination='0.0.0')
+        getattr(tunnel_request, method)(*args)
+        return bytearray(tunnel_request.get_message())
+
+    @staticmethod
+    def _fill(frame, sequence_count, knx_destination, sequence=None):
+        frame[_TUNNEL_SEQUENCE_OFFSET] = sequence_count
+        _KNX_ADDRESS.pack_into(frame, _TUNNEL_DESTINATION_OFFSET, knx_destination)
+        if sequence is not None:
+            # The TPCI sequence number is stored in bits 2-5
+            frame[_TUNNEL_TPCI_OFFSET] = (frame[_TUNNEL_TPCI_OFFSET] & 0xc3) | (sequence << 2)
+        return frame
+
+    def tunnelling_ack(self, sequence_count):
+        self._tunnelling_ack[_TUNNEL_SEQUENCE_OFFSET] = sequence_count
+        return self._tunnelling_ack
+
+    def connection_state_request(self):
+        return self._connection_state_request
+
+    def tpci_unnumbered_control_data(self, sequence_count, knx_destination, ucd_type):
+        return self._fill(self._unnumbered_control_data[ucd_type], sequence_count, knx_destination)
+
+    def tpci_numbered_control_data(self, sequence_count, knx_destination, ncd_type, sequence=0):
+        return self._fill(self._numbered_control_data[ncd_type], sequence_count, knx_destination, sequence)
+
+    def apci_device_descriptor_read(self, sequence_count, knx_destination, sequence=0):
+        return self._fill(self._device_descriptor_read, sequence_count, knx_destination, sequence)
+
+    def apci_property_value_read(self, sequence_count, knx_destination, sequence=0, object_index=0,
+                                 property_id=0x0f, num_elements=1, start_index=1):
+        frame = self._fill(self._property_value_read, sequence_count, knx_destination, sequence)
+        _PROPERTY_READ.pack_into(frame, _TUNNEL_APDU_DATA_OFFSET, object_index, property_id,
+                                 num_elements << 12 | start_index)
+        return frame
+
+    def apci_property_description_read(self, sequence_count, knx_destination, sequence=0, object_index=0,
+                                       property_id=0, property_index=0):
+        frame = self._fill(self._property_description_read, sequence_count, knx_destination, sequence)
+        _PROPERTY_DESCRIPTION_READ.pack_into(frame, _TUNNEL_APDU_DATA_OFFSET, object_index, property_id,
+                                             property_index)
+        return frame
+
+    def apci_memory_read(self, sequence_count, knx_destination, sequence=0, memory_address=0x0060,
+                         read_count=1):
+        frame = self._fill(self._memory_read, sequence_count, knx_destination, sequence)
+        _MEMORY_READ.pack_into(frame, _TUNNEL_APCI_OFFSET, read_count, memory_address)
+        return frame
+
+    def apci_authorize_request(self, sequence_count, knx_destination, sequence=0, key=0xffffffff):
+        frame = self._fill(self._authorize_request, sequence_count, knx_destination, sequence)
+        # The key follows a reserved octet
+        _AUTHORIZE_KEY.pack_into(frame, _TUNNEL_APDU_DATA_OFFSET + 1, key)
+        return frame
+
 
 class KnxConnectionStateRequest(KnxMessage):
+    __slots__ = ('communication_channel', 'reserved', 'hpai')
+
     def __init__(self, message=None, sockname=None, communication_channel=None):
         super(KnxConnectionStateRequest, self).__init__()
+        self.reserved = None
+        self.hpai = None
         if message:
+            self.communication_channel = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_REQUEST')
+            self.service_type = KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_REQUEST')
             self.communication_channel = communication_channel
             try:
                 self.source, self.port = sockname
@@ -1031,55 +1317,76 @@ class KnxConnectionStateRequest(KnxMessage):
                 self.port = None
 
     def _pack_knx_body(self):
-        self.body = struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', 0)  # reserved
+        body = struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', 0)  # reserved
         # HPAI
-        self.body += self._pack_hpai()
-        return self.body
+        body += self._pack_hpai()
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['reserved'] = self._unpack_stream('!B', message)
+            self.communication_channel, \
+            self.reserved = _CHANNEL_STATUS.unpack_from(message)
             # HPAI
-            self.body['hpai'] = self._unpack_hpai(message)
+            self.hpai, _ = self._unpack_hpai(message, _CHANNEL_STATUS.size)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['communication_channel_id'] = self.communication_channel
+        body['reserved'] = self.reserved
+        if self.hpai:
+            body['hpai'] = self.hpai._asdict()
+        return body
+
 
 class KnxConnectionStateResponse(KnxMessage):
+    __slots__ = ('communication_channel', 'status')
+
     def __init__(self, message=None, communication_channel=None):
         super(KnxConnectionStateResponse, self).__init__()
+        self.status = None
         if message:
+            self.communication_channel = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_RESPONSE')
+            self.service_type = KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_RESPONSE')
             self.communication_channel = communication_channel
             self.pack_knx_message()
 
     def _pack_knx_body(self):
         # discovery endpoint
-        self.body = struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', 0)  # status
-        return self.body
+        body = struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', 0)  # status
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['status'] = self._unpack_stream('!B', message)
+            self.communication_channel, \
+            self.status = _CHANNEL_STATUS.unpack_from(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['communication_channel_id'] = self.communication_channel
+        body['status'] = self.status
+        return body
+
 
 class KnxDisconnectRequest(KnxMessage):
+    __slots__ = ('communication_channel', 'reserved', 'hpai')
+
     def __init__(self, message=None, sockname=None, communication_channel=None):
         super(KnxDisconnectRequest, self).__init__()
+        self.reserved = None
+        self.hpai = None
         if message:
+            self.communication_channel = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('DISCONNECT_REQUEST')
+            self.service_type = KNX_MESSAGE_TYPES.get('DISCONNECT_REQUEST')
             self.communication_channel = communication_channel or 0
             try:
                 self.source, self.port = sockname
@@ -1089,62 +1396,99 @@ class KnxDisconnectRequest(KnxMessage):
                 self.port = None
 
     def _pack_knx_body(self):
-        self.body = struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', 0)  # reserved
+        body = struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', 0)  # reserved
         # HPAI
-        self.body += self._pack_hpai()
-        return self.body
+        body += self._pack_hpai()
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['reserved'] = self._unpack_stream('!B', message)
+            self.communication_channel, \
+            self.reserved = _CHANNEL_STATUS.unpack_from(message)
             # HPAI
-            self.body['hpai'] = self._unpack_hpai(message)
+            self.hpai, _ = self._unpack_hpai(message, _CHANNEL_STATUS.size)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['communication_channel_id'] = self.communication_channel
+        body['reserved'] = self.reserved
+        if self.hpai:
+            body['hpai'] = self.hpai._asdict()
+        return body
+
 
 class KnxDisconnectResponse(KnxMessage):
+    __slots__ = ('communication_channel', 'status')
+
     def __init__(self, message=None, communication_channel=None):
         super(KnxDisconnectResponse, self).__init__()
+        self.status = None
         if message:
+            self.communication_channel = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('DISCONNECT_RESPONSE')
+            self.service_type = KNX_MESSAGE_TYPES.get('DISCONNECT_RESPONSE')
             self.communication_channel = communication_channel
             self.pack_knx_message()
 
     def _pack_knx_body(self):
         # discovery endpoint
-        self.body = struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', 0)  # status
-        return self.body
+        body = struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', 0)  # status
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['status'] = self._unpack_stream('!B', message)
+            self.communication_channel, \
+            self.status = _CHANNEL_STATUS.unpack_from(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['communication_channel_id'] = self.communication_channel
+        body['status'] = self.status
+        return body
+
 
 class KnxDeviceConfigurationRequest(KnxMessage):
-    # TODO: properly implement configuration requests
+    """A cEMI property service of a device management connection. M_PropRead.req
+    reads count elements from start_index on of a property of an interface
+    object of the gateway itself, the M_PropRead.con carries the value in data.
+    Reading element 0 returns the current number of elements of an array."""
+    __slots__ = ('structure_length', 'communication_channel', 'sequence_count', 'reserved',
+                 'object_type', 'object_instance', 'property_id', 'count', 'start_index', 'data')
 
     def __init__(self, message=None, sockname=None, communication_channel=None,
-                 sequence_count=0, message_code=0xfc, cemi_ndpu_len=1):
+                 sequence_count=0, message_code=0xfc, object_type=11, object_instance=1,
+                 property_id=PARAMETER_OBJECTS.get('PID_ADDITIONAL_INDIVIDUAL_ADDRESSES'),
+                 count=1, start_index=0):
         super(KnxDeviceConfigurationRequest, self).__init__()
+        self.structure_length = None
+        self.reserved = None
+        self.data = b''
         if message:
+            self.communication_channel = None
+            self.sequence_count = None
+            self.object_type = None
+            self.object_instance = None
+            self.property_id = None
+            self.count = None
+            self.start_index = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_REQUEST')
+            self.service_type = KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_REQUEST')
             self.communication_channel = communication_channel
             self.sequence_count = sequence_count
             self.cemi_message_code = message_code
-            self.cemi_npdu_len = cemi_ndpu_len
+            self.object_type = object_type
+            self.object_instance = object_instance
+            self.property_id = property_id
+            self.count = count
+            self.start_index = start_index
             try:
                 self.source, self.port = sockname
                 self.pack_knx_message()
@@ -1152,150 +1496,216 @@ class KnxDeviceConfigurationRequest(KnxMessage):
                 self.source = None
                 self.port = None
 
-    def _pack_knx_body(self, cemi=None):
-        self.body = struct.pack('!B', 4)  # structure_length
-        self.body += struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', self.sequence_count)  # sequence counter
-        self.body += struct.pack('!B', 0)  # reserved
-        # cEMI
-        # if cemi:
-        #    self.body += cemi
-        # else:
-        #    self.body += self._pack_cemi()
-
-        self.body += struct.pack('!B', self.cemi_message_code)  # M_PropRead.req
-        # self.body += struct.pack('!B', CEMI_MESSAGE_CODES.get('L_Data.req'))
-        self.body += struct.pack('!H', 11)
-        self.body += struct.pack('!B', 11)
-        self.body += struct.pack('!B', PARAMETER_OBJECTS.get('PID_ADDITIONAL_INDIVIDUAL_ADDRESSES'))
-        # self.body += struct.pack('!B', DEVICE_OBJECTS.get('PID_SERIAL_NUMBER'))
-        # self.body += struct.pack('!H', 0x1001)
-        self.body += struct.pack('!B', 0x10)
-        self.body += struct.pack('!B', 0x00)
-
-        print("body")
-        print(self.body)
-
-        return self.body
+    def _pack_knx_body(self):
+        body = struct.pack('!B', 4)  # structure_length
+        body += struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', self.sequence_count)  # sequence counter
+        body += struct.pack('!B', 0)  # reserved
+        body += _PROPERTY_SERVICE.pack(
+            self.cemi_message_code,
+            self.object_type,
+            self.object_instance,
+            self.property_id,
+            (self.count << 12) | self.start_index)
+        body += self.data
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['structure_length'] = self._unpack_stream('!B', message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['sequence_counter'] = self._unpack_stream('!B', message)
-            self.body['reserved'] = self._unpack_stream('!B', message)
-            # cEMI
-            # self.body['cemi'] = self._unpack_cemi(message)
-            self.body['the_end'] = message.read()
+            self.structure_length, \
+            self.communication_channel, \
+            self.sequence_count, \
+            self.reserved = _CONNECTION_HEADER.unpack_from(message)
+            offset = _CONNECTION_HEADER.size
+            self.cemi_message_code, \
+            self.object_type, \
+            self.object_instance, \
+            self.property_id, \
+            count_index = _PROPERTY_SERVICE.unpack_from(message, offset)
+            self.count = count_index >> 12
+            self.start_index = count_index & 0xfff
+            self.data = bytes(message[offset + _PROPERTY_SERVICE.size:])
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['structure_length'] = self.structure_length
+        body['communication_channel_id'] = self.communication_channel
+        body['sequence_counter'] = self.sequence_count
+        body['reserved'] = self.reserved
+        body['message_code'] = CEMI_MSG_CODES.get(self.cemi_message_code)
+        body['object_type'] = self.object_type
+        body['object_instance'] = self.object_instance
+        body['property_id'] = self.property_id
+        body['count'] = self.count
+        body['start_index'] = self.start_index
+        body['data'] = self.data
+        return body
+
 
 class KnxDeviceConfigurationAck(KnxMessage):
+    __slots__ = ('structure_length', 'communication_channel', 'sequence_count', 'status')
+
     def __init__(self, message=None, communication_channel=None, sequence_count=0):
         super(KnxDeviceConfigurationAck, self).__init__()
+        self.structure_length = None
+        self.status = None
         if message:
+            self.communication_channel = None
+            self.sequence_count = None
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_RESPONSE')
+            self.service_type = KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_RESPONSE')
             self.communication_channel = communication_channel
             self.sequence_count = sequence_count
             self.pack_knx_message()
 
     def _pack_knx_body(self):
-        self.body = struct.pack('!B', 4)  # structure_length
-        self.body += struct.pack('!B', self.communication_channel)  # channel id
-        self.body += struct.pack('!B', self.sequence_count)  # sequence counter
-        self.body += struct.pack('!B', 0)  # status
-        return self.body
+        body = struct.pack('!B', 4)  # structure_length
+        body += struct.pack('!B', self.communication_channel)  # channel id
+        body += struct.pack('!B', self.sequence_count)  # sequence counter
+        body += struct.pack('!B', 0)  # status
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['structure_length'] = self._unpack_stream('!B', message)
-            self.body['communication_channel_id'] = self._unpack_stream('!B', message)
-            self.body['sequence_counter'] = self._unpack_stream('!B', message)
-            self.body['status'] = self._unpack_stream('!B', message)
+            self.structure_length, \
+            self.communication_channel, \
+            self.sequence_count, \
+            self.status = _CONNECTION_HEADER.unpack_from(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['structure_length'] = self.structure_length
+        body['communication_channel_id'] = self.communication_channel
+        body['sequence_counter'] = self.sequence_count
+        body['status'] = self.status
+        return body
+
+
+class KnxRoutingIndication(_KnxCemiMessage):
+    __slots__ = ()
 
-class KnxRoutingIndication(KnxMessage):
     def __init__(self, message=None, knx_source='0.0.0', knx_destination=None):
         super(KnxRoutingIndication, self).__init__()
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('ROUTING_INDICATION')
+            self.service_type = KNX_MESSAGE_TYPES.get('ROUTING_INDICATION')
             if knx_source:
                 self.set_knx_source(knx_source)
             if knx_destination:
                 self.set_knx_destination(knx_destination)
 
     def _pack_knx_body(self, cemi=None):
-        self.body = b''
+        body = b''
         if cemi:
-            self.body += cemi
+            body += cemi
         else:
-            self.body += self._pack_cemi()
-        return self.body
+            body += self._pack_cemi()
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['cemi'] = self._unpack_cemi(message)
+            self._defer_cemi(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        if self.cemi:
+            body['cemi'] = self.cemi.as_dict()
+        return body
+
 
 class KnxRoutingLostMessage(KnxMessage):
+    __slots__ = ('structure_length', 'device_state', 'lost_messages')
+
     def __init__(self, message=None):
         super(KnxRoutingLostMessage, self).__init__()
+        self.structure_length = None
+        self.device_state = None
+        self.lost_messages = None
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_tye'] = KNX_MESSAGE_TYPES.get('ROUTING_LOST_MESSAGE')
+            self.service_type = KNX_MESSAGE_TYPES.get('ROUTING_LOST_MESSAGE')
             self.pack_knx_message()
 
     def _pack_knx_body(self):
-        self.body = struct.pack('!B', 4)  # structure_length
-        self.body += struct.pack('!B', 0)  # device state
-        self.body += struct.pack('!H', 0)  # number of lost messages
-        return self.body
+        body = struct.pack('!B', 4)  # structure_length
+        body += struct.pack('!B', 0)  # device state
+        body += struct.pack('!H', 0)  # number of lost messages
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['structure_length'] = self._unpack_stream('!B', message)
-            self.body['device_state'] = self._unpack_stream('!B', message)
-            self.body['lost_messages'] = self._unpack_stream('!H', message)
+            self.structure_length, \
+            self.device_state, \
+            self.lost_messages = _ROUTING_LOST_MESSAGE.unpack_from(message)
         except Exception as e:
             LOGGER.exception(e)
 
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['structure_length'] = self.structure_length
+        body['device_state'] = self.device_state
+        body['lost_messages'] = self.lost_messages
+        return body
+
 
 class KnxRoutingBusy(KnxMessage):
+    __slots__ = ('structure_length', 'device_state', 'busy_wait_time', 'busy_control_field')
+
     def __init__(self, message=None):
         super(KnxRoutingBusy, self).__init__()
+        self.structure_length = None
+        self.device_state = None
+        self.busy_wait_time = None
+        self.busy_control_field = None
         if message:
             self.unpack_knx_message(message)
         else:
-            self.header['service_type'] = KNX_MESSAGE_TYPES.get('ROUTING_BUSY')
+            self.service_type = KNX_MESSAGE_TYPES.get('ROUTING_BUSY')
             self.pack_knx_message()
 
     def _pack_knx_body(self):
-        self.body = struct.pack('!B', 4)  # structure_length
-        self.body += struct.pack('!B', 0)  # device state
-        self.body += struct.pack('!H', 0)  # routing busy wait time
-        self.body += struct.pack('!H', 0)  # routing busy control field
-        return self.body
+        body = struct.pack('!B', 4)  # structure_length
+        body += struct.pack('!B', 0)  # device state
+        body += struct.pack('!H', 0)  # routing busy wait time
+        body += struct.pack('!H', 0)  # routing busy control field
+        return body
 
     def _unpack_knx_body(self, message):
         try:
-            message = io.BytesIO(message)
-            self.body['structure_length'] = self._unpack_stream('!B', message)
-            self.body['device_state'] = self._unpack_stream('!B', message)
-            self.body['busy_wait_time'] = self._unpack_stream('!H', message)
-            self.body['busy_control_field'] = self._unpack_stream('!H', message)
+            self.structure_length, \
+            self.device_state, \
+            self.busy_wait_time, \
+            self.busy_control_field = _ROUTING_BUSY.unpack_from(message)
         except Exception as e:
             LOGGER.exception(e)
+
+    def _body_dict(self):
+        body = collections.OrderedDict()
+        body['structure_length'] = self.structure_length
+        body['device_state'] = self.device_state
+        body['busy_wait_time'] = self.busy_wait_time
+        body['busy_control_field'] = self.busy_control_field
+        return body
+
+
+_KNX_MESSAGE_CLASSES = {
+    KNX_MESSAGE_TYPES.get('SEARCH_RESPONSE'): KnxSearchResponse,
+    KNX_MESSAGE_TYPES.get('DESCRIPTION_RESPONSE'): KnxDescriptionResponse,
+    KNX_MESSAGE_TYPES.get('CONNECT_RESPONSE'): KnxConnectResponse,
+    KNX_MESSAGE_TYPES.get('TUNNELLING_REQUEST'): KnxTunnellingRequest,
+    KNX_MESSAGE_TYPES.get('TUNNELLING_ACK'): KnxTunnellingAck,
+    KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_REQUEST'): KnxConnectionStateRequest,
+    KNX_MESSAGE_TYPES.get('CONNECTIONSTATE_RESPONSE'): KnxConnectionStateResponse,
+    KNX_MESSAGE_TYPES.get('DISCONNECT_REQUEST'): KnxDisconnectRequest,
+    KNX_MESSAGE_TYPES.get('DISCONNECT_RESPONSE'): KnxDisconnectResponse,
+    KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_REQUEST'): KnxDeviceConfigurationRequest,
+    KNX_MESSAGE_TYPES.get('DEVICE_CONFIGURATION_RESPONSE'): KnxDeviceConfigurationAck}
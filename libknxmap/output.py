@@ -0,0 +1,222 @@
+"""Output sinks that write KnxTargetReport and KnxBusTargetReport objects to
+files as soon as they are found. Writes are buffered with a fixed buffer
+size, so the memory of a sink does not grow with the size of a scan."""
+import collections
+import csv
+import ipaddress
+import json
+import logging
+import struct
+
+from libknxmap.data.constants import *
+from libknxmap.messages import *
+
+__all__ = ['ResultSink',
+           'JsonLinesSink',
+           'CsvSink',
+           'BinarySink',
+           'OUTPUT_FORMATS',
+           'gateway_record',
+           'bus_device_record']
+
+LOGGER = logging.getLogger(__name__)
+
+BUFFER_SIZE = 64 * 1024
+
+_KNX_SERVICE_IDS = {v: k for k, v in KNX_SERVICES.items()}
+
+
+def _plain(value):
+    """Convert a value of a report to types that can be serialized as JSON."""
+    if isinstance(value, bytes):
+        return value.decode(errors='backslashreplace')
+    if isinstance(value, dict):
+        return collections.OrderedDict((str(k), _plain(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _known(value):
+    """Reports use False for values that could not be read."""
+    return None if value is False else value
+
+
+def _friendly_name(knx_target):
+    return knx_target.friendly_name.strip().replace(b'\x00', b'').decode(errors='backslashreplace')
+
+
+def gateway_record(knx_target):
+    """Return a KnxTargetReport without its bus devices as a dict."""
+    return collections.OrderedDict([
+        ('type', 'gateway'),
+        ('host', knx_target.host),
+        ('port', knx_target.port),
+        ('knx_address', knx_target.knx_address),
+        ('mac_address', knx_target.mac_address),
+        ('device_serial', knx_target.device_serial),
+        ('friendly_name', _friendly_name(knx_target)),
+        ('knx_medium', KNX_MEDIUMS.get(knx_target.knx_medium)),
+        ('device_status', _plain(knx_target.device_status)),
+        ('project_install_identifier', knx_target.project_install_identifier),
+        ('supported_services', list(knx_target.supported_services))])
+
+
+def bus_device_record(gateway, device):
+    """Return a KnxBusTargetReport of the gateway (host, port) as a dict."""
+    return collections.OrderedDict([
+        ('type', 'bus_device'),
+        ('host', gateway[0]),
+        ('port', gateway[1]),
+        ('knx_address', KnxMessage.parse_knx_address(device.address)),
+        ('medium', KNX_BUS_MEDIUMS.get(_known(device.medium))),
+        ('device_type', DEVICE_TYPES.get(_known(device.type))),
+        ('version', _known(device.version)),
+        ('device_serial', _known(device.device_serial)),
+        ('manufacturer', _known(device.manufacturer)),
+        ('properties', _plain(device.properties) if device.properties else None)])
+
+
+class ResultSink:
+    """The base class of output sinks. Subclasses implement write_gateway()
+    and write_bus_device() and write to self.file."""
+    binary = False
+
+    def __init__(self, path):
+        self.path = path
+        if self.binary:
+            self.file = open(path, 'wb', buffering=BUFFER_SIZE)
+        else:
+            self.file = open(path, 'w', buffering=BUFFER_SIZE, newline='', encoding='utf-8')
+
+    def write_gateway(self, knx_target):
+        raise NotImplementedError
+
+    def write_bus_device(self, gateway, device):
+        raise NotImplementedError
+
+    def write_bus_scan(self, knx_target):
+        """Called when the bus scan of the gateway knx_target has been finished."""
+        pass
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesSink(ResultSink):
+    """Write one JSON object per line for each gateway and bus device."""
+
+    def write_gateway(self, knx_target):
+        self.file.write(json.dumps(gateway_record(knx_target)) + '\n')
+
+    def write_bus_device(self, gateway, device):
+        self.file.write(json.dumps(bus_device_record(gateway, device)) + '\n')
+
+
+class CsvSink(ResultSink):
+    """Write one CSV row for each gateway and bus device. Both share the same
+    columns, fields that do not apply are empty. Lists and properties are
+    written as JSON."""
+    FIELDS = ['type', 'host', 'port', 'knx_address', 'mac_address', 'device_serial',
+              'friendly_name', 'knx_medium', 'device_status', 'project_install_identifier',
+              'supported_services', 'medium', 'device_type', 'version', 'manufacturer',
+              'properties']
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.writer = csv.DictWriter(self.file, self.FIELDS, restval='')
+        self.writer.writeheader()
+
+    def _write(self, record):
+        for key, value in record.items():
+            if isinstance(value, (dict, list)):
+                record[key] = json.dumps(value)
+            elif value is None:
+                record[key] = ''
+        self.writer.writerow(record)
+
+    def write_gateway(self, knx_target):
+        self._write(gateway_record(knx_target))
+
+    def write_bus_device(self, gateway, device):
+        self._write(bus_device_record(gateway, device))
+
+
+class BinarySink(ResultSink):
+    """Write compact binary records. Each record starts with a header of the
+    record type and the payload length (!BI).
+
+    Gateway records (type 1): !4sHH6s6sBBH with the IPv4 address, port, KNX
+    address, MAC address, serial, medium, device status and project install
+    identifier, followed by the service family IDs and the friendly name,
+    both prefixed by their length as a byte.
+
+    Bus device records (type 2): !4sHHBBB6s with the IPv4 address and port of
+    the gateway, KNX address, medium, device type and version (0xff if not
+    known) and serial (zeros if not known), followed by the manufacturer
+    prefixed by its length as a byte and the properties as JSON prefixed by
+    their length as !I."""
+    binary = True
+    HEADER = struct.Struct('!BI')
+    GATEWAY = struct.Struct('!4sHH6s6sBBH')
+    BUS_DEVICE = struct.Struct('!4sHHBBB6s')
+    GATEWAY_RECORD = 1
+    BUS_DEVICE_RECORD = 2
+
+    def _write(self, record_type, payload):
+        self.file.write(self.HEADER.pack(record_type, len(payload)))
+        self.file.write(payload)
+
+    @staticmethod
+    def _byte(value):
+        return value if type(value) is int and 0 <= value < 0xff else 0xff
+
+    @staticmethod
+    def _short_string(value):
+        value = str(value).encode()[:0xff] if value else b''
+        return struct.pack('!B', len(value)) + value
+
+    def write_gateway(self, knx_target):
+        status = 0
+        if isinstance(knx_target.device_status, dict):
+            for bit, value in enumerate(knx_target.device_status.values()):
+                status |= (value & 1) << bit
+        services = bytes(_KNX_SERVICE_IDS[s] for s in knx_target.supported_services
+                         if s in _KNX_SERVICE_IDS)
+        name = knx_target.friendly_name.strip().replace(b'\x00', b'')
+        payload = self.GATEWAY.pack(
+            ipaddress.IPv4Address(knx_target.host).packed,
+            knx_target.port,
+            KnxMessage.pack_knx_address(knx_target.knx_address),
+            bytes.fromhex(knx_target.mac_address.replace(':', '')),
+            bytes.fromhex(knx_target.device_serial),
+            self._byte(knx_target.knx_medium),
+            status,
+            knx_target.project_install_identifier)
+        payload += struct.pack('!B', len(services)) + services
+        payload += struct.pack('!B', len(name)) + name
+        self._write(self.GATEWAY_RECORD, payload)
+
+    def write_bus_device(self, gateway, device):
+        try:
+            serial = bytes.fromhex(device.device_serial) if device.device_serial else bytes(6)
+        except (TypeError, ValueError):
+            serial = bytes(6)
+        payload = self.BUS_DEVICE.pack(
+            ipaddress.IPv4Address(gateway[0]).packed,
+            gateway[1],
+            device.address,
+            self._byte(device.medium),
+            self._byte(device.type),
+            self._byte(device.version),
+            serial[:6].ljust(6, b'\x00'))
+        payload += self._short_string(device.manufacturer)
+        properties = json.dumps(_plain(device.properties)).encode() if device.properties else b''
+        payload += struct.pack('!I', len(properties)) + properties
+        self._write(self.BUS_DEVICE_RECORD, payload)
+
+
+OUTPUT_FORMATS = {
+    'jsonl': JsonLinesSink,
+    'csv': CsvSink,
+    'binary': BinarySink}
@@ -0,0 +1,232 @@
+"""A persistent SQLite store for scan results. It can be used as an output
+sink of KnxMap and be queried without scanning again."""
+import json
+import logging
+import sqlite3
+import time
+
+from libknxmap.output import gateway_record, bus_device_record
+
+__all__ = ['ResultStore']
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    description TEXT);
+CREATE TABLE IF NOT EXISTS gateways (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    seen REAL NOT NULL,
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    knx_address TEXT,
+    mac_address TEXT,
+    device_serial TEXT,
+    friendly_name TEXT,
+    knx_medium TEXT,
+    device_status TEXT,
+    project_install_identifier INTEGER,
+    supported_services TEXT);
+CREATE TABLE IF NOT EXISTS bus_devices (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    seen REAL NOT NULL,
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    knx_address TEXT NOT NULL,
+    medium TEXT,
+    device_type TEXT,
+    version INTEGER,
+    device_serial TEXT,
+    manufacturer TEXT,
+    properties TEXT);
+CREATE TABLE IF NOT EXISTS bus_scans (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    finished REAL NOT NULL,
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS bus_scans_host ON bus_scans (host, port);
+CREATE INDEX IF NOT EXISTS gateways_run ON gateways (run);
+CREATE INDEX IF NOT EXISTS gateways_host ON gateways (host, port);
+CREATE INDEX IF NOT EXISTS gateways_knx_address ON gateways (knx_address);
+CREATE INDEX IF NOT EXISTS gateways_serial ON gateways (device_serial);
+CREATE INDEX IF NOT EXISTS gateways_project ON gateways (project_install_identifier);
+CREATE INDEX IF NOT EXISTS bus_devices_run ON bus_devices (run);
+CREATE INDEX IF NOT EXISTS bus_devices_host ON bus_devices (host, port);
+CREATE INDEX IF NOT EXISTS bus_devices_knx_address ON bus_devices (knx_address);
+CREATE INDEX IF NOT EXISTS bus_devices_serial ON bus_devices (device_serial);
+CREATE INDEX IF NOT EXISTS bus_devices_manufacturer ON bus_devices (manufacturer);
+CREATE INDEX IF NOT EXISTS bus_devices_medium ON bus_devices (medium);
+"""
+
+GATEWAY_COLUMNS = ['run', 'seen', 'host', 'port', 'knx_address', 'mac_address', 'device_serial',
+                   'friendly_name', 'knx_medium', 'device_status', 'project_install_identifier',
+                   'supported_services']
+BUS_DEVICE_COLUMNS = ['run', 'seen', 'host', 'port', 'knx_address', 'medium', 'device_type',
+                      'version', 'device_serial', 'manufacturer', 'properties']
+
+# Filters of find_gateways() and find_bus_devices() and their columns
+GATEWAY_FILTERS = {
+    'run': 'g.run',
+    'host': 'g.host',
+    'knx_address': 'g.knx_address',
+    'device_serial': 'g.device_serial',
+    'knx_medium': 'g.knx_medium',
+    'project_install_identifier': 'g.project_install_identifier'}
+BUS_DEVICE_FILTERS = {
+    'run': 'd.run',
+    'host': 'd.host',
+    'knx_address': 'd.knx_address',
+    'device_serial': 'd.device_serial',
+    'medium': 'd.medium',
+    'device_type': 'd.device_type',
+    'manufacturer': 'd.manufacturer'}
+
+
+class ResultStore:
+    """Store gateways and bus devices in a SQLite database.
+
+    As an output sink, all results are added to a new scan run. Rows are
+    buffered and inserted in a single transaction per batch_size rows and
+    when the store is closed. If only queries are needed, pass run=False."""
+
+    def __init__(self, path, description=None, run=True, batch_size=500):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self.gateways = list()
+        self.bus_devices = list()
+        self.bus_scans = list()
+        self.run = None
+        if run:
+            with self.db:
+                self.run = self.db.execute(
+                    'INSERT INTO runs (started, description) VALUES (?, ?)',
+                    (time.time(), description)).lastrowid
+
+    @staticmethod
+    def _json(value):
+        return json.dumps(value) if value is not None else None
+
+    def write_gateway(self, knx_target):
+        record = gateway_record(knx_target)
+        record['run'] = self.run
+        record['seen'] = time.time()
+        record['device_status'] = self._json(record['device_status'])
+        record['supported_services'] = self._json(record['supported_services'])
+        self.gateways.append(tuple(record[c] for c in GATEWAY_COLUMNS))
+        self._check_batch()
+
+    def write_bus_device(self, gateway, device):
+        record = bus_device_record(gateway, device)
+        record['run'] = self.run
+        record['seen'] = time.time()
+        record['properties'] = self._json(record['properties'])
+        self.bus_devices.append(tuple(record[c] for c in BUS_DEVICE_COLUMNS))
+        self._check_batch()
+
+    def write_bus_scan(self, knx_target):
+        """Record that the bus scan of the gateway knx_target has been finished."""
+        self.bus_scans.append((self.run, time.time(), knx_target.host, knx_target.port))
+        self._check_batch()
+
+    def _check_batch(self):
+        if len(self.gateways) + len(self.bus_devices) + len(self.bus_scans) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert all buffered rows in one transaction."""
+        if not self.gateways and not self.bus_devices and not self.bus_scans:
+            return
+        with self.db:
+            if self.gateways:
+                self.db.executemany('INSERT INTO gateways ({}) VALUES ({})'.format(
+                    ', '.join(GATEWAY_COLUMNS), ', '.join('?' * len(GATEWAY_COLUMNS))), self.gateways)
+            if self.bus_devices:
+                self.db.executemany('INSERT INTO bus_devices ({}) VALUES ({})'.format(
+                    ', '.join(BUS_DEVICE_COLUMNS), ', '.join('?' * len(BUS_DEVICE_COLUMNS))), self.bus_devices)
+            if self.bus_scans:
+                self.db.executemany('INSERT INTO bus_scans (run, finished, host, port) VALUES (?, ?, ?, ?)',
+                                    self.bus_scans)
+        self.gateways = list()
+        self.bus_devices = list()
+        self.bus_scans = list()
+
+    def close(self):
+        self.flush()
+        if self.run is not None:
+            with self.db:
+                self.db.execute('UPDATE runs SET finished = ? WHERE id = ?', (time.time(), self.run))
+        self.db.close()
+
+    @staticmethod
+    def _where(columns, filters):
+        clauses = list()
+        values = list()
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key not in columns:
+                raise ValueError('Invalid filter: {}'.format(key))
+            clauses.append('{} = ?'.format(columns[key]))
+            values.append(value)
+        return ' AND '.join(clauses) or '1', values
+
+    def find_gateways(self, **filters):
+        """Return the gateways that match all filters (see GATEWAY_FILTERS),
+        most recent runs first."""
+        where, values = self._where(GATEWAY_FILTERS, filters)
+        return self.db.execute(
+            'SELECT g.* FROM gateways g WHERE {} ORDER BY g.run DESC, g.host, g.port'.format(where),
+            values).fetchall()
+
+    def find_bus_devices(self, **filters):
+        """Return the bus devices that match all filters (see BUS_DEVICE_FILTERS)
+        together with the gateway they have been found with, most recent
+        runs first. This answers which gateways expose a device."""
+        where, values = self._where(BUS_DEVICE_FILTERS, filters)
+        return self.db.execute(
+            'SELECT d.*, g.friendly_name AS gateway_name, g.device_serial AS gateway_serial '
+            'FROM bus_devices d LEFT JOIN gateways g '
+            'ON g.run = d.run AND g.host = d.host AND g.port = d.port '
+            'WHERE {} ORDER BY d.run DESC, d.host, d.port, d.knx_address'.format(where),
+            values).fetchall()
+
+    def runs(self):
+        return self.db.execute('SELECT * FROM runs ORDER BY id').fetchall()
+
+    def _previous_run(self):
+        # Results of the current run are not previous results
+        return self.run if self.run is not None else -1
+
+    def last_gateway(self, host, port):
+        """Return the most recent gateway row of host and port of a previous run."""
+        return self.db.execute(
+            'SELECT * FROM gateways WHERE host = ? AND port = ? AND run != ? '
+            'ORDER BY run DESC, id DESC LIMIT 1', (host, port, self._previous_run())).fetchone()
+
+    def last_gateways(self):
+        """Return the most recent row of each gateway of previous runs."""
+        return self.db.execute(
+            'SELECT g.* FROM gateways g JOIN (SELECT host, port, MAX(run) AS run FROM gateways '
+            'WHERE run != ? GROUP BY host, port) l ON g.host = l.host AND g.port = l.port '
+            'AND g.run = l.run ORDER BY g.host, g.port', (self._previous_run(),)).fetchall()
+
+    def last_bus_scan(self, host, port):
+        """Return the most recent finished bus scan of host and port of a previous run."""
+        return self.db.execute(
+            'SELECT * FROM bus_scans WHERE host = ? AND port = ? AND run != ? '
+            'ORDER BY finished DESC LIMIT 1', (host, port, self._previous_run())).fetchone()
+
+    def bus_devices_of(self, run, host, port):
+        """Return the bus devices found via host and port in run."""
+        return self.db.execute(
+            'SELECT * FROM bus_devices WHERE run = ? AND host = ? AND port = ? ORDER BY knx_address',
+            (run, host, port)).fetchall()
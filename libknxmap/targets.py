@@ -1,26 +1,105 @@
 """This module contains various helper classes that make handling targets and sets
 of targets and results easiert."""
 import binascii
+import bisect
 import collections
+import copy
+import functools
+import io
 import ipaddress
 import logging
+import random
+import sys
 
 from libknxmap.data.constants import *
 from libknxmap.messages import *
 
 __all__ = ['Targets',
+           'TargetPermutation',
            'KnxTargets',
            'BusResultSet',
+           'KnxAddressBitmap',
+           'TargetBitmap',
            'KnxTargetReport',
            'KnxBusTargetReport',
            'print_knx_target']
 
 LOGGER = logging.getLogger(__name__)
 
+SCAN_ORDERS = ['sequential', 'random']
+
+
+class TargetPermutation:
+    """A pseudo-random permutation of the indexes 0 to size - 1.
+
+    Indexes are mapped by a four round Feistel network over the smallest
+    domain of an even number of bits that includes size. Values outside of
+    size are mapped again until they fall into it (cycle walking). Any index
+    can be mapped on its own, so a permutation only needs its size and seed
+    and can be resumed at any index."""
+
+    ROUNDS = 4
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(32)
+        self.seed = seed
+        self.half_bits = (max(2, (size - 1).bit_length()) + 1) // 2
+        self.mask = (1 << self.half_bits) - 1
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(64) for _ in range(self.ROUNDS)]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError('permutation index out of range')
+        index = self._encrypt(index)
+        while index >= self.size:
+            index = self._encrypt(index)
+        return index
+
+    def _round(self, value, key):
+        value = ((value ^ key) * 0x9e3779b97f4a7c15) & 0xffffffffffffffff
+        value ^= value >> 29
+        return value & self.mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half_bits) | right
+
+
 class Targets:
-    """A helper class that expands provided target definitions to a list of tuples."""
-    def __init__(self, targets=None, ports=3671):
-        self.targets = set()
+    """A helper class that expands provided target definitions to (host, port) tuples.
+
+    Targets are kept as ranges of integer addresses and only expanded while
+    iterating, so even large networks need constant memory. The length is
+    computed from the ranges.
+
+    Targets are yielded in sequential order, or in random order which spreads
+    the load over all subnets. Iteration starts at index start, which allows
+    to resume a scan with the same order and seed.
+
+    A shard only yields every shards-th target of the order, beginning with
+    index shard. See split()."""
+    def __init__(self, targets=None, ports=3671, order='sequential', seed=None, start=0,
+                 shard=0, shards=1):
+        assert order in SCAN_ORDERS, 'Invalid scan order'
+        self.order = order
+        self.seed = seed
+        self.start = start
+        self.shard = shard
+        self.shards = shards
+        # A sorted list of non-overlapping (address class, first, last) ranges
+        self.ranges = list()
+        # The index of the first host of each range
+        self.range_offsets = list()
+        # The (IP version, first address) of each range, in the order of the ranges
+        self.range_starts = list()
         self.ports = set()
         if isinstance(ports, list):
             for p in ports:
@@ -29,14 +108,129 @@ class Targets:
             self.ports.add(ports)
         else:
             self.ports.add(3671)
+        self.ports = sorted(self.ports)
 
         if isinstance(targets, (set, list)):
             self._parse(targets)
         elif isinstance(targets, str):
             self._parse([targets])
 
+        if self.order == 'random':
+            permutation = TargetPermutation(len(self), seed)
+            # Keep the seed, it is required to resume the scan
+            self.seed = permutation.seed
+            self.permutation = permutation
+        else:
+            self.permutation = None
+
+    def __iter__(self):
+        return self.iter_targets(self.start)
+
+    def iter_targets(self, start=0):
+        """Yield all targets from index start onwards."""
+        if self.shards > 1:
+            first = start + (self.shard - start) % self.shards
+            for index in range(first, len(self), self.shards):
+                if self.permutation:
+                    index = self.permutation[index]
+                yield self.target_at(index)
+            return
+
+        if self.permutation:
+            for index in range(start, len(self)):
+                yield self.target_at(self.permutation[index])
+            return
+
+        host_index, port_index = divmod(start, len(self.ports))
+        for range_index, (address_class, first, last) in enumerate(self.ranges):
+            if host_index > self.range_offsets[range_index] + last - first:
+                continue
+            address = first + max(0, host_index - self.range_offsets[range_index])
+            for address in range(address, last + 1):
+                host = str(address_class(address))
+                for port in self.ports[port_index:]:
+                    yield host, port
+                port_index = 0
+
+    def split(self, count):
+        """Split the targets into count disjoint shards with the same order,
+        seed and start. Each target is part of exactly one shard."""
+        shards = list()
+        for shard in range(count):
+            targets = copy.copy(self)
+            targets.shard = shard
+            targets.shards = count
+            shards.append(targets)
+        return shards
+
+    def target_at(self, index):
+        """Return the target at index of the sequential order."""
+        host_index, port_index = divmod(index, len(self.ports))
+        range_index = bisect.bisect_right(self.range_offsets, host_index) - 1
+        address_class, first, _ = self.ranges[range_index]
+        address = first + host_index - self.range_offsets[range_index]
+        return str(address_class(address)), self.ports[port_index]
+
+    def index_of(self, target):
+        """Return the index of the (host, port) tuple target in the sequential
+        order, or None if it is not part of the targets."""
+        host, port = target
+        port_index = bisect.bisect_left(self.ports, port)
+        if port_index == len(self.ports) or self.ports[port_index] != port:
+            return None
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return None
+        range_index = bisect.bisect_right(self.range_starts, (address.version, int(address))) - 1
+        if range_index < 0:
+            return None
+        address_class, first, last = self.ranges[range_index]
+        if type(address) is not address_class or int(address) > last:
+            return None
+        return (self.range_offsets[range_index] + int(address) - first) * len(self.ports) + port_index
+
+    def __len__(self):
+        return sum(last - first + 1 for _, first, last in self.ranges) * len(self.ports)
+
+    def __bool__(self):
+        return bool(self.ranges and self.ports)
+
+    def __contains__(self, target):
+        """Check if the (host, port) tuple target is part of the targets,
+        regardless of the shard."""
+        host, port = target
+        if port not in self.ports:
+            return False
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(type(address) is address_class and first <= int(address) <= last
+                   for address_class, first, last in self.ranges)
+
+    @property
+    def targets(self):
+        """The targets as an iterable of (host, port) tuples."""
+        return self
+
+    @staticmethod
+    def _host_range(network):
+        """Return the first and last address of network.hosts() as ints."""
+        first = int(network.network_address)
+        last = int(network.broadcast_address)
+        if network.num_addresses <= 2:
+            # Point-to-point and single host networks
+            return first, last
+        if network.version == 4:
+            # Skip the network and broadcast address
+            return first + 1, last - 1
+        # Skip the Subnet-Router anycast address
+        return first + 1, last
+
     def _parse(self, targets):
         """Parse all targets with ipaddress module (with CIDR notation support)."""
+        ranges = list()
         for target in targets:
             try:
                 _targets = ipaddress.ip_network(target, strict=False)
@@ -45,21 +239,37 @@ class Targets:
                 continue
 
             if '/' in target:
-                _targets = _targets.hosts()
+                first, last = self._host_range(_targets)
+            else:
+                first = last = int(_targets.network_address)
+            address_class = type(_targets.network_address)
+            ranges.append((_targets.version, first, last, address_class))
+
+        # Merge overlapping and adjacent ranges, so that every target is only yielded once
+        for version, first, last, address_class in sorted(ranges, key=lambda r: r[:3]):
+            if self.ranges and self.ranges[-1][0] is address_class and \
+                    first <= self.ranges[-1][2] + 1:
+                if last > self.ranges[-1][2]:
+                    self.ranges[-1] = (address_class, self.ranges[-1][1], last)
+            else:
+                self.ranges.append((address_class, first, last))
 
-            for _target in _targets:
-                for port in self.ports:
-                    self.targets.add((str(_target), port))
+        offset = 0
+        for address_class, first, last in self.ranges:
+            self.range_offsets.append(offset)
+            self.range_starts.append((address_class(first).version, first))
+            offset += last - first + 1
 
 
 class KnxTargets:
-    """A helper class that expands knx bus targets to lists."""
+    """A helper class that expands knx bus targets to sets of
+    individual addresses, packed as ints."""
     def __init__(self, targets):
         self.targets = set()
         if not targets:
             self.targets = None
         elif not '-' in targets and self.is_valid_physical_address(targets):
-            self.targets.add(targets)
+            self.targets.add(KnxMessage.pack_knx_address(targets))
         else:
             assert isinstance(targets, str)
             if '-' in targets and targets.count('-') < 2:
@@ -83,16 +293,13 @@ class KnxTargets:
         f = KnxMessage.pack_knx_address(f)
         t = KnxMessage.pack_knx_address(t)
         for i in range(f, t + 1):
-            yield KnxMessage.parse_knx_address(i)
+            yield i
 
     @staticmethod
     def expand_targets(f, t):
-        ret = set()
         f = KnxMessage.pack_knx_address(f)
         t = KnxMessage.pack_knx_address(t)
-        for i in range(f, t + 1):
-            ret.add(KnxMessage.parse_knx_address(i))
-        return ret
+        return set(range(f, t + 1))
 
     @staticmethod
     def physical_address_to_int(address):
@@ -146,7 +353,100 @@ class BusResultSet:
         pass
 
 
+class KnxAddressBitmap:
+    """A compact set of individual addresses, packed as ints. It has one
+    bit for each of the 65536 addresses, so it takes 8 KiB regardless of the
+    number of addresses."""
+    SIZE = 0x10000
+
+    def __init__(self, addresses=None):
+        self.bits = bytearray(self.SIZE // 8)
+        self.count = 0
+        for address in addresses or ():
+            self.add(address)
+
+    def add(self, address):
+        index, bit = divmod(address, 8)
+        if not self.bits[index] & (1 << bit):
+            self.bits[index] |= 1 << bit
+            self.count += 1
+
+    def __contains__(self, address):
+        index, bit = divmod(address, 8)
+        return 0 <= index < len(self.bits) and bool(self.bits[index] & (1 << bit))
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index, byte in enumerate(self.bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield index * 8 + bit
+
+    def __bytes__(self):
+        return bytes(self.bits)
+
+
+class TargetBitmap:
+    """A compact set of (host, port) targets of a Targets instance. It has
+    one bit for each target, indexed by its position in the sequential order.
+    The bits are kept in chunks that are only allocated once a target in
+    them is added, so even sets of large target ranges stay small. Targets
+    that are not part of targets are kept in a set."""
+    CHUNK_BITS = 1 << 16
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.chunks = dict()
+        self.others = set()
+        self.count = 0
+
+    def add(self, target):
+        index = self.targets.index_of(target)
+        if index is None:
+            if target not in self.others:
+                self.others.add(target)
+                self.count += 1
+            return
+        chunk_index, bit = divmod(index, self.CHUNK_BITS)
+        chunk = self.chunks.get(chunk_index)
+        if chunk is None:
+            chunk = self.chunks[chunk_index] = bytearray(self.CHUNK_BITS // 8)
+        index, bit = divmod(bit, 8)
+        if not chunk[index] & (1 << bit):
+            chunk[index] |= 1 << bit
+            self.count += 1
+
+    def update(self, targets):
+        for target in targets:
+            self.add(target)
+
+    def __contains__(self, target):
+        index = self.targets.index_of(target)
+        if index is None:
+            return target in self.others
+        chunk_index, bit = divmod(index, self.CHUNK_BITS)
+        chunk = self.chunks.get(chunk_index)
+        return chunk is not None and bool(chunk[bit // 8] & (1 << bit % 8))
+
+    def __len__(self):
+        return self.count
+
+
 class KnxTargetReport:
+    __slots__ = ('host',
+                 'port',
+                 'mac_address',
+                 'knx_address',
+                 'device_serial',
+                 'friendly_name',
+                 'device_status',
+                 'knx_medium',
+                 'project_install_identifier',
+                 'supported_services',
+                 'bus_devices')
 
     def __init__(self, host, port, mac_address, knx_address, device_serial,
                  friendly_name, device_status, knx_medium, project_install_identifier,
@@ -171,6 +471,13 @@ class KnxTargetReport:
 
 
 class KnxBusTargetReport:
+    __slots__ = ('address',
+                 'medium',
+                 'type',
+                 'version',
+                 'device_serial',
+                 'manufacturer',
+                 'properties')
 
     def __init__(self, address, medium=None, type=None, version=None,
                  device_serial=None, manufacturer=None, properties=None):
@@ -183,14 +490,15 @@ class KnxBusTargetReport:
         self.properties = properties
 
     def __str__(self):
-        return self.address
+        return KnxMessage.parse_knx_address(self.address)
 
     def __repr__(self):
-        return self.address
+        return KnxMessage.parse_knx_address(self.address)
 
 
 def print_knx_target(knx_target):
-    """Print a target of type KnxTargetReport in a well formatted way."""
+    """Print a target of type KnxTargetReport in a well formatted way. The
+    output is collected and written at once."""
     # TODO: make this better, and prettier.
     out = dict()
     out[knx_target.host] = collections.OrderedDict()
@@ -208,61 +516,61 @@ def print_knx_target(knx_target):
         o['Bus Devices'] = list()
 
         # Sort the device list based on KNX addresses
-        x = dict()
-        for i in knx_target.bus_devices:
-            x[KnxMessage.pack_knx_address(str(i))] = i
-        bus_devices = collections.OrderedDict(sorted(x.items()))
-
-        for k, d in bus_devices.items():
+        for d in sorted(knx_target.bus_devices, key=lambda d: d.address):
+            address = KnxMessage.parse_knx_address(d.address)
             _d = dict()
-            _d[d.address] = collections.OrderedDict()
+            _d[address] = collections.OrderedDict()
             if hasattr(d, 'type') and \
                     not isinstance(d.type, (type(None), type(False))):
-                _d[d.address]['Type'] = DEVICE_TYPES.get(d.type)
+                _d[address]['Type'] = DEVICE_TYPES.get(d.type)
             if hasattr(d, 'medium') and \
                     not isinstance(d.medium, (type(None), type(False))):
-                _d[d.address]['Medium'] = KNX_BUS_MEDIUMS.get(d.medium)
+                _d[address]['Medium'] = KNX_BUS_MEDIUMS.get(d.medium)
             if hasattr(d, 'device_serial') and \
                     not isinstance(d.device_serial, (type(None), type(False))):
-                _d[d.address]['Device Serial'] = d.device_serial
+                _d[address]['Device Serial'] = d.device_serial
             if hasattr(d, 'manufacturer') and \
                     not isinstance(d.manufacturer, (type(None), type(False))):
-                _d[d.address]['Manufacturer'] = d.manufacturer
+                _d[address]['Manufacturer'] = d.manufacturer
             if hasattr(d, 'version') and \
                     not isinstance(d.version, (type(None), type(False))):
-                _d[d.address]['Version'] = d.version
+                _d[address]['Version'] = d.version
             if hasattr(d, 'properties') and \
                 isinstance(d.properties, dict) and d.properties:
-                _d[d.address]['Properties'] = d.properties
+                _d[address]['Properties'] = d.properties
             o['Bus Devices'].append(_d)
 
-    print()
+    buf = io.StringIO()
+    write = functools.partial(print, file=buf)
+    write()
 
     def print_fmt(d, indent=0):
         for key, value in d.items():
             if indent is 0:
-                print('   ' * indent + str(key))
+                write('   ' * indent + str(key))
             elif isinstance(value, (dict, collections.OrderedDict)):
                 if not len(value.keys()):
-                    print('   ' * indent + str(key))
+                    write('   ' * indent + str(key))
                 else:
-                    print('   ' * indent + str(key) + ': ')
+                    write('   ' * indent + str(key) + ': ')
             else:
-                print('   ' * indent + str(key) + ': ', end="", flush=True)
+                write('   ' * indent + str(key) + ': ', end="")
 
             if key == 'Bus Devices':
-                print()
+                write()
                 for i in value:
                     print_fmt(i, indent + 1)
             elif isinstance(value, list):
                 for i, v in enumerate(value):
                     if i is 0:
-                        print()
-                    print('   ' * (indent + 1) + str(v))
+                        write()
+                    write('   ' * (indent + 1) + str(v))
             elif isinstance(value, (dict, collections.OrderedDict)):
                 print_fmt(value, indent + 1)
             else:
-                print(value)
+                write(value)
 
     print_fmt(out)
-    print()
+    write()
+    sys.stdout.write(buf.getvalue())
+    sys.stdout.flush()
@@ -0,0 +1,88 @@
+"""Benchmarks of the message decoder against the reference decoder in
+legacy_messages. Run with: python -m tests.benchmark_decoder"""
+import io
+import logging
+import time
+import tracemalloc
+
+from libknxmap import messages
+from tests import frames, legacy_messages
+
+
+def throughput(module, corpus, rounds=10):
+    """Return the number of frames module.parse_message() decodes per second."""
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for frame in corpus:
+            module.parse_message(frame)
+    return len(corpus) * rounds / (time.perf_counter() - t0)
+
+
+def rate(function, args, rounds=10):
+    """Return the number of calls of function per second."""
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for arg in args:
+            function(arg)
+    return len(args) * rounds / (time.perf_counter() - t0)
+
+
+def footprint(module, frames, decode_cemi=False):
+    """Return the average number of bytes allocated per message that
+    module.parse_message() retains for each of frames."""
+    tracemalloc.start()
+    try:
+        messages = [None] * len(frames)
+        before = tracemalloc.get_traced_memory()[0]
+        for i, frame in enumerate(frames):
+            messages[i] = module.parse_message(frame)
+            if decode_cemi:
+                messages[i].body['cemi']
+        return (tracemalloc.get_traced_memory()[0] - before) / len(frames)
+    finally:
+        tracemalloc.stop()
+
+
+def footprints(count=2000):
+    """Return a list of (name, legacy bytes, current bytes) tuples of the
+    per-message footprint of some message types."""
+    service_frames = frames.service_frames()
+    samples = [
+        ('TunnellingRequest', frames.tunnelling_requests(count), False),
+        ('TunnellingRequest + cEMI', frames.tunnelling_requests(count), True),
+        ('DescriptionResponse', [service_frames[2]] * count, False),
+        ('TunnellingAck', [service_frames[-1]] * count, False)]
+    return [(name, footprint(legacy_messages, sample, decode_cemi),
+             footprint(messages, sample, decode_cemi))
+            for name, sample, decode_cemi in samples]
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    corpus = frames.tunnelling_requests()
+    print('parse_message() of {} TUNNELLING_REQUEST frames:'.format(len(corpus)))
+    for name, module in (('legacy', legacy_messages), ('current', messages)):
+        print('  {:8} {:>9.0f} frames/s'.format(name, throughput(module, corpus)))
+
+    # The cEMI frames of the corpus without the KNXnet/IP header and connection header
+    cemis = [frame[10:] for frame in corpus]
+    legacy = legacy_messages.KnxTunnellingRequest()
+    print('_unpack_cemi() of {} L_Data frames:'.format(len(cemis)))
+    print('  {:8} {:>9.0f} frames/s'.format(
+        'legacy', rate(lambda cemi: legacy._unpack_cemi(io.BytesIO(cemi)), cemis)))
+    print('  {:8} {:>9.0f} frames/s'.format(
+        'current', rate(lambda cemi: messages.KnxTunnellingRequest._unpack_cemi(memoryview(cemi)), cemis)))
+
+    addresses = list(range(0x10000))
+    print('parse_knx_address() of all {} addresses:'.format(len(addresses)))
+    for name, module in (('legacy', legacy_messages), ('current', messages)):
+        print('  {:8} {:>9.0f} addresses/s'.format(
+            name, rate(module.KnxMessage.parse_knx_address, addresses)))
+
+    print('Bytes per retained message:')
+    for name, legacy, current in footprints():
+        print('  {:26} {:>6.0f} -> {:>6.0f}'.format(name, legacy, current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""A corpus of KNXnet/IP frames for decoder tests and benchmarks."""
+import random
+import struct
+
+HPAI = b'\x08\x01' + bytes([192, 168, 1, 2]) + b'\x0e\x57'
+DIB_DEV_INFO = bytes([0x36, 1, 2, 0x21]) + b'\x11\x01\x00\x05' + b'\x00\xfa\x01\x02\x03\x04' + \
+    bytes([224, 0, 23, 12]) + b'\x00\x11\x22\x33\x44\x55' + b'gateway'.ljust(30, b'\x00')
+DIB_SUPP_SV_FAMILIES = b'\x08\x02\x02\x01\x03\x01\x04\x01'
+
+
+def knx_frame(service_type, body):
+    """Prepend a KNXnet/IP header to body."""
+    return struct.pack('!BBHH', 6, 0x10, service_type, 6 + len(body)) + body
+
+
+def l_data(message_code, cf1, cf2, source, destination, tpdu):
+    """Return a cEMI L_Data frame without additional information."""
+    return struct.pack('!BBBBHHB', message_code, 0, cf1, cf2, source, destination,
+                       len(tpdu) - 1) + tpdu
+
+
+def tunnelling_request(cemi, channel=7, sequence=3):
+    return knx_frame(0x0420, bytes([4, channel, sequence, 0]) + cemi)
+
+
+def tunnelling_requests(count=2000, seed=1):
+    """Return count TUNNELLING_REQUEST frames with random L_Data frames."""
+    rnd = random.Random(seed)
+    frames = list()
+    for _ in range(count):
+        tpdu = bytes(rnd.getrandbits(8) for _ in range(rnd.randint(1, 8)))
+        frames.append(tunnelling_request(l_data(
+            rnd.choice([0x29, 0x2e, 0x11]), rnd.getrandbits(8), rnd.getrandbits(8),
+            rnd.getrandbits(16), rnd.getrandbits(16), tpdu)))
+    return frames
+
+
+def service_frames():
+    """Return one frame of each other service type that KNXmap decodes."""
+    return [
+        # Bus monitor frame with additional information
+        tunnelling_request(bytes([0x2b, 7, 3, 7, 0, 1, 2, 3, 4, 5, 6]) + b'\xbc\x11\x01'),
+        knx_frame(0x0202, HPAI + DIB_DEV_INFO + DIB_SUPP_SV_FAMILIES),
+        knx_frame(0x0204, DIB_DEV_INFO + DIB_SUPP_SV_FAMILIES),
+        knx_frame(0x0206, b'\x11\x00' + HPAI + b'\x04\x04\x11\xff'),
+        knx_frame(0x0206, b'\x00\x24'),
+        knx_frame(0x0207, b'\x07\x00' + HPAI),
+        knx_frame(0x0208, b'\x07\x00'),
+        knx_frame(0x0209, b'\x07\x00' + HPAI),
+        knx_frame(0x020a, b'\x07\x00'),
+        # M_PropRead.con of PID_ADDITIONAL_INDIVIDUAL_ADDRESSES
+        knx_frame(0x0310, b'\x04\x07\x03\x00\xfb\x00\x0b\x01\x35\x10\x00\x00\x02'),
+        knx_frame(0x0311, b'\x04\x07\x03\x00'),
+        knx_frame(0x0421, b'\x04\x07\x03\x00')]
+
+
+def corpus():
+    return tunnelling_requests() + service_frames()
@@ -0,0 +1,104 @@
+"""Compare the decoder of libknxmap.messages with the reference decoder
+in legacy_messages. Run with: python -m unittest discover tests"""
+import logging
+import unittest
+
+from libknxmap import messages
+from tests import benchmark_decoder, frames, legacy_messages
+
+
+# Messages whose body has been extended with fields the legacy decoder did not
+# decode, e.g. the cEMI property service of device configuration requests. The
+# legacy decoder kept these octets undecoded in the_end.
+EXTENDED_MESSAGES = ['KnxDeviceConfigurationRequest']
+
+
+def decode(module, frame):
+    """Decode frame and return the class name, header and body as plain dicts."""
+    message = module.parse_message(frame)
+    if message is None:
+        return None
+    # The legacy header is a class attribute, so it has to be copied right away
+    return type(message).__name__, plain(message.header), plain(message.body)
+
+
+def plain(value):
+    if isinstance(value, dict):
+        return {k: plain(v) for k, v in value.items()}
+    return value
+
+
+class DecoderTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def assertFieldsEqual(self, expected, actual, path, extended=False):
+        if isinstance(expected, dict) and isinstance(actual, dict):
+            if extended:
+                self.assertLessEqual(set(expected), set(actual), '{}: fields missing'.format(path))
+            else:
+                self.assertEqual(sorted(expected), sorted(actual), '{}: fields differ'.format(path))
+            for key in expected:
+                self.assertFieldsEqual(expected[key], actual[key], '{}.{}'.format(path, key), extended)
+        else:
+            self.assertEqual(expected, actual, path)
+
+    def test_corpus(self):
+        for i, frame in enumerate(frames.corpus()):
+            with self.subTest(frame=i):
+                expected = decode(legacy_messages, frame)
+                actual = decode(messages, frame)
+                if expected is None:
+                    self.assertIsNone(actual)
+                    continue
+                self.assertIsNotNone(actual)
+                self.assertEqual(expected[0], actual[0])
+                self.assertFieldsEqual(expected[1], actual[1], 'header')
+                if actual[0] in EXTENDED_MESSAGES:
+                    expected[2].pop('the_end', None)
+                    self.assertFieldsEqual(expected[2], actual[2], 'body', extended=True)
+                else:
+                    self.assertFieldsEqual(expected[2], actual[2], 'body')
+
+    def assertDecodesEqual(self, frame, path):
+        expected = decode(legacy_messages, frame)
+        actual = decode(messages, frame)
+        if expected != actual:
+            self.assertIsNotNone(actual, path)
+            self.assertFieldsEqual(expected[2], actual[2], path)
+
+    def test_tpdu_octets(self):
+        """Every TPCI/APCI combination of the first two TPDU octets."""
+        for tpci in range(0x100):
+            self.assertDecodesEqual(frames.tunnelling_request(frames.l_data(
+                0x29, 0xbc, 0xe0, 0x1101, 0x1102, bytes([tpci]))), 'tpdu {:02x}'.format(tpci))
+            for apci in range(0x100):
+                self.assertDecodesEqual(frames.tunnelling_request(frames.l_data(
+                    0x29, 0xbc, 0xe0, 0x1101, 0x1102, bytes([tpci, apci, 0xaa]))),
+                    'tpdu {:02x}{:02x}aa'.format(tpci, apci))
+
+    def test_addresses(self):
+        """Every individual and group address against the legacy string formatting."""
+        for address in range(0x10000):
+            parsed = messages.KnxMessage.parse_knx_address(address)
+            self.assertEqual(legacy_messages.KnxMessage.parse_knx_address(address), parsed)
+            self.assertEqual(address, messages.KnxMessage.pack_knx_address(parsed))
+            parsed = messages.KnxMessage.parse_knx_group_address(address)
+            self.assertEqual(legacy_messages.KnxMessage.parse_knx_group_address(address), parsed)
+            self.assertEqual(address, messages.KnxMessage.pack_knx_group_address(parsed))
+
+    def test_footprint(self):
+        """Retained messages take less memory than legacy messages."""
+        for name, legacy, current in benchmark_decoder.footprints(count=500):
+            with self.subTest(message=name):
+                self.assertLess(current, legacy)
+
+
+if __name__ == '__main__':
+    unittest.main()